@@ -0,0 +1,264 @@
+"""
+Network Testing Application
+
+This application allows for the sending and retrieval of data across a network
+which uses serial ports on multiple machines. It adopts its own protocol and
+allows for text to be sent from one machine to another.
+
+Author: Nick Klose (nick.klose@ualberta.ca)
+http://ualberta.ca/~klose
+
+Compact node addresses. Every node draws a 64-bit id, the hardware address
+of its machine in the high bits and random bits below so that several
+nodes on one machine still differ, and takes a 16-bit address hashed from
+it. Binary frames carry the address; names are only for people and are
+looked up in a Directory of the addresses a node has heard of. Pings
+start with
+
+    {ADDR=1A2B.0123456789ABCDEF}
+
+the address and id of the pinger, and end with a few entries of its
+directory in turn, as {DIR=3C4D.FEDCBA9876543210.Penguin,...}, so names
+spread through the mesh without asking. When two nodes turn out to share
+an address the one with the larger id hashes its id again for a new one,
+so a clash moves exactly one node, once. Nodes which announce no address
+(older versions) are known by the address hashed from their name, as
+before.
+"""
+import time
+import uuid
+import random
+import struct
+import threading
+import collections
+import protocol
+
+DIRECTORY_TIME = 600.0 # seconds an entry lives unless its node is heard again
+DIRECTORY_SIZE = 1024 # most entries kept at once
+GOSSIP_ENTRIES = 3 # directory entries announced in each ping, or as many
+                   # changed entries as fit in the node's MTU
+
+UID = struct.Struct("!QH")
+
+# Draws a unique id for a node.
+def node_uid(rng = random):
+    return ((uuid.getnode() << 16) | rng.getrandbits(16)) & 0xFFFFFFFFFFFFFFFF
+
+# Returns the address a node with the given id takes on its attempt-th try.
+def candidate(uid, attempt = 0):
+    while True:
+        addr = protocol.crc16(UID.pack(uid, attempt & 0xFFFF))
+        if addr not in (0, protocol.BROADCAST):
+            return addr
+        attempt += 1
+
+# Formats an address and id as announced in a ping.
+def format_claim(addr, uid):
+    return "%04X.%016X" % (addr, uid)
+
+# Returns the (address, id) of an announcement, or None if it is garbled.
+def parse_claim(value):
+    fields = value.split(".")
+    try:
+        if len(fields) == 2 and len(fields[0]) == 4:
+            return int(fields[0], 16), int(fields[1], 16)
+    except ValueError:
+        pass
+    return None
+
+# Formats (address, id, name) directory entries for a ping.
+def format_entries(entries):
+    return ",".join(format_claim(addr, uid) + "." + name
+                    for addr, uid, name in entries)
+
+# Bytes an entry takes in a ping, with the comma before it.
+def entry_size(name):
+    return len(format_claim(0, 0)) + len(name) + 2
+
+# Returns the (address, id, name) entries of a ping, skipping garbled ones.
+def parse_entries(value):
+    entries = []
+    for item in value.split(","):
+        fields = item.split(".", 2)
+        claim = parse_claim(".".join(fields[:2]))
+        if claim != None and len(fields) == 3 and fields[2]:
+            entries.append(claim + (fields[2],))
+    return entries
+
+class Entry(object):
+    __slots__ = ("name", "uid", "expires")
+
+    def __init__(self, name, uid, expires):
+        self.name = name
+        self.uid = uid # None for a node known by the hash of its name
+        self.expires = expires
+
+class Directory(object):
+    """
+    Thread-safe cache of the name and id behind each address heard of.
+    Entries are kept in the order they were last refreshed, which is also
+    expiry order, so keeping the cache fresh and bounded costs constant
+    time like relay.SeenCache, and the addresses sharing each name are
+    indexed so that labels are found without a search.
+    """
+    def __init__(self, lifetime = DIRECTORY_TIME, capacity = DIRECTORY_SIZE,
+                 clock = time.time):
+        self.lifetime = lifetime
+        self.capacity = capacity
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.entries = collections.OrderedDict() # address -> Entry
+        self.byName = {} # name -> set of addresses
+        # addresses whose entries changed since they were last announced
+        self.fresh = collections.deque(maxlen = capacity)
+        self.turn = 0 # how far the gossip has gone through the entries
+
+    # Records that addr belongs to the named node, with uid None for nodes
+    # known by the hash of their name. Entries only heard of from other
+    # nodes do not keep an entry alive. Returns whether anything changed.
+    def learn(self, addr, name, uid = None, heard = True):
+        now = self.clock()
+        with self.lock:
+            self.expire(now)
+            entry = self.entries.get(addr)
+            if entry != None and entry.name == name and entry.uid == uid:
+                if heard:
+                    entry.expires = now + self.lifetime
+                    del self.entries[addr]
+                    self.entries[addr] = entry
+                return False
+            if entry != None:
+                self.remove(addr)
+            self.entries[addr] = Entry(name, uid, now + self.lifetime)
+            self.byName.setdefault(name, set()).add(addr)
+            if len(self.entries) > self.capacity:
+                self.remove(next(iter(self.entries)))
+            if uid != None:
+                self.fresh.append(addr)
+            return True
+
+    # Records several (address, name) pairs of nodes known by the hash of
+    # their name.
+    def update(self, pairs):
+        for addr, name in pairs:
+            self.learn(addr, name)
+
+    # Drops an entry. Called with the lock held.
+    def remove(self, addr):
+        entry = self.entries.pop(addr)
+        addrs = self.byName[entry.name]
+        addrs.discard(addr)
+        if not addrs:
+            del self.byName[entry.name]
+
+    # Drops entries not refreshed for a lifetime. Called with the lock held.
+    def expire(self, now):
+        while self.entries:
+            addr = next(iter(self.entries))
+            if self.entries[addr].expires > now:
+                break
+            self.remove(addr)
+
+    # Returns the name of the node using addr, or None if not known.
+    def name(self, addr):
+        entry = self.entries.get(addr)
+        return None if entry == None else entry.name
+
+    # Returns the id of the node using addr, or None if it has none.
+    def uid(self, addr):
+        entry = self.entries.get(addr)
+        return None if entry == None else entry.uid
+
+    # Whether the node using addr announced an address of its own.
+    def assigned(self, addr):
+        return self.uid(addr) != None
+
+    # Returns how a node is shown: its name, with its address after it if
+    # another node has the same name, or only the address, as #ADDR, if the
+    # name is not known.
+    def label(self, addr):
+        with self.lock:
+            entry = self.entries.get(addr)
+            if entry == None:
+                return "#%04X" % addr
+            if len(self.byName[entry.name]) > 1:
+                return "%s#%04X" % (entry.name, addr)
+            return entry.name
+
+    # Returns the label of every address used by a node of one of the names.
+    def labels(self, names):
+        with self.lock:
+            addrs = set()
+            for name in names:
+                addrs.update(self.byName.get(name, ()))
+        return dict((addr, self.label(addr)) for addr in addrs)
+
+    # Returns the address of a node shown as label, or None if not known.
+    # Only labels with a # in them are read as addresses, so a node named
+    # like one, such as BEEF, is not mistaken for it.
+    def resolve(self, label):
+        with self.lock:
+            addrs = self.byName.get(label)
+            if addrs:
+                # the most recently heard of several nodes of that name
+                if len(addrs) == 1:
+                    return next(iter(addrs))
+                return max(addrs, key = lambda addr:
+                           self.entries[addr].expires)
+            name, mark, number = label.rpartition("#")
+            if not mark or len(number) != 4:
+                return None
+            try:
+                addr = int(number, 16)
+            except ValueError:
+                return None
+            # an address not heard of yet is taken at its word
+            if not name or self.name(addr) in (None, name):
+                return addr
+            return None
+
+    # Returns the next few (address, id, name) entries with ids to announce,
+    # taking up no more than size bytes unless a single one is longer.
+    # Entries which changed since they were last announced go first, as
+    # many as fit, so new nodes spread about a hop a ping; otherwise count
+    # of the rest take turns over successive pings.
+    def gossip(self, size, count = GOSSIP_ENTRIES):
+        with self.lock:
+            chosen = []
+            used = 0
+            while self.fresh:
+                addr = self.fresh[0]
+                entry = self.entries.get(addr)
+                if entry == None or entry.uid == None or \
+                        "," in entry.name or \
+                        any(addr == other for other, u, n in chosen):
+                    self.fresh.popleft()
+                    continue
+                used += entry_size(entry.name)
+                if chosen and used > size:
+                    break
+                self.fresh.popleft()
+                chosen.append((addr, entry.uid, entry.name))
+            if chosen:
+                return chosen
+            entries = [(addr, entry.uid, entry.name)
+                       for addr, entry in self.entries.items()
+                       if entry.uid != None and "," not in entry.name]
+        if not entries:
+            return []
+        start = self.turn % len(entries)
+        chosen = []
+        used = 0
+        for entry in (entries[start:] + entries[:start])[:count]:
+            used += entry_size(entry[2])
+            if chosen and used > size:
+                break
+            chosen.append(entry)
+        self.turn = start + len(chosen)
+        return chosen
+
+    def __contains__(self, addr):
+        return addr in self.entries
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,307 @@
+"""
+Network Testing Application
+
+This application allows for the sending and retrieval of data across a network
+which uses serial ports on multiple machines. It adopts its own protocol and
+allows for text to be sent from one machine to another.
+
+Author: Nick Klose (nick.klose@ualberta.ca)
+http://ualberta.ca/~klose
+
+Reliable delivery of text messages with selective repeat. Each message to
+a node gets the next sequence number of the stream to that node and goes
+out as a TEXT packet with the protocol.RELIABLE flag, its payload starting
+with
+
+    EPOCH (2) | SEQUENCE (2) | BASE (2)
+
+where EPOCH is picked at random when the sender starts, so a restarted
+node is not taken for an old one, and BASE is the oldest sequence the
+sender is still trying to deliver. Up to WINDOW messages may be waiting
+for an acknowledgement at once and more wait their turn. The recipient
+hands each new message over as it arrives and answers with an ACK packet
+
+    EPOCH (2) | NEXT (2) | RECEIVED (4)
+
+where every sequence before NEXT arrived and bit i of RECEIVED is set if
+NEXT + 1 + i arrived as well. The sender sends a message again when its
+retransmit timeout passes, or as soon as DUPLICATES messages after it have
+been acknowledged, and gives up after MAX_TRANSMISSIONS. Only the missing
+messages are repeated. The timeout is worked out from the round trip times
+measured as Jacobson and Karels describe, leaving out messages which were
+sent more than once (Karn's algorithm), and doubles with each timeout.
+Times are counted from when a message is expected to have left the port,
+so a long outbox on a slow link neither sets off timeouts nor counts as
+round trip time.
+"""
+import time
+import random
+import struct
+import threading
+import collections
+
+DATA = struct.Struct("!HHH")
+ACK = struct.Struct("!HHI")
+
+WINDOW = 32 # messages waiting for an acknowledgement at most
+DUPLICATES = 3 # later messages acknowledged before a missing one is resent
+MAX_TRANSMISSIONS = 8 # times a message is sent before giving up
+INITIAL_RTO = 3.0 # seconds to wait before the first round trip is measured
+MIN_RTO = 1.0
+MAX_RTO = 60.0
+GRANULARITY = 0.1 # seconds between checks for messages to resend
+ALPHA = 1.0 / 8 # weight of a new sample in the smoothed round trip time
+BETA = 1.0 / 4 # and in its variation
+SEQUENCES = 0x10000
+
+# How a message ended up
+DELIVERED = "delivered"
+FAILED = "failed"
+
+# Returns how far sequence a is ahead of sequence b, modulo SEQUENCES.
+def distance(a, b):
+    return (a - b) % SEQUENCES
+
+class RttEstimator(object):
+    """
+    Retransmit timeout of one stream, from its smoothed round trip time
+    and the variation in it.
+    """
+    def __init__(self):
+        self.srtt = None # smoothed round trip time
+        self.rttvar = None # smoothed variation of the round trip time
+        self.rto = INITIAL_RTO
+
+    def sample(self, rtt):
+        if self.srtt == None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2.0
+        else:
+            self.rttvar += BETA * (abs(self.srtt - rtt) - self.rttvar)
+            self.srtt += ALPHA * (rtt - self.srtt)
+        self.rto = max(MIN_RTO, min(MAX_RTO, self.srtt +
+                                    max(GRANULARITY, 4 * self.rttvar)))
+
+    def backoff(self):
+        self.rto = min(MAX_RTO, self.rto * 2)
+
+class Outstanding(object):
+    """
+    A message sent and not yet acknowledged.
+    """
+    def __init__(self, sequence, text, key):
+        self.sequence = sequence
+        self.text = text
+        self.key = key # identifies the message to the caller
+        self.sent = None # time of the latest transmission
+        self.transmissions = 0
+        self.deadline = None # time to send it again
+        self.order = None # number of the latest transmission in the stream
+        self.skipped = 0 # messages sent after it which were acknowledged
+
+class Sender(object):
+    """
+    Messages on their way to one node. Payloads are handed to send(), which
+    returns the seconds until they will have left the port.
+    """
+    def __init__(self, epoch, send):
+        self.epoch = epoch
+        self.send = send
+        self.next = 0 # sequence of the next message
+        self.window = collections.OrderedDict() # sequence -> Outstanding
+        self.waiting = collections.deque() # messages not yet in the window
+        self.rtt = RttEstimator()
+        self.transmissions = 0 # transmissions of every message so far
+
+    # The oldest sequence not acknowledged yet.
+    def base(self):
+        if self.window:
+            return next(iter(self.window))
+        return self.next
+
+    # Adds a message, sending it if the window has room.
+    def queue(self, text, key, now):
+        self.waiting.append((text, key))
+        self.fill(now)
+
+    # Moves waiting messages into the window while there is room.
+    def fill(self, now):
+        while self.waiting and len(self.window) < WINDOW:
+            text, key = self.waiting.popleft()
+            message = Outstanding(self.next, text, key)
+            self.window[self.next] = message
+            self.next = (self.next + 1) % SEQUENCES
+            self.transmit(message, now)
+
+    def transmit(self, message, now):
+        delay = self.send(DATA.pack(self.epoch, message.sequence,
+                                    self.base()) + message.text)
+        message.sent = now + delay
+        message.transmissions += 1
+        self.transmissions += 1
+        message.order = self.transmissions
+        message.deadline = message.sent + self.rtt.rto
+        message.skipped = 0
+
+    def is_acknowledged(self, sequence, nextSequence, received):
+        ahead = distance(sequence, nextSequence)
+        if ahead >= SEQUENCES // 2:
+            return True
+        return 0 < ahead <= 32 and received & (1 << (ahead - 1))
+
+    # Handles an acknowledgement, sending again the messages it shows to be
+    # lost. Returns the messages delivered, as (key, DELIVERED) tuples.
+    def acknowledge(self, nextSequence, received, now):
+        finished = []
+        newest = 0
+        for sequence, message in list(self.window.items()):
+            if self.is_acknowledged(sequence, nextSequence, received):
+                del self.window[sequence]
+                finished.append((message.key, DELIVERED))
+                if message.transmissions == 1:
+                    self.rtt.sample(max(0.0, now - message.sent))
+                newest = max(newest, message.order)
+        # messages sent before one which arrived are likely lost
+        for message in list(self.window.values()):
+            if message.order < newest:
+                message.skipped += 1
+                if message.skipped == DUPLICATES:
+                    self.transmit(message, now)
+        self.fill(now)
+        return finished
+
+    # Sends again the messages whose timeout passed. Returns the messages
+    # given up on, as (key, FAILED) tuples.
+    def due(self, now):
+        ready = []
+        finished = []
+        timedOut = False
+        for sequence, message in list(self.window.items()):
+            if message.deadline > now:
+                continue
+            if message.transmissions >= MAX_TRANSMISSIONS:
+                del self.window[sequence]
+                finished.append((message.key, FAILED))
+            else:
+                timedOut = True
+                ready.append(message)
+        if timedOut:
+            self.rtt.backoff()
+        for message in ready:
+            self.transmit(message, now)
+        self.fill(now)
+        return finished
+
+class Receiver(object):
+    """
+    Messages arriving from one node.
+    """
+    def __init__(self, epoch):
+        self.epoch = epoch
+        self.next = 0 # every sequence before this one arrived
+        self.received = set() # sequences after next which arrived
+
+    # Skips the sequences the sender gave up on.
+    def advance(self, base):
+        if 0 < distance(base, self.next) < SEQUENCES // 2:
+            self.received = set(sequence for sequence in self.received
+                                if distance(sequence, base) < SEQUENCES // 2)
+            self.next = base
+        while self.next in self.received:
+            self.received.discard(self.next)
+            self.next = (self.next + 1) % SEQUENCES
+
+    # Takes a message. Returns whether it is new.
+    def receive(self, sequence, base):
+        self.advance(base)
+        ahead = distance(sequence, self.next)
+        if ahead >= SEQUENCES // 2 or sequence in self.received:
+            return False
+        self.received.add(sequence)
+        self.advance(self.next)
+        return True
+
+    def acknowledgement(self):
+        bits = 0
+        for sequence in self.received:
+            ahead = distance(sequence, self.next)
+            if 0 < ahead <= 32:
+                bits |= 1 << (ahead - 1)
+        return ACK.pack(self.epoch, self.next, bits)
+
+class Reliable(object):
+    """
+    Thread-safe reliable delivery state of a node, with a Sender for each
+    node it sends to and a Receiver for each node it hears from. Nodes are
+    identified by their short addresses. Payloads are sent with
+    transmit(address, payload), which returns the seconds until they will
+    have left the port.
+    """
+    def __init__(self, transmit, clock = time.time):
+        self.transmit = transmit
+        self.clock = clock
+        self.epoch = random.randint(0, SEQUENCES - 1)
+        self.lock = threading.Lock()
+        self.senders = {} # address -> Sender
+        self.receivers = {} # address -> Receiver
+
+    # Queues a message to a node.
+    def send(self, dst, text, key):
+        with self.lock:
+            sender = self.senders.get(dst)
+            if sender == None:
+                sender = self.senders[dst] = Sender(
+                    self.epoch, lambda payload: self.transmit(dst, payload))
+            sender.queue(text, key, self.clock())
+
+    # Takes the payload of a reliable message from a node. Returns its text,
+    # or None if it is a copy of one already received, and the payload of
+    # the acknowledgement to send back.
+    def receive(self, src, payload):
+        if len(payload) < DATA.size:
+            return None, None
+        epoch, sequence, base = DATA.unpack_from(payload)
+        with self.lock:
+            receiver = self.receivers.get(src)
+            if receiver == None or receiver.epoch != epoch:
+                # the first message heard, or the sender restarted
+                receiver = self.receivers[src] = Receiver(epoch)
+                receiver.next = base
+            new = receiver.receive(sequence, base)
+            ack = receiver.acknowledgement()
+        return (payload[DATA.size:] if new else None), ack
+
+    # Handles an acknowledgement from a node. Returns the messages it
+    # finished, as (key, state) tuples.
+    def acknowledge(self, src, payload):
+        if len(payload) < ACK.size:
+            return []
+        epoch, nextSequence, received = ACK.unpack_from(payload)
+        with self.lock:
+            sender = self.senders.get(src)
+            if sender == None or epoch != self.epoch:
+                return []
+            return sender.acknowledge(nextSequence, received, self.clock())
+
+    # Sends again the messages whose timeout passed. Returns the messages
+    # given up on, as (address, key, state) tuples.
+    def due(self):
+        now = self.clock()
+        finished = []
+        with self.lock:
+            for dst, sender in self.senders.items():
+                finished += [(dst, key, state)
+                             for key, state in sender.due(now)]
+        return finished
+
+    # Returns the messages not acknowledged yet.
+    def pending(self):
+        with self.lock:
+            return sum(len(sender.window) + len(sender.waiting)
+                       for sender in self.senders.values())
+
+    # Returns the retransmit timeout towards a node.
+    def rto(self, dst):
+        with self.lock:
+            sender = self.senders.get(dst)
+            return sender.rtt.rto if sender != None else INITIAL_RTO
@@ -0,0 +1,268 @@
+"""
+Network Testing Application
+
+This application allows for the sending and retrieval of data across a network
+which uses serial ports on multiple machines. It adopts its own protocol and
+allows for text to be sent from one machine to another.
+
+Author: Nick Klose (nick.klose@ualberta.ca)
+http://ualberta.ca/~klose
+
+Microbenchmarks for the receive loop and message construction, driven by
+synthetic byte streams through a VirtualSerial so no hardware is needed.
+
+    python bench.py                      # run and print the results
+    python bench.py --save base.json     # keep the results as a baseline
+    python bench.py --compare base.json  # fail if anything got slower
+
+Streams are generated from a fixed seed so every run sees the same bytes.
+"""
+import sys
+import gc
+import time
+import json
+import random
+import argparse
+import protocol
+from node import Node, NodeEvents
+from serial_listen import SerialListen
+from virtual_serial import VirtualSerial
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+NAMES = ["Donut", "Penguin", "Stumpy", "Whicker", "Howard", "Disco"]
+SEED = 491
+FRAMES = 2000 # frames per stream by default, enough to finish in seconds
+MAX_READS = 20000 # reads per receive run, so tiny reads do not take minutes
+
+class BenchEvents(NodeEvents):
+    """
+    Records when each delivered frame left the receive loop.
+    """
+    def __init__(self, port):
+        self.port = port
+        self.latencies = []
+
+    def mark(self):
+        self.latencies.append(time.time() - self.port.lastRead)
+
+    def received(self, sender, text):
+        self.mark()
+
+    def relayed(self, sender, recipient, text):
+        self.mark()
+
+    def node_added(self, name):
+        self.mark()
+
+def random_text(rng, low = 8, high = 120):
+    length = rng.randint(low, high)
+    return "".join(rng.choice("abcdefghijklmnopqrstuvwxyz ")
+                   for i in range(length))
+
+# Legacy brace frames: a ping followed by a few messages, repeatedly.
+def legacy_stream(count, rng):
+    parts = []
+    for i in range(count):
+        if i % 10 == 0:
+            parts.append("{NAME=" + rng.choice(NAMES) + "}")
+        else:
+            parts.append("{FROM=" + rng.choice(NAMES) + "}{TO=" +
+                         rng.choice(NAMES) + "}{TEXT=" + random_text(rng) + "}")
+    return "".join(parts).encode("ascii")
+
+# Binary version 2 text frames between the same names.
+def binary_stream(count, rng):
+    parts = []
+    for i in range(count):
+        packet = protocol.Packet(protocol.TEXT,
+                                 protocol.address(rng.choice(NAMES)),
+                                 protocol.address(rng.choice(NAMES)),
+                                 random_text(rng).encode("ascii"))
+        parts.append(protocol.encode(packet))
+    return b"".join(parts)
+
+# Binary frames with one byte in every twenty frames flipped.
+def noisy_stream(count, rng):
+    data = bytearray(binary_stream(count, rng))
+    for i in range(count // 20):
+        data[rng.randrange(len(data))] ^= 0xFF
+    return bytes(data)
+
+STREAMS = [("legacy", legacy_stream), ("binary", binary_stream),
+           ("noisy", noisy_stream)]
+
+def make_node(port):
+    core = Node()
+    core.serial = port
+    core.name = "Donut"
+    core.v2Nodes.update(NAMES)
+    core.directory.update((protocol.address(n), n) for n in NAMES)
+    return core
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+# Counts memory blocks allocated and still live after running func. Python
+# 2 has no tracemalloc, so there the objects the garbage collector tracks
+# are counted instead, with collection held off so that none are missed.
+def allocations(func):
+    gc.collect()
+    if tracemalloc == None:
+        before = len(gc.get_objects())
+        gc.disable()
+        try:
+            func()
+            return max(0, len(gc.get_objects()) - before)
+        finally:
+            gc.enable()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    func()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    return sum(max(0, stat.count_diff)
+               for stat in after.compare_to(before, "filename"))
+
+# Feeds a stream through SerialListen.poll and reports its throughput.
+def bench_receive(data, chunkSize):
+    port = VirtualSerial(data, chunkSize)
+    events = BenchEvents(port)
+    core = make_node(port)
+    core.events = events
+    listener = SerialListen(core)
+
+    start = time.time()
+    while port.incoming:
+        listener.poll()
+    elapsed = max(time.time() - start, 1e-9)
+
+    frames = listener.parser.frames
+    result = {
+        "frames/s": frames / elapsed,
+        "bytes/s": len(data) / elapsed,
+        "latency p50 us": percentile(events.latencies, 0.5) * 1e6,
+        "latency p99 us": percentile(events.latencies, 0.99) * 1e6,
+        "corrupt": listener.parser.corrupt,
+    }
+
+    # count allocations on a fresh listener with a smaller slice
+    sample = data[:len(data) // 10]
+    port = VirtualSerial(sample, chunkSize)
+    core = make_node(port)
+    listener = SerialListen(core)
+    def drain():
+        while port.incoming:
+            listener.poll()
+    blocks = allocations(drain)
+    if blocks != None and listener.parser.frames:
+        result["allocs/frame"] = float(blocks) / listener.parser.frames
+    return result
+
+# Times Node.send for legacy or binary framing.
+def bench_send(count, binary):
+    rng = random.Random(SEED)
+    port = VirtualSerial()
+    core = make_node(port)
+    if not binary:
+        core.v2Nodes.clear()
+    texts = [random_text(rng) for i in range(100)]
+
+    # every frame goes through the outbox, as it would with a writer thread
+    def send(i):
+        core.send(core.name, "Penguin", texts[i % 100])
+        core.flush()
+
+    def run():
+        for i in range(count):
+            send(i)
+
+    start = time.time()
+    run()
+    elapsed = max(time.time() - start, 1e-9)
+    result = {"frames/s": count / elapsed, "bytes/s": len(port.written) / elapsed,
+              "bytes/frame": float(len(port.written)) / count}
+    blocks = allocations(lambda: [send(i) for i in range(count // 10)])
+    if blocks != None:
+        result["allocs/frame"] = float(blocks) / (count // 10)
+    return result
+
+# Times building ping messages.
+def bench_ping(count):
+    core = make_node(VirtualSerial())
+    start = time.time()
+    for i in range(count):
+        core.ping_message()
+    elapsed = max(time.time() - start, 1e-9)
+    return {"frames/s": count / elapsed}
+
+# Runs a benchmark several times and keeps the fastest run.
+def best(repeat, func, *args):
+    results = [func(*args) for i in range(repeat)]
+    return max(results, key = lambda result: result["frames/s"])
+
+def run(count, chunkSizes, repeat = 3):
+    results = {}
+    for name, stream in STREAMS:
+        data = stream(count, random.Random(SEED))
+        for chunkSize in chunkSizes:
+            key = "receive %s chunk=%d" % (name, chunkSize)
+            results[key] = best(repeat, bench_receive,
+                                data[:chunkSize * MAX_READS], chunkSize)
+    results["send legacy"] = best(repeat, bench_send, count, False)
+    results["send binary"] = best(repeat, bench_send, count, True)
+    results["ping"] = best(repeat, bench_ping, count)
+    return results
+
+def report(results, out = sys.stdout):
+    for key in sorted(results):
+        values = results[key]
+        fields = ["%s %.1f" % (name, values[name]) for name in sorted(values)]
+        out.write("%-30s %s\n" % (key, "  ".join(fields)))
+
+# Lists every frames/s figure that dropped by more than the tolerance.
+def compare(results, baseline, tolerance):
+    slower = []
+    for key, values in baseline.items():
+        if key not in results:
+            continue
+        before = values["frames/s"]
+        after = results[key]["frames/s"]
+        if after < before * (1.0 - tolerance):
+            slower.append("%s: %.0f -> %.0f frames/s" % (key, before, after))
+    return slower
+
+def main(argv):
+    parser = argparse.ArgumentParser(description = "Hot path benchmarks")
+    parser.add_argument("--frames", type = int, default = FRAMES)
+    parser.add_argument("--chunk", type = int, action = "append",
+                        help = "read size in bytes, may be repeated")
+    parser.add_argument("--repeat", type = int, default = 3,
+                        help = "runs per benchmark, the fastest is kept")
+    parser.add_argument("--save", help = "write the results to a JSON file")
+    parser.add_argument("--compare", help = "baseline JSON to compare with")
+    parser.add_argument("--tolerance", type = float, default = 0.2,
+                        help = "allowed slowdown before failing (0.2 = 20%%)")
+    args = parser.parse_args(argv[1:])
+
+    results = run(args.frames, args.chunk or [1, 64, 4096], args.repeat)
+    report(results)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent = 1, sort_keys = True)
+    if args.compare:
+        with open(args.compare) as f:
+            slower = compare(results, json.load(f), args.tolerance)
+        for line in slower:
+            sys.stdout.write("SLOWER " + line + "\n")
+        return 1 if slower else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
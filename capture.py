@@ -0,0 +1,101 @@
+"""
+Network Testing Application
+
+This application allows for the sending and retrieval of data across a network
+which uses serial ports on multiple machines. It adopts its own protocol and
+allows for text to be sent from one machine to another.
+
+Author: Nick Klose (nick.klose@ualberta.ca)
+http://ualberta.ca/~klose
+
+Raw captures of the bytes a port reads and writes, for replay.py to feed
+back through the receive path later. A capture file starts with MAGIC and
+a line of JSON describing the node and port, followed by one record per
+read or write:
+
+    TIME (8) | DIRECTION | LENGTH (4) | DATA
+
+with the time a double of seconds since the epoch, in network byte order.
+Each read is kept whole, so a replay hands the parser the same chunks the
+port did. Records go through a large file buffer which the node flushes
+every FLUSH_INTERVAL seconds, so capturing costs little more than a copy.
+"""
+import os
+import json
+import time
+import struct
+import threading
+
+MAGIC = b"NTCAP1\n"
+RECORD = struct.Struct("!dBI")
+BUFFER_SIZE = 65536 # bytes buffered before the file is written
+FLUSH_INTERVAL = 1.0 # seconds between flushes of the buffer
+
+# Directions of a record
+IN = 0 # read from the port
+OUT = 1 # written to the port
+
+class CaptureFile(object):
+    """
+    Thread-safe writer of a capture file.
+    """
+    def __init__(self, path, info):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, "wb", BUFFER_SIZE)
+        self.file.write(MAGIC)
+        self.file.write(json.dumps(info, sort_keys = True).encode("utf-8") +
+                        b"\n")
+        self.bytes = 0 # bytes of data captured
+
+    def write(self, direction, data):
+        now = time.time()
+        with self.lock:
+            if self.file == None:
+                return
+            self.file.write(RECORD.pack(now, direction, len(data)))
+            self.file.write(data)
+            self.bytes += len(data)
+
+    def flush(self):
+        with self.lock:
+            if self.file != None:
+                self.file.flush()
+
+    def close(self):
+        with self.lock:
+            if self.file != None:
+                self.file.close()
+                self.file = None
+
+# Returns a new file name in directory for a capture of a port.
+def capture_path(directory, name, port):
+    port = "".join(c if c.isalnum() else "_" for c in str(port))
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(directory, "%s-%s-%s.cap" % (name, port, stamp))
+    number = 1
+    while os.path.exists(path):
+        number += 1
+        path = os.path.join(directory, "%s-%s-%s-%d.cap" % (name, port,
+                                                            stamp, number))
+    return path
+
+# Reads a capture file. Returns the description of the node and port, and
+# a list of (time, direction, data) records. A record cut short by the end
+# of the file, as when the capturing node was killed, is left out.
+def read_capture(path):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(path + " is not a capture file")
+        info = json.loads(f.readline().decode("utf-8"))
+        data = f.read()
+    records = []
+    offset = 0
+    while offset + RECORD.size <= len(data):
+        when, direction, length = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        if offset + length > len(data):
+            break
+        records.append((when, direction, data[offset:offset + length]))
+        offset += length
+    return info, records
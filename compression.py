@@ -0,0 +1,130 @@
+"""
+Network Testing Application
+
+This application allows for the sending and retrieval of data across a network
+which uses serial ports on multiple machines. It adopts its own protocol and
+allows for text to be sent from one machine to another.
+
+Author: Nick Klose (nick.klose@ualberta.ca)
+http://ualberta.ca/~klose
+
+Payload compression for binary frames. Payloads are raw deflate streams
+primed with a preset dictionary of the words and phrases our messages are
+made of, so even a short message compresses. zlib on Python 2 takes no
+dictionary argument, so instead a compressor and a decompressor are run
+over the dictionary once at startup and copied for every payload, which
+gives the same result.
+
+A payload is only sent compressed when that makes it smaller, and the
+frame then carries the protocol.COMPRESSED flag. Kinds of payload which
+keep failing to shrink, such as image tiles which are JPEG already, are
+only tried now and then. Nodes advertise the dictionary they use with a
+{ZIP=...} frame in their ping, and only compress for nodes using the same.
+
+Run this module to print the ratio and cost for a few sample messages.
+"""
+import time
+import zlib
+import threading
+
+LEVEL = 9 # zlib compression level
+MISS_LIMIT = 8 # payloads in a row which did not shrink before backing off
+RETRY_EVERY = 16 # payloads between attempts for a kind which backed off
+
+# Text our messages are usually made of. The most common strings go last,
+# where deflate finds them with the shortest distances. Changing it makes
+# nodes unable to read each other, so DICTIONARY_ID must change with it.
+DICTIONARY_ID = 1
+DICTIONARY = (
+    b"Donut Penguin Stumpy Whicker Howard Wilshire Disco Jack Bear Sneak "
+    b"Wisp Crazy Goat Pirate Hambone Walla Snake Caboose Sleepy Stompy "
+    b"Mopey Dopey Weasel Ghost Dasher Grumpy Hollywood Noodle Cupid Abraham "
+    b"Prancer Blinky Bonobo Banana Cinnabon "
+    b"0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz "
+    b"abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 "
+    b"SOAK SOAKCFG test message node link port baud serial network relay "
+    b"route hop packet frame image send sent received lost error ok "
+    b"Can you hear me? Is anyone there? Testing, testing, one two three. "
+    b"Please reply when you get this. Meet at the lab at noon. "
+    b"the quick brown fox jumps over the lazy dog. "
+    b"Hello, how are you? I am fine, thank you. Yes. No. Thanks! "
+    b"The Hi Hello Are you there? What is your What is the "
+    b" and the of the to the in the for the is the that it you "
+    b" the ")
+
+class Codec(object):
+    """
+    Compresses and expands payloads with a preset dictionary. The copies
+    made for each payload leave the primed streams untouched, so one codec
+    can be shared by every thread of a node.
+    """
+    def __init__(self, dictionary = DICTIONARY, level = LEVEL):
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        primer = compressor.compress(dictionary)
+        primer += compressor.flush(zlib.Z_SYNC_FLUSH)
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        decompressor.decompress(primer)
+        self.compressor = compressor
+        self.decompressor = decompressor
+        self.lock = threading.Lock()
+        self.misses = {} # payload kind -> payloads in a row not shrinking
+        self.skipped = {} # payload kind -> payloads skipped since backing off
+
+    # Returns the compressed form of data, or None if it is not smaller.
+    def compress(self, data):
+        stream = self.compressor.copy()
+        compressed = stream.compress(data) + stream.flush()
+        return compressed if len(compressed) < len(data) else None
+
+    # Like compress(), but gives up on a kind of payload for a while after
+    # it failed to shrink MISS_LIMIT times in a row.
+    def try_compress(self, data, kind):
+        with self.lock:
+            if self.misses.get(kind, 0) >= MISS_LIMIT:
+                skipped = self.skipped.get(kind, 0) + 1
+                self.skipped[kind] = skipped % RETRY_EVERY
+                if skipped < RETRY_EVERY:
+                    return None
+        compressed = self.compress(data)
+        with self.lock:
+            if compressed != None:
+                self.misses[kind] = 0
+            else:
+                self.misses[kind] = self.misses.get(kind, 0) + 1
+        return compressed
+
+    # Expands a compressed payload. Raises ValueError if it is damaged or
+    # would expand beyond limit bytes.
+    def expand(self, data, limit):
+        stream = self.decompressor.copy()
+        try:
+            expanded = stream.decompress(data, limit)
+        except zlib.error as e:
+            raise ValueError("Damaged compressed payload: " + str(e))
+        if stream.unconsumed_tail:
+            raise ValueError("Compressed payload expands beyond " +
+                             str(limit) + " bytes")
+        return expanded
+
+if __name__ == "__main__":
+    codec = Codec()
+    for text in (b"hi", b"Meet me at the library at five.",
+                 b"Donut, can you hear me? Please reply when you get this.",
+                 b"SOAK 0 17 1382054400.123456 3F2A qrstuvwxyzABCDEFGHIJKLMN"
+                 b"OPQRSTUVWXYZ0123456789abcdefghijklmnop",
+                 b"x" * 200):
+        start = time.time()
+        for i in range(1000):
+            compressed = codec.compress(text)
+        compressTime = (time.time() - start) / 1000
+        size = len(text)
+        expandTime = 0.0
+        if compressed != None:
+            size = len(compressed)
+            start = time.time()
+            for i in range(1000):
+                codec.expand(compressed, len(text))
+            expandTime = (time.time() - start) / 1000
+        print("%3d byte text: %3d bytes sent (%5.1f%%), compress %5.1f us, "
+              "expand %5.1f us" % (len(text), size, 100.0 * size / len(text),
+                                   compressTime * 1e6, expandTime * 1e6))
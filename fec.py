@@ -0,0 +1,411 @@
+"""
+Network Testing Application
+
+This application allows for the sending and retrieval of data across a network
+which uses serial ports on multiple machines. It adopts its own protocol and
+allows for text to be sent from one machine to another.
+
+Author: Nick Klose (nick.klose@ualberta.ca)
+http://ualberta.ca/~klose
+
+Forward error correction for noisy links. A binary frame sent with FEC is
+wrapped as
+
+    SYNC | PARITY | LENGTH (2) | HEADER PARITY (4) | BLOCK | BLOCK | ...
+
+where LENGTH bytes of the frame are cut into blocks of BLOCK_DATA bytes,
+the last one shorter, and each is followed by PARITY bytes of systematic
+Reed-Solomon code over GF(256). A block with up to PARITY / 2 bytes
+corrupted anywhere in it is put right; the header has a code of its own so
+the length can be trusted. The frame inside keeps its CRC, which catches
+the rare block decoded to the wrong data.
+
+Every node decodes FEC frames and says in its pings with {FEC=n} how many
+parity bytes it would like per block. Each link is set to send with FEC
+OFF, with a fixed number of parity bytes, or AUTO, where every node
+estimates the share of bytes corrupted on the way to it and asks its
+neighbours for the amount of parity giving the best goodput at that rate.
+Links only use FEC once every neighbour on them has advertised it, and
+pings and brace protocol frames always go out as they are.
+"""
+import struct
+import protocol
+
+SYNC = 0x03 # start of a coded frame, never used by the brace protocol
+HEADER = struct.Struct("!BH")
+HEADER_PARITY = 4
+HEADER_SIZE = 1 + HEADER.size + HEADER_PARITY
+BLOCK_DATA = 64 # frame bytes per block
+MAX_PARITY = 32
+MAX_FRAME = protocol.OVERHEAD + protocol.MAX_PAYLOAD
+
+# Parity bytes per block tried when adapting to the error rate
+LEVELS = (0, 2, 4, 8, 16, 32)
+
+# Sending modes of a link besides a fixed number of parity bytes
+OFF = 0
+AUTO = "auto"
+
+TUNE_INTERVAL = 10.0 # seconds between estimates of the error rate
+MIN_BYTES = 1024 # bytes needed in an interval to judge the error rate
+SMOOTHING = 0.5 # weight of the latest interval in the estimate
+MARGIN = 0.03 # goodput given up for more parity, as a share of the best
+
+PRIMITIVE = 0x11D # x^8 + x^4 + x^3 + x^2 + 1
+
+def _make_tables():
+    exp = [0] * 512
+    log = [0] * 256
+    x = 1
+    for i in range(255):
+        exp[i] = x
+        log[x] = i
+        x <<= 1
+        if x & 0x100:
+            x ^= PRIMITIVE
+    for i in range(255, 512):
+        exp[i] = exp[i - 255]
+    return exp, log
+
+EXP, LOG = _make_tables()
+
+def gf_mul(a, b):
+    if a == 0 or b == 0:
+        return 0
+    return EXP[LOG[a] + LOG[b]]
+
+def gf_div(a, b):
+    if b == 0:
+        raise ZeroDivisionError()
+    if a == 0:
+        return 0
+    return EXP[LOG[a] + 255 - LOG[b]]
+
+def gf_pow(a, n):
+    return EXP[(LOG[a] * n) % 255]
+
+def gf_inverse(a):
+    return EXP[255 - LOG[a]]
+
+# Polynomials are lists of coefficients, highest power first.
+def poly_scale(p, x):
+    return [gf_mul(c, x) for c in p]
+
+def poly_add(p, q):
+    size = max(len(p), len(q))
+    r = [0] * size
+    for i, c in enumerate(p):
+        r[i + size - len(p)] = c
+    for i, c in enumerate(q):
+        r[i + size - len(q)] ^= c
+    return r
+
+def poly_mul(p, q):
+    r = [0] * (len(p) + len(q) - 1)
+    for j, b in enumerate(q):
+        if b == 0:
+            continue
+        for i, a in enumerate(p):
+            r[i + j] ^= gf_mul(a, b)
+    return r
+
+def poly_eval(p, x):
+    y = p[0]
+    for c in p[1:]:
+        y = gf_mul(y, x) ^ c
+    return y
+
+_generators = {}
+
+# Returns the generator polynomial for a number of parity bytes.
+def generator(parity):
+    g = _generators.get(parity)
+    if g == None:
+        g = [1]
+        for i in range(parity):
+            g = poly_mul(g, [1, EXP[i]])
+        _generators[parity] = g
+    return g
+
+# Returns data followed by its parity bytes.
+def encode_block(data, parity):
+    gen = generator(parity)
+    out = bytearray(data) + bytearray(parity)
+    exp, log = EXP, LOG
+    for i in range(len(data)):
+        coef = out[i]
+        if coef != 0:
+            lc = log[coef]
+            for j in range(1, len(gen)):
+                if gen[j] != 0:
+                    out[i + j] ^= exp[lc + log[gen[j]]]
+    out[:len(data)] = data
+    return out
+
+def syndromes(block, parity):
+    return [poly_eval(block, EXP[i]) for i in range(parity)]
+
+# Finds the error locator polynomial with Berlekamp-Massey.
+def error_locator(synd, parity):
+    locator = [1]
+    old = [1]
+    for i in range(parity):
+        delta = synd[i]
+        for j in range(1, len(locator)):
+            delta ^= gf_mul(locator[-(j + 1)], synd[i - j])
+        old = old + [0]
+        if delta != 0:
+            if len(old) > len(locator):
+                new = poly_scale(old, delta)
+                old = poly_scale(locator, gf_inverse(delta))
+                locator = new
+            locator = poly_add(locator, poly_scale(old, delta))
+    while locator and locator[0] == 0:
+        del locator[0]
+    if (len(locator) - 1) * 2 > parity:
+        raise ValueError("Too many errors to correct")
+    return locator
+
+# Returns the positions in a block of length size where the locator has
+# its roots.
+def error_positions(locator, size):
+    reverse = locator[::-1]
+    positions = []
+    for i in range(size):
+        if poly_eval(reverse, gf_pow(2, i)) == 0:
+            positions.append(size - 1 - i)
+    if len(positions) != len(locator) - 1:
+        raise ValueError("Could not locate the errors")
+    return positions
+
+# Works out the error values at the given positions with Forney's algorithm
+# and corrects them in place.
+def correct(block, synd, positions):
+    powers = [len(block) - 1 - p for p in positions]
+    locator = [1]
+    for power in powers:
+        locator = poly_mul(locator, [gf_pow(2, power), 1])
+    evaluator = poly_mul(synd[::-1], locator)[-len(synd):]
+    roots = [gf_pow(2, power) for power in powers]
+    for i, root in enumerate(roots):
+        inverse = gf_inverse(root)
+        derivative = 1
+        for j, other in enumerate(roots):
+            if j != i:
+                derivative = gf_mul(derivative, 1 ^ gf_mul(inverse, other))
+        if derivative == 0:
+            raise ValueError("Could not correct the errors")
+        block[positions[i]] ^= gf_div(poly_eval(evaluator, inverse),
+                                      derivative)
+
+# Decodes a block of data followed by its parity bytes. Returns the data
+# and the number of bytes corrected, or raises ValueError if there were
+# too many errors.
+def decode_block(block, parity):
+    block = bytearray(block)
+    synd = syndromes(block, parity)
+    if max(synd) == 0:
+        return block[:len(block) - parity], 0
+    locator = error_locator(synd, parity)
+    positions = error_positions(locator, len(block))
+    correct(block, synd, positions)
+    if max(syndromes(block, parity)) != 0:
+        raise ValueError("Could not correct the errors")
+    return block[:len(block) - parity], len(positions)
+
+# Bytes taken by the blocks of a frame of the given length.
+def coded_size(length, parity):
+    blocks = (length + BLOCK_DATA - 1) // BLOCK_DATA
+    return length + blocks * parity
+
+# Wraps a frame with parity bytes per block.
+def encode(frame, parity):
+    if len(frame) > MAX_FRAME:
+        raise ValueError("Frame too large: " + str(len(frame)))
+    out = bytearray([SYNC])
+    out += encode_block(HEADER.pack(parity, len(frame)), HEADER_PARITY)
+    for start in range(0, len(frame), BLOCK_DATA):
+        out += encode_block(frame[start:start + BLOCK_DATA], parity)
+    return bytes(out)
+
+class Counters(object):
+    """
+    Blocks decoded on one link.
+    """
+    def __init__(self):
+        self.blocks = 0 # blocks decoded, whether they could be or not
+        self.corrected = 0 # blocks which had errors put right
+        self.failed = 0 # blocks with too many errors to put right
+        self.errors = 0 # bytes corrected, counting PARITY / 2 + 1 for each
+                        # block which failed
+
+    def count(self, fixed, failed = False):
+        self.blocks += 1
+        if failed:
+            self.failed += 1
+        elif fixed > 0:
+            self.corrected += 1
+        self.errors += fixed
+
+# Decodes the coded frame starting at buf[pos], which must hold the SYNC
+# byte, counting its blocks. Returns (frame, end) on success, (INCOMPLETE,
+# pos) if more bytes are needed and (CORRUPT, end) if the frame must be
+# skipped up to end, which can be trusted once the header block decoded.
+def decode(buf, pos, counters):
+    if len(buf) - pos < HEADER_SIZE:
+        return protocol.INCOMPLETE, pos
+    try:
+        header, fixed = decode_block(buf[pos + 1:pos + HEADER_SIZE],
+                                     HEADER_PARITY)
+    except ValueError:
+        return protocol.CORRUPT, pos + 1
+    parity, length = HEADER.unpack(bytes(header))
+    if parity == 0 or parity > MAX_PARITY or parity % 2 or length == 0 or \
+            length > MAX_FRAME:
+        return protocol.CORRUPT, pos + 1
+    end = pos + HEADER_SIZE + coded_size(length, parity)
+    if len(buf) < end:
+        return protocol.INCOMPLETE, pos
+    counters.count(fixed)
+
+    frame = bytearray()
+    offset = pos + HEADER_SIZE
+    while offset < end:
+        size = min(BLOCK_DATA, length - len(frame)) + parity
+        try:
+            data, fixed = decode_block(buf[offset:offset + size], parity)
+        except ValueError:
+            counters.count(parity // 2 + 1, True)
+            return protocol.CORRUPT, end
+        counters.count(fixed)
+        frame += data
+        offset += size
+    return bytes(frame), end
+
+# Probability that a block of size bytes with up to errors of them wrong
+# decodes, when each byte is wrong with probability rate.
+def block_success(size, errors, rate):
+    term = (1.0 - rate) ** size
+    total = term
+    for e in range(1, errors + 1):
+        if rate >= 1.0:
+            break
+        term *= (size - e + 1) / float(e) * rate / (1.0 - rate)
+        total += term
+    return min(1.0, total)
+
+# Expected share of the bytes sent which are frames arriving intact, for a
+# frame of the given length sent with a number of parity bytes per block.
+def goodput(length, parity, rate):
+    if parity == 0:
+        return (1.0 - rate) ** length
+    success = (1.0 - rate) * block_success(HEADER_SIZE - 1, HEADER_PARITY // 2,
+                                           rate)
+    for start in range(0, length, BLOCK_DATA):
+        size = min(BLOCK_DATA, length - start)
+        success *= block_success(size + parity, parity // 2, rate)
+    return success * length / float(HEADER_SIZE + coded_size(length, parity))
+
+# Returns the parity bytes per block giving the best goodput for frames of
+# the given length. Losing a fragment loses the whole message, so the most
+# parity within MARGIN of the best is taken.
+def best_parity(rate, length):
+    results = [(goodput(length, parity, rate), parity) for parity in LEVELS]
+    best = max(results)[0]
+    return max(parity for result, parity in results
+               if result >= best * (1.0 - MARGIN))
+
+# Reads a sending mode from the command line.
+def parse_mode(value):
+    if value == AUTO:
+        return AUTO
+    if value == "off":
+        return OFF
+    parity = int(value)
+    if parity < 0 or parity > MAX_PARITY or parity % 2:
+        raise ValueError("parity must be an even number up to " +
+                         str(MAX_PARITY))
+    return parity
+
+class LinkCoding(object):
+    """
+    FEC settings of one link: the mode it sends with, what each neighbour
+    on it asked for and the error rate seen arriving on it.
+    """
+    def __init__(self, mode = OFF, frameSize = MAX_FRAME):
+        self.mode = mode
+        self.frameSize = frameSize # typical frame length, until one is seen
+        self.peers = set() # nodes heard pinging on this link
+        self.requested = {} # parity asked for by each node supporting FEC
+        self.errorRate = 0.0 # estimated share of bytes arriving corrupted
+        self.wanted = 0 # parity to ask neighbours for in AUTO mode
+        self.mark = (0, 0, 0, 0) # totals passed to the last tune()
+
+    def heard(self, name):
+        self.peers.add(name)
+
+    def advertised(self, name, parity):
+        self.requested[name] = min(MAX_PARITY, parity - parity % 2)
+
+    # Parity bytes to send with, given the nodes still in range.
+    def parity(self, live):
+        if self.mode == OFF:
+            return 0
+        peers = self.peers & live
+        if not peers or any(name not in self.requested for name in peers):
+            return 0
+        if self.mode == AUTO:
+            return max(self.requested[name] for name in peers)
+        return self.mode
+
+    # Parity this node asks its neighbours on the link for.
+    def advertise(self):
+        if self.mode == AUTO:
+            return self.wanted
+        return self.mode
+
+    # Updates the error rate from the totals of bytes read and bytes found
+    # corrupted, and picks the parity to ask for, for frames as long as the
+    # binary frames received.
+    def tune(self, total, errors, frames, frameBytes):
+        seen = total - self.mark[0]
+        if seen < MIN_BYTES:
+            return
+        rate = min(1.0, (errors - self.mark[1]) / float(seen))
+        if frames > self.mark[2]:
+            self.frameSize = ((frameBytes - self.mark[3]) //
+                              (frames - self.mark[2]))
+        self.mark = (total, errors, frames, frameBytes)
+        self.errorRate += SMOOTHING * (rate - self.errorRate)
+        self.wanted = best_parity(self.errorRate, self.frameSize)
+
+if __name__ == "__main__":
+    # send frames through a channel corrupting random bytes and compare
+    # the goodput of each level of parity
+    import random
+    rng = random.Random(1)
+    frame = protocol.encode(protocol.Packet(protocol.TEXT, 1, 2,
+                                            b"x" * 128))
+    for rate in (0.0, 0.001, 0.005, 0.01, 0.03):
+        results = []
+        for parity in LEVELS:
+            intact = 0
+            sent = 0
+            counters = Counters()
+            for i in range(100):
+                data = encode(frame, parity) if parity else frame
+                sent += len(data)
+                noisy = bytearray(data)
+                for j in range(len(noisy)):
+                    if rng.random() < rate:
+                        noisy[j] ^= rng.randint(1, 255)
+                if parity:
+                    decoded, end = decode(noisy, 0, counters)
+                else:
+                    decoded = bytes(noisy)
+                if decoded == frame:
+                    intact += 1
+            results.append("%2d: %5.1f%%" % (parity, 100.0 * intact *
+                                             len(frame) / sent))
+        print("error rate %.3f, best %2d | %s"
+              % (rate, best_parity(rate, len(frame)), "  ".join(results)))
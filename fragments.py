@@ -0,0 +1,139 @@
+"""
+Network Testing Application
+
+This application allows for the sending and retrieval of data across a network
+which uses serial ports on multiple machines. It adopts its own protocol and
+allows for text to be sent from one machine to another.
+
+Author: Nick Klose (nick.klose@ualberta.ca)
+http://ualberta.ca/~klose
+
+Fragmentation of binary packets. A payload longer than the sender's MTU
+goes out as several frames of the same type with the protocol.FRAGMENT
+flag, each starting with
+
+    MESSAGE ID (2) | INDEX | COUNT
+
+where MESSAGE ID is the id of the whole packet. Every fragment has an id of
+its own, so relays pass fragments on one by one like any other frame and
+other traffic queued at a higher priority, pings above all, goes out
+between them. The destination puts the payload back together in a buffer
+of bounded size, giving up on messages which stay incomplete for longer
+than REASSEMBLY_TIMEOUT.
+"""
+import time
+import struct
+import threading
+import collections
+import protocol
+
+HEADER = struct.Struct("!HBB")
+MTU = 128 # default for the longest payload sent in one frame
+MIN_MTU = HEADER.size + 16
+MAX_FRAGMENTS = 255
+REASSEMBLY_TIMEOUT = 30.0 # seconds an incomplete message is kept
+REASSEMBLY_LIMIT = 64 * 1024 # bytes of incomplete messages kept at most
+
+# Returns the longest payload which can be sent with an MTU.
+def max_payload(mtu):
+    return MAX_FRAGMENTS * (mtu - HEADER.size)
+
+MAX_MESSAGE = max_payload(protocol.MAX_PAYLOAD) # longest payload of any MTU
+
+# Encodes a packet as a list of frames, none with a payload longer than
+# mtu. new_id gives the id of each fragment after the first.
+def split(packet, mtu, new_id):
+    payload = bytes(packet.payload)
+    if len(payload) <= mtu:
+        return [protocol.encode(packet)]
+    size = mtu - HEADER.size
+    count = (len(payload) + size - 1) // size
+    if count > MAX_FRAGMENTS:
+        raise ValueError("Payload too large: " + str(len(payload)))
+
+    frames = []
+    for index in range(count):
+        part = protocol.Packet(packet.kind, packet.src, packet.dst,
+                               HEADER.pack(packet.msgId, index, count) +
+                               payload[index * size:(index + 1) * size],
+                               packet.flags | protocol.FRAGMENT,
+                               packet.msgId if index == 0 else new_id(),
+                               packet.ttl, packet.hop)
+        frames.append(protocol.encode(part))
+    return frames
+
+class Partial(object):
+    """
+    The fragments of one message received so far.
+    """
+    def __init__(self, count, started):
+        self.parts = [None] * count
+        self.missing = count
+        self.size = 0
+        self.started = started
+
+class Reassembler(object):
+    """
+    Thread-safe buffer putting fragmented payloads back together. When it
+    holds more than limit bytes, the messages started longest ago are
+    dropped first.
+    """
+    def __init__(self, timeout = REASSEMBLY_TIMEOUT, limit = REASSEMBLY_LIMIT,
+                 clock = time.time):
+        self.timeout = timeout
+        self.limit = limit
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.partial = collections.OrderedDict() # (src, id) -> Partial
+        self.size = 0 # bytes held
+        self.dropped = 0 # incomplete messages given up on
+
+    # Adds a fragment. Returns the whole packet once every fragment of it
+    # has arrived, otherwise None.
+    def add(self, packet):
+        if len(packet.payload) < HEADER.size:
+            return None
+        msgId, index, count = HEADER.unpack_from(packet.payload)
+        data = packet.payload[HEADER.size:]
+        key = (packet.src, msgId)
+        with self.lock:
+            partial = self.partial.get(key)
+            if partial == None:
+                partial = self.partial[key] = Partial(count, self.clock())
+            if index >= len(partial.parts) or count != len(partial.parts):
+                return None
+            if partial.parts[index] == None:
+                partial.parts[index] = data
+                partial.missing -= 1
+                partial.size += len(data)
+                self.size += len(data)
+            if partial.missing == 0:
+                del self.partial[key]
+                self.size -= partial.size
+                return protocol.Packet(packet.kind, packet.src, packet.dst,
+                                       b"".join(partial.parts),
+                                       packet.flags & ~protocol.FRAGMENT,
+                                       msgId, packet.ttl, packet.hop)
+            while self.size > self.limit and self.partial:
+                self.drop(next(iter(self.partial)))
+        return None
+
+    def drop(self, key):
+        partial = self.partial.pop(key)
+        self.size -= partial.size
+        self.dropped += 1
+
+    # Gives up on messages which have been incomplete for too long. Returns
+    # how many were dropped.
+    def expire(self):
+        now = self.clock()
+        dropped = 0
+        with self.lock:
+            for key, partial in list(self.partial.items()):
+                if now - partial.started > self.timeout:
+                    self.drop(key)
+                    dropped += 1
+        return dropped
+
+    def __len__(self):
+        return len(self.partial)
@@ -0,0 +1,164 @@
+"""
+Network Testing Application
+
+This application allows for the sending and retrieval of data across a network
+which uses serial ports on multiple machines. It adopts its own protocol and
+allows for text to be sent from one machine to another.
+
+Author: Nick Klose (nick.klose@ualberta.ca)
+http://ualberta.ca/~klose
+"""
+import time
+import protocol
+import fec
+
+# Key used for binary (version 2) frames, whose value is a Packet
+PACKET = "V2"
+
+# Bytes which start a binary frame and one wrapped with FEC
+SYNC = bytes(bytearray([protocol.SYNC]))
+FEC_SYNC = bytes(bytearray([fec.SYNC]))
+
+# Largest frame kept while waiting for its closing brace
+MAX_FRAME = 4096
+
+class FrameParser(object):
+    """
+    Incremental parser for the {KEY=value} protocol. Bytes are fed in
+    whatever chunks the serial port hands over and complete frames are
+    returned as (key, value) tuples. Binary version 2 frames on the same
+    stream are returned as (PACKET, packet), whether or not they came
+    wrapped with FEC. No Qt or serial objects are needed.
+    """
+    def __init__(self, maxFrame = MAX_FRAME):
+        self.buffer = bytearray() # unparsed bytes carried between reads
+        self.maxFrame = maxFrame # longest partial frame kept in the buffer
+        self.frames = 0 # number of frames parsed so far
+        self.framed = 0 # number of bytes which formed valid frames
+        self.dropped = 0 # number of bytes thrown away as garbage
+        self.corrupt = 0 # number of binary frames failing their CRC
+        self.coded = fec.Counters() # blocks of frames wrapped with FEC
+        self.packets = 0 # number of binary frames parsed
+        self.packetBytes = 0 # bytes of binary frames before any FEC
+
+    # Adds a chunk of bytes and returns the list of completed frames.
+    def feed(self, data):
+        buf = self.buffer
+        buf.extend(data)
+        frames = []
+        framed = 0
+        pos = 0
+        end = len(buf)
+
+        while pos < end:
+            start = buf.find(b"{", pos)
+            sync = find_sync(buf, pos, end if start == -1 else start)
+
+            # binary frames are delimited by their length, not by braces
+            if sync != -1:
+                if buf[sync] == fec.SYNC:
+                    packet, after = self.decode_coded(buf, sync)
+                else:
+                    packet, after = protocol.decode(buf, sync)
+                if packet is protocol.INCOMPLETE:
+                    pos = sync
+                    break
+                if packet is protocol.CORRUPT:
+                    self.corrupt += 1
+                else:
+                    frames.append((PACKET, packet))
+                    framed += after - sync
+                    self.packets += 1
+                    self.packetBytes += len(packet.payload) + protocol.OVERHEAD
+                pos = after
+                continue
+
+            if start == -1:
+                pos = end
+                break
+            close = buf.find(b"}", start + 1)
+            reopen = buf.find(b"{", start + 1, end if close == -1 else close)
+
+            # a new command resets the frame, as the old parser did
+            if reopen != -1:
+                pos = reopen
+                continue
+
+            # so does a binary frame starting inside an unterminated one
+            sync = find_sync(buf, start + 1, end if close == -1 else close)
+            if sync != -1:
+                pos = sync
+                continue
+
+            # incomplete frame, keep it for the next read
+            if close == -1:
+                pos = start
+                break
+
+            equals = buf.find(b"=", start + 1, close)
+            if equals != -1:
+                key = bytes(buf[start + 1:equals])
+                value = bytes(buf[equals + 1:close])
+                frames.append((key, value))
+                framed += close + 1 - start
+            pos = close + 1
+
+        # discard everything that has been consumed in one go
+        if pos:
+            del buf[:pos]
+        self.framed += framed
+        self.dropped += pos - framed
+        if len(buf) > self.maxFrame:
+            self.dropped += len(buf)
+            del buf[:]
+
+        self.frames += len(frames)
+        return frames
+
+    # Decodes a frame wrapped with FEC, as protocol.decode() does.
+    def decode_coded(self, buf, pos):
+        frame, end = fec.decode(buf, pos, self.coded)
+        if frame is protocol.INCOMPLETE or frame is protocol.CORRUPT:
+            return frame, end
+        # a block decoded to the wrong data is caught by the frame's CRC
+        if frame[:1] != SYNC:
+            return protocol.CORRUPT, end
+        packet, after = protocol.decode(frame)
+        if after != len(frame) or not isinstance(packet, protocol.Packet):
+            return protocol.CORRUPT, end
+        return packet, end
+
+    # Drops any partial frame, for example after the port changes.
+    def reset(self):
+        del self.buffer[:]
+
+# Returns the position of the first byte starting a binary frame between
+# start and end, or -1 if there is none.
+def find_sync(buf, start, end):
+    sync = buf.find(SYNC, start, end)
+    coded = buf.find(FEC_SYNC, start, end if sync == -1 else sync)
+    return sync if coded == -1 else coded
+
+# Builds a stream of legacy frames as written by NetworkTest.
+def sample_stream(count, text = "Hello there, this is a test message."):
+    frames = []
+    for i in range(count):
+        frames.append("{NAME=Donut}")
+        frames.append("{FROM=Donut}{TO=Penguin}{TEXT=" + text + str(i) + "}")
+    return "".join(frames).encode("ascii")
+
+# Reports how many frames per second the parser handles for a chunk size.
+def measure_throughput(count = 20000, chunk = 64):
+    data = sample_stream(count)
+    parser = FrameParser()
+    start = time.time()
+    for i in range(0, len(data), chunk):
+        parser.feed(data[i:i + chunk])
+    elapsed = max(time.time() - start, 1e-9)
+    return parser.frames / elapsed, len(data) / elapsed
+
+if __name__ == "__main__":
+    for chunk in (1, 16, 64, 512, 4096):
+        framesPerSec, bytesPerSec = measure_throughput(chunk = chunk)
+        print("chunk %5d: %10.0f frames/s %12.0f bytes/s"
+              % (chunk, framesPerSec, bytesPerSec))
@@ -0,0 +1,171 @@
+"""
+Network Testing Application
+
+This application allows for the sending and retrieval of data across a network
+which uses serial ports on multiple machines. It adopts its own protocol and
+allows for text to be sent from one machine to another.
+
+Author: Nick Klose (nick.klose@ualberta.ca)
+http://ualberta.ca/~klose
+
+A gateway is a node with several serial ports, bridging the mesh segments
+attached to each. Every port is opened non-blocking and served from a single
+select() loop, which also runs the node's periodic tasks, so another port
+costs a file descriptor rather than a thread. Frames are relayed out of the
+port their next hop was heard on, or out of every other port when the next
+hop is unknown. select() on serial ports needs a POSIX system.
+"""
+import time
+import select
+import serial
+import capture
+from node import Node
+from serial_listen import SerialListen
+
+MAX_WAIT = 1.0 # longest wait in select(), so a stopped loop notices soon
+
+class PortListener(SerialListen):
+    """
+    Handles the frames arriving on one port of a gateway. Rather than
+    running as a thread, the gateway polls it whenever the port is readable.
+    """
+    def __init__(self, parent, port):
+        super(PortListener, self).__init__(parent, port)
+
+    def heard_name(self, name):
+        addr = SerialListen.heard_name(self, name)
+        self.parent.heard_on(addr, self.serial)
+        return addr
+
+class Gateway(Node):
+    def __init__(self, events = None, clock = time.time):
+        Node.__init__(self, events, clock)
+        self.ports = {} # file descriptor -> PortListener
+        self.portOf = {} # short address of a neighbour -> port it is on
+        self.arrival = None # port the frame being handled came in on
+        self.running = False
+
+    # Opens every port in paths with the current settings.
+    def open_ports(self, paths):
+        for path in paths:
+            try:
+                port = serial.Serial(path, baudrate = self.baud,
+                                     bytesize = self.byteSize,
+                                     parity = self.parity,
+                                     stopbits = self.stopBits, timeout = 0)
+            except (serial.SerialException, ValueError) as e:
+                self.msg("Could not open " + str(path) + ": " + str(e))
+                continue
+            self.add_port(port)
+
+    # Adds an open port, which needs a fileno() and non-blocking reads.
+    def add_port(self, port):
+        listener = PortListener(self, port)
+        listener.capture = self.open_capture(port)
+        self.ports[port.fileno()] = listener
+        self.msg("Gateway port open: " + str(port.port))
+
+    def remove_port(self, port):
+        listener = self.ports.pop(port.fileno(), None)
+        if listener != None and listener.capture != None:
+            listener.capture.close()
+            self.msg("Capture saved to " + listener.capture.path)
+        for addr, other in list(self.portOf.items()):
+            if other is port:
+                del self.portOf[addr]
+        try:
+            port.close()
+        except (serial.SerialException, OSError):
+            pass
+        self.msg("Gateway port closed: " + str(port.port))
+
+    def flush_captures(self):
+        for listener in self.ports.values():
+            if listener.capture != None:
+                listener.capture.flush()
+
+    # Remembers which port a neighbour's pings arrive on.
+    def heard_on(self, addr, port):
+        self.portOf[addr] = port
+
+    # Serves every port until close() is called or no ports are left.
+    def run(self):
+        self.running = True
+        self.schedule_tasks()
+        while self.running and self.ports:
+            due = self.scheduler.run_pending()
+            wait = MAX_WAIT
+            if due != None:
+                wait = min(wait, max(0.0, due - time.time()))
+            readable = select.select(list(self.ports), [], [], wait)[0]
+            for fd in readable:
+                listener = self.ports.get(fd)
+                if listener != None:
+                    self.poll(listener)
+
+    # Reads from one port, relaying away from it while its frames are handled.
+    def poll(self, listener):
+        self.arrival = listener.serial
+        profiler = self.metrics.profiler
+        try:
+            if profiler != None:
+                profiler.runcall(listener.poll)
+            else:
+                listener.poll()
+        except (serial.SerialException, OSError) as e:
+            # the adapter was most likely unplugged
+            self.metrics.count(listener.port, "errors")
+            self.msg(str(e))
+            self.remove_port(listener.serial)
+        finally:
+            self.arrival = None
+
+    # The loop writes straight to the ports; serial writes only fill the
+    # kernel's buffer, so they rarely hold it up.
+    def write(self, data, hop = None, priority = None):
+        port = self.portOf.get(hop)
+        if port != None:
+            listeners = [self.ports[port.fileno()]]
+        else:
+            listeners = [listener for listener in self.ports.values()
+                         if listener.serial is not self.arrival]
+        for listener in listeners:
+            frame = self.protect(data, listener.coding)
+            self.bytesOut += len(frame)
+            self.metrics.count(listener.port, "framesOut")
+            self.metrics.count(listener.port, "bytesOut", len(frame))
+            if listener.capture != None:
+                listener.capture.write(capture.OUT, frame)
+            try:
+                listener.serial.write(frame)
+            except (serial.SerialException, OSError) as e:
+                # drop the port that failed, not the one being read
+                self.metrics.count(listener.port, "errors")
+                self.msg(str(e))
+                self.remove_port(listener.serial)
+        self.count_sent(data, hop)
+        return True
+
+    # Pings go out of every port, so they ask for the most parity any of
+    # the ports wants.
+    def wanted_parity(self):
+        return max([listener.coding.advertise()
+                    for listener in self.ports.values()] or [0])
+
+    def set_fec(self, mode):
+        Node.set_fec(self, mode)
+        for listener in self.ports.values():
+            listener.coding.mode = mode
+
+    def tune_fec(self):
+        for listener in self.ports.values():
+            listener.tune_coding()
+
+    def is_open(self):
+        return len(self.ports) > 0
+
+    def close(self):
+        self.running = False
+        Node.close(self)
+        for listener in list(self.ports.values()):
+            self.remove_port(listener.serial)
@@ -112,6 +112,7 @@ class Ui_MainWindow(object):
         self.comboBaudRate.addItem(_fromUtf8(""))
         self.comboBaudRate.addItem(_fromUtf8(""))
         self.comboBaudRate.addItem(_fromUtf8(""))
+        self.comboBaudRate.addItem(_fromUtf8(""))
         self.groupBox_10 = QtGui.QGroupBox(self.groupBox_2)
         self.groupBox_10.setGeometry(QtCore.QRect(10, 440, 111, 51))
         self.groupBox_10.setObjectName(_fromUtf8("groupBox_10"))
@@ -125,7 +126,7 @@ class Ui_MainWindow(object):
         self.groupBox_7.setGeometry(QtCore.QRect(10, 20, 161, 471))
         self.groupBox_7.setObjectName(_fromUtf8("groupBox_7"))
         self.listNodes = QtGui.QListWidget(self.groupBox_7)
-        self.listNodes.setGeometry(QtCore.QRect(10, 20, 141, 291))
+        self.listNodes.setGeometry(QtCore.QRect(10, 20, 141, 271))
         self.listNodes.setObjectName(_fromUtf8("listNodes"))
         item = QtGui.QListWidgetItem()
         self.listNodes.addItem(item)
@@ -134,7 +135,7 @@ class Ui_MainWindow(object):
         item = QtGui.QListWidgetItem()
         self.listNodes.addItem(item)
         self.groupBox_9 = QtGui.QGroupBox(self.groupBox_7)
-        self.groupBox_9.setGeometry(QtCore.QRect(10, 320, 141, 81))
+        self.groupBox_9.setGeometry(QtCore.QRect(10, 300, 141, 101))
         self.groupBox_9.setObjectName(_fromUtf8("groupBox_9"))
         self.textSend = QtGui.QLineEdit(self.groupBox_9)
         self.textSend.setGeometry(QtCore.QRect(10, 20, 121, 20))
@@ -142,6 +143,9 @@ class Ui_MainWindow(object):
         self.btnSend = QtGui.QPushButton(self.groupBox_9)
         self.btnSend.setGeometry(QtCore.QRect(10, 50, 121, 23))
         self.btnSend.setObjectName(_fromUtf8("btnSend"))
+        self.checkConfirm = QtGui.QCheckBox(self.groupBox_9)
+        self.checkConfirm.setGeometry(QtCore.QRect(10, 78, 121, 17))
+        self.checkConfirm.setObjectName(_fromUtf8("checkConfirm"))
         self.groupBox_14 = QtGui.QGroupBox(self.groupBox_7)
         self.groupBox_14.setGeometry(QtCore.QRect(10, 410, 141, 51))
         self.groupBox_14.setObjectName(_fromUtf8("groupBox_14"))
@@ -151,40 +155,24 @@ class Ui_MainWindow(object):
         self.groupBox_11 = QtGui.QGroupBox(self.groupBox_6)
         self.groupBox_11.setGeometry(QtCore.QRect(180, 20, 471, 151))
         self.groupBox_11.setObjectName(_fromUtf8("groupBox_11"))
-        self.listSentData = QtGui.QListWidget(self.groupBox_11)
+        self.listSentData = QtGui.QListView(self.groupBox_11)
         self.listSentData.setGeometry(QtCore.QRect(10, 20, 451, 121))
-        self.listSentData.setWordWrap(True)
+        self.listSentData.setUniformItemSizes(True)
         self.listSentData.setObjectName(_fromUtf8("listSentData"))
-        item = QtGui.QListWidgetItem()
-        self.listSentData.addItem(item)
-        item = QtGui.QListWidgetItem()
-        self.listSentData.addItem(item)
-        item = QtGui.QListWidgetItem()
-        self.listSentData.addItem(item)
         self.groupBox_12 = QtGui.QGroupBox(self.groupBox_6)
         self.groupBox_12.setGeometry(QtCore.QRect(180, 180, 471, 151))
         self.groupBox_12.setObjectName(_fromUtf8("groupBox_12"))
-        self.listReceivedData = QtGui.QListWidget(self.groupBox_12)
+        self.listReceivedData = QtGui.QListView(self.groupBox_12)
         self.listReceivedData.setGeometry(QtCore.QRect(10, 20, 451, 121))
+        self.listReceivedData.setUniformItemSizes(True)
         self.listReceivedData.setObjectName(_fromUtf8("listReceivedData"))
-        item = QtGui.QListWidgetItem()
-        self.listReceivedData.addItem(item)
-        item = QtGui.QListWidgetItem()
-        self.listReceivedData.addItem(item)
-        item = QtGui.QListWidgetItem()
-        self.listReceivedData.addItem(item)
         self.groupBox_13 = QtGui.QGroupBox(self.groupBox_6)
         self.groupBox_13.setGeometry(QtCore.QRect(180, 340, 471, 151))
         self.groupBox_13.setObjectName(_fromUtf8("groupBox_13"))
-        self.listRelayedData = QtGui.QListWidget(self.groupBox_13)
+        self.listRelayedData = QtGui.QListView(self.groupBox_13)
         self.listRelayedData.setGeometry(QtCore.QRect(10, 20, 451, 121))
+        self.listRelayedData.setUniformItemSizes(True)
         self.listRelayedData.setObjectName(_fromUtf8("listRelayedData"))
-        item = QtGui.QListWidgetItem()
-        self.listRelayedData.addItem(item)
-        item = QtGui.QListWidgetItem()
-        self.listRelayedData.addItem(item)
-        item = QtGui.QListWidgetItem()
-        self.listRelayedData.addItem(item)
         MainWindow.setCentralWidget(self.centralwidget)
         self.statusbar = QtGui.QStatusBar(MainWindow)
         self.statusbar.setInputMethodHints(QtCore.Qt.ImhNone)
@@ -242,6 +230,7 @@ class Ui_MainWindow(object):
         self.comboBaudRate.setItemText(14, _translate("MainWindow", "38400", None))
         self.comboBaudRate.setItemText(15, _translate("MainWindow", "57600", None))
         self.comboBaudRate.setItemText(16, _translate("MainWindow", "115200", None))
+        self.comboBaudRate.setItemText(17, _translate("MainWindow", "Auto", None))
         self.groupBox_10.setTitle(_translate("MainWindow", "Node Name", None))
         self.groupBox_6.setTitle(_translate("MainWindow", "Network", None))
         self.groupBox_7.setTitle(_translate("MainWindow", "Nodes in Range", None))
@@ -256,38 +245,12 @@ class Ui_MainWindow(object):
         self.listNodes.setSortingEnabled(__sortingEnabled)
         self.groupBox_9.setTitle(_translate("MainWindow", "Send Text", None))
         self.btnSend.setText(_translate("MainWindow", "Send to Node", None))
+        self.checkConfirm.setText(_translate("MainWindow", "Confirm delivery", None))
         self.groupBox_14.setTitle(_translate("MainWindow", "Send Image", None))
         self.btnSendImage.setText(_translate("MainWindow", "Select Image", None))
         self.groupBox_11.setTitle(_translate("MainWindow", "Sent Data", None))
-        __sortingEnabled = self.listSentData.isSortingEnabled()
-        self.listSentData.setSortingEnabled(False)
-        item = self.listSentData.item(0)
-        item.setText(_translate("MainWindow", "A", None))
-        item = self.listSentData.item(1)
-        item.setText(_translate("MainWindow", "C", None))
-        item = self.listSentData.item(2)
-        item.setText(_translate("MainWindow", "D", None))
-        self.listSentData.setSortingEnabled(__sortingEnabled)
         self.groupBox_12.setTitle(_translate("MainWindow", "Received Data", None))
-        __sortingEnabled = self.listReceivedData.isSortingEnabled()
-        self.listReceivedData.setSortingEnabled(False)
-        item = self.listReceivedData.item(0)
-        item.setText(_translate("MainWindow", "A", None))
-        item = self.listReceivedData.item(1)
-        item.setText(_translate("MainWindow", "C", None))
-        item = self.listReceivedData.item(2)
-        item.setText(_translate("MainWindow", "D", None))
-        self.listReceivedData.setSortingEnabled(__sortingEnabled)
         self.groupBox_13.setTitle(_translate("MainWindow", "Relayed Data", None))
-        __sortingEnabled = self.listRelayedData.isSortingEnabled()
-        self.listRelayedData.setSortingEnabled(False)
-        item = self.listRelayedData.item(0)
-        item.setText(_translate("MainWindow", "A", None))
-        item = self.listRelayedData.item(1)
-        item.setText(_translate("MainWindow", "C", None))
-        item = self.listRelayedData.item(2)
-        item.setText(_translate("MainWindow", "D", None))
-        self.listRelayedData.setSortingEnabled(__sortingEnabled)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,200 @@
+"""
+Network Testing Application
+
+This application allows for the sending and retrieval of data across a network
+which uses serial ports on multiple machines. It adopts its own protocol and
+allows for text to be sent from one machine to another.
+
+Author: Nick Klose (nick.klose@ualberta.ca)
+http://ualberta.ca/~klose
+
+Images are downscaled, cut into tiles and encoded once per file and settings.
+A small preview of the whole picture is sent first as tile 0 so the receiver
+can show something straight away, then each tile refines its part of the
+picture as soon as all of its bytes have arrived. PIL is only imported when
+an image is actually encoded or decoded.
+"""
+import os
+import io
+import struct
+import collections
+import protocol
+
+# Image id, tile index, tile count, tile x, tile y, image width and height,
+# total encoded tile length and offset of this chunk within the tile
+TILE = struct.Struct("!HHHHHHHHH")
+CHUNK_SIZE = protocol.MAX_PAYLOAD - TILE.size
+
+MAX_SIZE = (320, 240) # largest size an image is scaled down to
+TILE_SIZE = 64 # width and height of each tile in pixels
+PREVIEW_SCALE = 8 # the preview is this many times smaller than the image
+FORMAT = "JPEG"
+QUALITY = 60
+MAX_CANVAS = 4096 # widest and tallest image accepted
+MAX_TILES = 4096 # most tiles accepted in one image
+
+class EncodedImage(object):
+    def __init__(self, width, height, preview, tiles):
+        self.width = width # size of the scaled image
+        self.height = height
+        self.preview = preview # encoded thumbnail of the whole image
+        self.tiles = tiles # list of (x, y, encoded bytes)
+
+    # Total number of encoded bytes, excluding packet headers.
+    def size(self):
+        return len(self.preview) + sum(len(data) for x, y, data in self.tiles)
+
+# Returns the raw pixel bytes of an image with either PIL or Pillow.
+def to_bytes(image, *args):
+    if hasattr(image, "tobytes"):
+        return image.tobytes(*args)
+    return image.tostring(*args)
+
+# High quality downscaling filter, named differently across PIL versions.
+def _antialias(Image):
+    return getattr(Image, "LANCZOS", None) or Image.ANTIALIAS
+
+def _save(image, fmt, quality):
+    out = io.BytesIO()
+    if fmt == "JPEG":
+        image.save(out, fmt, quality = quality, optimize = True)
+    else:
+        image.save(out, fmt, optimize = True)
+    return out.getvalue()
+
+# Scales an image file down and encodes its preview and tiles.
+def encode_image(path, maxSize = MAX_SIZE, fmt = FORMAT, quality = QUALITY,
+                 tileSize = TILE_SIZE):
+    from PIL import Image
+    image = Image.open(path).convert("RGB")
+    image.thumbnail(maxSize, _antialias(Image))
+    width, height = image.size
+
+    small = (max(1, width // PREVIEW_SCALE), max(1, height // PREVIEW_SCALE))
+    preview = _save(image.resize(small, _antialias(Image)), fmt, quality)
+
+    tiles = []
+    for y in range(0, height, tileSize):
+        for x in range(0, width, tileSize):
+            box = (x, y, min(x + tileSize, width), min(y + tileSize, height))
+            tiles.append((x, y, _save(image.crop(box), fmt, quality)))
+    return EncodedImage(width, height, preview, tiles)
+
+class ImageCache(object):
+    """
+    Keeps recently encoded images so that sending the same file again with
+    the same settings skips decoding, scaling and encoding it.
+    """
+    def __init__(self, capacity = 16):
+        self.capacity = capacity
+        self.images = collections.OrderedDict()
+
+    def encode(self, path, maxSize = MAX_SIZE, fmt = FORMAT,
+               quality = QUALITY, tileSize = TILE_SIZE):
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_mtime, stat.st_size,
+               tuple(maxSize), fmt, quality, tileSize)
+        encoded = self.images.pop(key, None)
+        if encoded is None:
+            encoded = encode_image(path, maxSize, fmt, quality, tileSize)
+        self.images[key] = encoded
+        while len(self.images) > self.capacity:
+            self.images.popitem(last = False)
+        return encoded
+
+# Splits an encoded image into IMAGE packet payloads, preview first.
+def image_payloads(encoded, imageId, chunkSize = CHUNK_SIZE):
+    parts = [(0, 0, encoded.preview)] + encoded.tiles
+    count = len(parts)
+    for index, (x, y, data) in enumerate(parts):
+        for offset in range(0, len(data), chunkSize):
+            header = TILE.pack(imageId, index, count, x, y, encoded.width,
+                               encoded.height, len(data), offset)
+            yield header + data[offset:offset + chunkSize]
+
+class ImageAssembler(object):
+    """
+    Rebuilds images from IMAGE payloads. Each tile is decoded exactly once,
+    when every byte of it has arrived, and pasted onto a canvas for that
+    image. Chunks are kept by offset, so copies of a chunk arriving over
+    several routes are not counted twice. Payloads which do not make sense
+    are dropped, as protocol.decode() drops damaged frames.
+    """
+    def __init__(self, capacity = 4):
+        self.capacity = capacity # images assembled at the same time
+        self.images = collections.OrderedDict()
+
+    # Adds one payload from a node. Returns (key, canvas, complete) when the
+    # canvas changed, otherwise None.
+    def feed(self, src, payload):
+        if len(payload) <= TILE.size:
+            return None
+        (imageId, index, count, x, y, width, height, length,
+         offset) = TILE.unpack_from(payload)
+        chunk = payload[TILE.size:]
+        if not (0 < width <= MAX_CANVAS and 0 < height <= MAX_CANVAS and
+                index < count <= MAX_TILES and
+                offset + len(chunk) <= length and
+                (index == 0 or (x < width and y < height))):
+            return None
+        key = (src, imageId)
+        state = self.images.get(key)
+        if state is None:
+            state = self.start(key, width, height, count)
+        elif state["canvas"].size != (width, height) or \
+                state["count"] != count:
+            return None
+        tiles = state["tiles"]
+        if index in state["done"]:
+            return None
+
+        data, chunks = tiles.get(index, (None, None))
+        if data is None:
+            data, chunks = tiles[index] = (bytearray(length), {})
+        elif len(data) != length:
+            return None
+        data[offset:offset + len(chunk)] = chunk
+        chunks[offset] = len(chunk)
+        if not covered(chunks, length):
+            return None
+
+        from PIL import Image
+        del tiles[index]
+        state["done"].add(index)
+        try:
+            tile = Image.open(io.BytesIO(bytes(data))).convert("RGB")
+        except (IOError, ValueError, SyntaxError):
+            # passed the CRC but does not decode; the tile stays blank
+            return None
+        canvas = state["canvas"]
+        if index == 0:
+            # only show the preview if no real tile has arrived yet
+            if len(state["done"]) == 1:
+                canvas.paste(tile.resize((width, height), Image.BILINEAR))
+        else:
+            canvas.paste(tile, (x, y))
+
+        complete = len(state["done"]) == count
+        if complete:
+            del self.images[key]
+        return key, canvas, complete
+
+    def start(self, key, width, height, count):
+        from PIL import Image
+        while len(self.images) >= self.capacity:
+            self.images.popitem(last = False)
+        state = {"canvas": Image.new("RGB", (width, height)), "tiles": {},
+                 "count": count, "done": set()}
+        self.images[key] = state
+        return state
+
+# Whether chunks, a dict of offset -> length, cover every byte of a tile.
+def covered(chunks, length):
+    if sum(chunks.values()) < length:
+        return False
+    end = 0
+    for offset in sorted(chunks):
+        if offset > end:
+            return False
+        end = max(end, offset + chunks[offset])
+    return end >= length
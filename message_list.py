@@ -0,0 +1,154 @@
+"""
+Network Testing Application
+
+This application allows for the sending and retrieval of data across a network
+which uses serial ports on multiple machines. It adopts its own protocol and
+allows for text to be sent from one machine to another.
+
+Author: Nick Klose (nick.klose@ualberta.ca)
+http://ualberta.ca/~klose
+"""
+import collections
+from PyQt4 import QtCore
+import message_store
+
+MESSAGE_LIMIT = 1000 # lines kept in each message list
+CACHE_SIZE = 500 # lines of message history kept formatted
+STATUS_LIMIT = 1000 # lines of message history with a status kept
+
+# Shows the row of a list model again after its line changed.
+def row_changed(model, row):
+    index = model.index(row)
+    model.emit(QtCore.SIGNAL("dataChanged(QModelIndex,QModelIndex)"),
+               index, index)
+
+class MessageList(QtCore.QAbstractListModel):
+    """
+    List model keeping only the most recent lines added, so a flood of
+    traffic cannot grow the window's memory without limit. Lines are added
+    in batches, each batch costing one insert and at most one removal.
+    Lines are numbered in the order they were added, counting the ones
+    dropped, and may have a status shown after them.
+    """
+    def __init__(self, limit = MESSAGE_LIMIT, parent = None):
+        QtCore.QAbstractListModel.__init__(self, parent)
+        self.limit = limit
+        self.lines = collections.deque()
+        self.dropped = 0 # number of the first line kept
+        self.status = {} # line number -> status shown after the line
+
+    def rowCount(self, parent = QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.lines)
+
+    def data(self, index, role = QtCore.Qt.DisplayRole):
+        if (role == QtCore.Qt.DisplayRole and index.isValid() and
+                index.row() < len(self.lines)):
+            line = self.lines[index.row()]
+            status = self.status.get(self.dropped + index.row())
+            if status != None:
+                line += "  " + status
+            return QtCore.QVariant(line)
+        return QtCore.QVariant()
+
+    # Shows a status after the line with the given number, which may not
+    # have been added yet.
+    def set_status(self, number, status):
+        if number < self.dropped:
+            return
+        self.status[number] = status
+        if number - self.dropped < len(self.lines):
+            row_changed(self, number - self.dropped)
+
+    def append(self, line):
+        self.extend([line])
+
+    # Adds lines at the end, dropping the oldest ones over the limit.
+    def extend(self, lines):
+        lines = lines[-self.limit:]
+        if not lines:
+            return
+        overflow = len(self.lines) + len(lines) - self.limit
+        if overflow > 0:
+            self.beginRemoveRows(QtCore.QModelIndex(), 0, overflow - 1)
+            for i in range(overflow):
+                self.lines.popleft()
+            self.dropped += overflow
+            for number in [n for n in self.status if n < self.dropped]:
+                del self.status[number]
+            self.endRemoveRows()
+
+        first = len(self.lines)
+        self.beginInsertRows(QtCore.QModelIndex(), first,
+                             first + len(lines) - 1)
+        self.lines.extend(lines)
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self.dropped += len(self.lines)
+        self.lines.clear()
+        self.status.clear()
+        self.endResetModel()
+
+class HistoryList(QtCore.QAbstractListModel):
+    """
+    List model showing one view of the message history. Lines are read
+    from the store only when the list asks for them, which it does only for
+    the rows on screen, so the history can be of any length. Rows are added
+    in batches like MessageList, once the lines are in the store. The
+    latest STATUS_LIMIT statuses set are shown after their lines.
+    """
+    def __init__(self, view, parent = None):
+        QtCore.QAbstractListModel.__init__(self, parent)
+        self.view = view
+        self.rows = len(view)
+        self.cache = collections.OrderedDict() # row -> formatted line
+        self.status = collections.OrderedDict() # row -> status
+
+    def rowCount(self, parent = QtCore.QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self.rows
+
+    def data(self, index, role = QtCore.Qt.DisplayRole):
+        if (role == QtCore.Qt.DisplayRole and index.isValid() and
+                index.row() < self.rows):
+            line = self.line(index.row())
+            status = self.status.get(index.row())
+            if status != None:
+                line += "  " + status
+            return QtCore.QVariant(line)
+        return QtCore.QVariant()
+
+    # Shows a status after a row, which may not have been added yet. Rows
+    # are numbered like the lines of a MessageList.
+    def set_status(self, row, status):
+        self.status.pop(row, None)
+        self.status[row] = status
+        if len(self.status) > STATUS_LIMIT:
+            self.status.popitem(False)
+        if row < self.rows:
+            row_changed(self, row)
+
+    def line(self, row):
+        line = self.cache.get(row)
+        if line == None:
+            line = message_store.format_record(self.view[row])
+            self.cache[row] = line
+            if len(self.cache) > CACHE_SIZE:
+                self.cache.popitem(False)
+        return line
+
+    def append(self, line):
+        self.extend([line])
+
+    # Shows as many more rows as lines were given, as far as the store has
+    # them.
+    def extend(self, lines):
+        rows = min(len(self.view), self.rows + len(lines))
+        if rows > self.rows:
+            self.beginInsertRows(QtCore.QModelIndex(), self.rows, rows - 1)
+            self.rows = rows
+            self.endInsertRows()
@@ -0,0 +1,429 @@
+"""
+Network Testing Application
+
+This application allows for the sending and retrieval of data across a network
+which uses serial ports on multiple machines. It adopts its own protocol and
+allows for text to be sent from one machine to another.
+
+Author: Nick Klose (nick.klose@ualberta.ca)
+http://ualberta.ca/~klose
+
+Message history kept on disk. Every message sent, received or relayed is
+appended to a log, and its offset and time to an index of fixed size
+entries, so record n is found without reading the ones before it. Further
+files list the record numbers of each direction and of each peer, so the
+messages exchanged with one node are found without scanning the others.
+Times in the index never go backwards, which lets any of these be searched
+by time with a binary search. All files are only ever appended to and are
+read through mmap, leaving it to the operating system to page in what is
+looked at.
+
+Run this module to search the history:
+
+    python message_store.py --peer Penguin --since "2013-10-18 12:00"
+"""
+import os
+import sys
+import mmap
+import time
+import struct
+import argparse
+import collections
+import threading
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+DIRECTORY = os.path.join(os.path.expanduser("~"), ".network_test_history")
+
+# Directions of a message as seen from this node
+SENT = 0
+RECEIVED = 1
+RELAYED = 2
+DIRECTIONS = ("sent", "received", "relayed")
+
+# Time, direction and the lengths of the sender, recipient and text which
+# follow, all encoded as UTF-8
+RECORD = struct.Struct("!dBHHH")
+MAX_FIELD = 0xFFFF # longest sender, recipient or text in bytes
+# Offset of a record in the log and its time, never less than the last
+ENTRY = struct.Struct("!Qd")
+# Number of a record in a view
+POSITION = struct.Struct("!I")
+
+LOG_FILE = "messages.log"
+INDEX_FILE = "messages.idx"
+PEERS_FILE = "peers.txt"
+LOCK_FILE = "lock"
+VIEW_SUFFIX = ".view"
+
+class MappedFile(object):
+    """
+    A file which is only appended to, read through a memory map which is
+    extended whenever a read goes past its end. A read-only file sees the
+    size it had when it was opened.
+    """
+    def __init__(self, path, readOnly = False):
+        self.path = path
+        self.file = None
+        if not readOnly:
+            self.file = open(path, "ab")
+        self.size = os.path.getsize(path) if os.path.exists(path) else 0
+        self.map = None
+        self.mapped = 0 # bytes covered by the map
+
+    def append(self, data):
+        self.file.write(data)
+        self.file.flush()
+        self.size += len(data)
+
+    def remap(self):
+        self.unmap()
+        if self.size > 0:
+            with open(self.path, "rb") as f:
+                self.map = mmap.mmap(f.fileno(), self.size,
+                                     access = mmap.ACCESS_READ)
+            self.mapped = self.size
+
+    def unmap(self):
+        if self.map != None:
+            self.map.close()
+        self.map = None
+        self.mapped = 0
+
+    def read(self, offset, length):
+        if offset + length > self.mapped:
+            self.remap()
+        return self.map[offset:offset + length]
+
+    def unpack(self, layout, offset):
+        if offset + layout.size > self.mapped:
+            self.remap()
+        return layout.unpack_from(self.map, offset)
+
+    # Cuts off everything from size on, such as a half written record. A
+    # read-only file is left as it is and only read up to size.
+    def truncate(self, size):
+        if size < self.size:
+            self.unmap()
+            if self.file != None:
+                self.file.truncate(size)
+            self.size = size
+
+    def close(self):
+        self.unmap()
+        if self.file != None:
+            self.file.close()
+
+class View(object):
+    """
+    Records of one direction or one peer, in the order they were stored.
+    """
+    def __init__(self, store, path):
+        self.store = store
+        self.file = MappedFile(path, store.readOnly)
+
+    def __len__(self):
+        return self.file.size // POSITION.size
+
+    # Returns the record number at a position in the view.
+    def number(self, position):
+        with self.store.lock:
+            return self.file.unpack(POSITION, position * POSITION.size)[0]
+
+    def __getitem__(self, position):
+        return self.store.record(self.number(position))
+
+    def time(self, position):
+        return self.store.time(self.number(position))
+
+class Everything(object):
+    """
+    Every record, as a view.
+    """
+    def __init__(self, store):
+        self.store = store
+
+    def __len__(self):
+        return self.store.count()
+
+    def number(self, position):
+        return position
+
+    def __getitem__(self, position):
+        return self.store.record(position)
+
+    def time(self, position):
+        return self.store.time(position)
+
+# Returns the first position in a view holding a record stored at or after
+# the given time.
+def find_time(view, when):
+    low, high = 0, len(view)
+    while low < high:
+        middle = (low + high) // 2
+        if view.time(middle) < when:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+# Keeps other processes out of a history directory for as long as the
+# returned file stays open. Raises IOError if one already has it.
+def lock_directory(directory):
+    lockFile = open(os.path.join(directory, LOCK_FILE), "a+b")
+    try:
+        if fcntl != None:
+            fcntl.flock(lockFile.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(lockFile.fileno(), msvcrt.LK_NBLCK, 1)
+    except (IOError, OSError):
+        lockFile.close()
+        raise IOError("History in " + directory + " is used by another "
+                      "window")
+    return lockFile
+
+def encode(text):
+    if not isinstance(text, bytes):
+        text = text.encode("utf-8")
+    return text
+
+def decode(data):
+    return data.decode("utf-8", "replace")
+
+class MessageStore(object):
+    """
+    Thread-safe store of every message sent, received or relayed, kept in
+    a directory of its own. Only one store at a time may write to a
+    directory; read-only stores, such as searches, take no lock and see
+    the messages stored by the time they were opened.
+    """
+    def __init__(self, directory = DIRECTORY, readOnly = False):
+        if not os.path.isdir(directory):
+            if readOnly:
+                raise IOError("No history in " + directory)
+            os.makedirs(directory)
+        self.directory = directory
+        self.readOnly = readOnly
+        self.lockFile = None
+        if not readOnly:
+            self.lockFile = lock_directory(directory)
+        self.lock = threading.Lock()
+        # the log is sized before the index, so every record the index
+        # holds is complete in a store still being written to
+        self.log = MappedFile(os.path.join(directory, LOG_FILE), readOnly)
+        self.index = MappedFile(os.path.join(directory, INDEX_FILE),
+                                readOnly)
+        self.peers = [] # peer names by their number
+        self.peerNumbers = {} # peer numbers by name
+        self.views = {} # view name -> View
+        self.lastTime = 0.0 # time of the latest record in the index
+
+        peersPath = os.path.join(directory, PEERS_FILE)
+        if not readOnly or os.path.exists(peersPath):
+            with open(peersPath, "rb" if readOnly else "a+b") as f:
+                f.seek(0)
+                for line in f.read().splitlines():
+                    self.add_peer(decode(line))
+        for filename in os.listdir(directory):
+            if filename.endswith(VIEW_SUFFIX):
+                name = filename[:-len(VIEW_SUFFIX)]
+                self.views[name] = View(self, os.path.join(directory,
+                                                           filename))
+        for name in DIRECTIONS:
+            self.view(name)
+        self.recover()
+
+    # Drops whatever a crash left half written at the end of the files, or
+    # for a read-only store whatever is still being written.
+    def recover(self):
+        count = self.index.size // ENTRY.size
+        while count > 0:
+            offset, when = self.index.unpack(ENTRY, (count - 1) * ENTRY.size)
+            if (offset + RECORD.size <= self.log.size and
+                    offset + self.record_size(offset) <= self.log.size):
+                self.lastTime = when
+                self.log.truncate(offset + self.record_size(offset))
+                break
+            count -= 1
+        if count == 0:
+            self.log.truncate(0)
+        self.index.truncate(count * ENTRY.size)
+        for view in self.views.values():
+            length = len(view)
+            while length > 0 and view.number(length - 1) >= count:
+                length -= 1
+            view.file.truncate(length * POSITION.size)
+
+    def record_size(self, offset):
+        (when, direction, senderLength, recipientLength,
+         textLength) = self.log.unpack(RECORD, offset)
+        return RECORD.size + senderLength + recipientLength + textLength
+
+    def add_peer(self, name):
+        self.peerNumbers[name] = len(self.peers)
+        self.peers.append(name)
+
+    # Returns the view with the given name, creating it if needed.
+    def view(self, name):
+        view = self.views.get(name)
+        if view == None:
+            path = os.path.join(self.directory, name + VIEW_SUFFIX)
+            view = self.views[name] = View(self, path)
+        return view
+
+    # Returns the view of the messages to and from a peer, creating it if
+    # asked to and the peer is new.
+    def peer_view(self, name, create = False):
+        name = name.replace("\n", " ")
+        if name not in self.peerNumbers:
+            if not create:
+                return None
+            with open(os.path.join(self.directory, PEERS_FILE), "ab") as f:
+                f.write(encode(name) + b"\n")
+            self.add_peer(name)
+        return self.view("peer-%d" % self.peerNumbers[name])
+
+    def count(self):
+        return self.index.size // ENTRY.size
+
+    # Stores a message and returns its record number. The time is that of
+    # the message, which may be earlier than one already stored. Raises
+    # ValueError if a field is too long for its length in the record.
+    def append(self, direction, sender, recipient, text, when = None):
+        if when == None:
+            when = time.time()
+        sender, recipient = encode(sender), encode(recipient)
+        text = encode(text)
+        if max(len(sender), len(recipient), len(text)) > MAX_FIELD:
+            raise ValueError("Message too long to store")
+        with self.lock:
+            number = self.count()
+            offset = self.log.size
+            self.log.append(RECORD.pack(when, direction, len(sender),
+                                        len(recipient), len(text)) +
+                            sender + recipient + text)
+            self.lastTime = max(self.lastTime, when)
+            self.index.append(ENTRY.pack(offset, self.lastTime))
+
+            position = POSITION.pack(number)
+            self.view(DIRECTIONS[direction]).file.append(position)
+            peers = [recipient] if direction == SENT else [sender]
+            if direction == RELAYED:
+                peers.append(recipient)
+            for peer in set(peers):
+                self.peer_view(decode(peer), True).file.append(position)
+        return number
+
+    # Returns (time, direction, sender, recipient, text) of a record.
+    def record(self, number):
+        with self.lock:
+            offset, indexed = self.index.unpack(ENTRY, number * ENTRY.size)
+            (when, direction, senderLength, recipientLength,
+             textLength) = self.log.unpack(RECORD, offset)
+            start = offset + RECORD.size
+            data = self.log.read(start, senderLength + recipientLength +
+                                 textLength)
+        sender = data[:senderLength]
+        recipient = data[senderLength:senderLength + recipientLength]
+        text = data[senderLength + recipientLength:]
+        return when, direction, decode(sender), decode(recipient), decode(text)
+
+    # Returns the time a record is searched by.
+    def time(self, number):
+        with self.lock:
+            return self.index.unpack(ENTRY, number * ENTRY.size)[1]
+
+    # Yields the records matching every condition given, oldest first.
+    # Only the records of the peer, or else of the direction, are read.
+    def query(self, peer = None, direction = None, start = None, end = None,
+              text = None):
+        if peer != None:
+            view = self.peer_view(peer)
+            if view == None:
+                return
+        elif direction != None:
+            view = self.view(DIRECTIONS[direction])
+        else:
+            view = Everything(self)
+        first = find_time(view, start) if start != None else 0
+        last = find_time(view, end) if end != None else len(view)
+        for position in range(first, last):
+            record = view[position]
+            if direction != None and record[1] != direction:
+                continue
+            if text != None and text not in record[4]:
+                continue
+            yield record
+
+    def close(self):
+        with self.lock:
+            self.log.close()
+            self.index.close()
+            for view in self.views.values():
+                view.file.close()
+            if self.lockFile != None:
+                self.lockFile.close()
+
+# Formats a record the way the window shows it.
+def format_record(record, showTime = False):
+    when, direction, sender, recipient, text = record
+    if direction == SENT:
+        line = u"<To: " + recipient + u"> " + text
+    elif direction == RECEIVED:
+        line = u"<From: " + sender + u"> " + text
+    else:
+        line = u"<From: " + sender + u"> <To: " + recipient + u"> " + text
+    if showTime:
+        line = time.strftime("%Y-%m-%d %H:%M:%S ", time.localtime(when)) + line
+    return line
+
+def parse_time(value):
+    for layout in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            return time.mktime(time.strptime(value, layout))
+        except ValueError:
+            pass
+    return float(value)
+
+def main(argv):
+    parser = argparse.ArgumentParser(description = "Search message history")
+    parser.add_argument("--dir", default = DIRECTORY,
+                        help = "history directory")
+    parser.add_argument("--peer",
+                        help = "node the messages were exchanged with")
+    parser.add_argument("--direction", choices = DIRECTIONS)
+    parser.add_argument("--since", type = parse_time,
+                        help = "YYYY-MM-DD [HH:MM[:SS]] or a Unix time")
+    parser.add_argument("--until", type = parse_time)
+    parser.add_argument("--text", help = "only messages containing this")
+    parser.add_argument("--limit", type = int, default = 0,
+                        help = "show only the latest LIMIT messages")
+    args = parser.parse_args(argv[1:])
+
+    try:
+        store = MessageStore(args.dir, readOnly = True)
+    except (IOError, OSError) as e:
+        sys.stderr.write(str(e) + "\n")
+        return 1
+    direction = (DIRECTIONS.index(args.direction)
+                 if args.direction != None else None)
+    # Python 2 passes the arguments as bytes
+    peer, text = args.peer, args.text
+    if isinstance(peer, bytes):
+        peer = decode(peer)
+    if isinstance(text, bytes):
+        text = decode(text)
+    records = store.query(peer, direction, args.since, args.until, text)
+    if args.limit > 0:
+        records = collections.deque(records, args.limit)
+    for record in records:
+        line = format_record(record, True) + u"\n"
+        sys.stdout.write(line.encode("utf-8") if str is bytes else line)
+    store.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,192 @@
+"""
+Network Testing Application
+
+This application allows for the sending and retrieval of data across a network
+which uses serial ports on multiple machines. It adopts its own protocol and
+allows for text to be sent from one machine to another.
+
+Author: Nick Klose (nick.klose@ualberta.ca)
+http://ualberta.ca/~klose
+
+Link statistics. Every port and every neighbour has a set of counters
+(bytes and frames each way, parse errors, drops, relays, copies of frames
+already seen, blocks corrected and lost by forward error correction) and a
+histogram of the time taken to handle each incoming frame. Payload
+compression is counted for the node as a whole: bytes before and after,
+and the time spent compressing and expanding. A snapshot of all of them can
+be written out as JSON, and the receive loop can be profiled with cProfile,
+switched on and off while the node runs.
+"""
+import io
+import os
+import json
+import time
+import bisect
+import pstats
+import cProfile
+import threading
+
+STATS_INTERVAL = 10.0 # seconds between snapshots written to a stats file
+
+# Upper bounds in seconds of the frame time histogram buckets
+TIME_BUCKETS = (1e-5, 2e-5, 5e-5, 1e-4, 2e-4, 5e-4, 1e-3, 2e-3, 5e-3, 1e-2,
+                2e-2, 5e-2, 1e-1)
+
+COUNTERS = ("bytesIn", "bytesOut", "framesIn", "framesOut", "parseErrors",
+            "discardedBytes", "dropped", "relayed", "duplicates", "errors",
+            "fecBlocks", "fecCorrected", "fecFailed")
+
+# Payloads offered for compression and the bytes they took before and after,
+# payloads expanded, and seconds spent on each
+COMPRESSION = ("payloads", "compressed", "bytesBefore", "bytesAfter",
+               "compressTime", "expanded", "expandErrors", "expandTime")
+
+class Histogram(object):
+    def __init__(self, bounds = TIME_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1) # the last is for larger values
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    # Estimates a percentile as the upper bound of the bucket it falls in.
+    def percentile(self, fraction):
+        if self.count == 0:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self):
+        return {"count": self.count,
+                "mean": self.total / self.count if self.count else 0.0,
+                "p50": self.percentile(0.5), "p99": self.percentile(0.99),
+                "max": self.max, "buckets": list(self.counts)}
+
+class LinkStats(object):
+    def __init__(self):
+        self.counters = dict((key, 0) for key in COUNTERS)
+        self.frameTime = Histogram() # seconds spent on each incoming frame
+        self.gauges = {} # latest values such as the outbox depth
+
+    def snapshot(self):
+        result = dict(self.counters)
+        result.update(self.gauges)
+        result["frameTime"] = self.frameTime.snapshot()
+        return result
+
+class Metrics(object):
+    """
+    Thread-safe statistics of one node, kept per port and per neighbour.
+    """
+    def __init__(self, clock = time.time):
+        self.clock = clock
+        self.started = clock()
+        self.lock = threading.Lock()
+        self.ports = {} # port name -> LinkStats
+        self.neighbours = {} # neighbour name -> LinkStats
+        self.compression = dict((key, 0) for key in COMPRESSION)
+        self.profiler = None # cProfile.Profile while profiling
+
+    def link(self, table, key):
+        stats = table.get(key)
+        if stats == None:
+            stats = table[key] = LinkStats()
+        return stats
+
+    # Adds n to a counter of a port.
+    def count(self, port, key, n = 1):
+        with self.lock:
+            self.link(self.ports, port).counters[key] += n
+
+    # Adds n to a counter of a node this one exchanges frames with.
+    def count_neighbour(self, name, key, n = 1):
+        with self.lock:
+            self.link(self.neighbours, name).counters[key] += n
+
+    def counter(self, port, key):
+        with self.lock:
+            stats = self.ports.get(port)
+            return 0 if stats == None else stats.counters[key]
+
+    # Adds n to a compression counter.
+    def count_compression(self, key, n = 1):
+        with self.lock:
+            self.compression[key] += n
+
+    # Returns the compression counters with the ratio of bytes after to
+    # bytes before, and the mean microseconds spent on each payload. Called
+    # with the lock held.
+    def compression_snapshot(self):
+        result = dict(self.compression)
+        before, after = result["bytesBefore"], result["bytesAfter"]
+        result["ratio"] = float(after) / before if before else 1.0
+        result["compressUs"] = (result["compressTime"] * 1e6 /
+                                result["payloads"] if result["payloads"] else 0.0)
+        result["expandUs"] = (result["expandTime"] * 1e6 /
+                              result["expanded"] if result["expanded"] else 0.0)
+        return result
+
+    def gauge(self, port, key, value):
+        with self.lock:
+            self.link(self.ports, port).gauges[key] = value
+
+    def frame_time(self, port, seconds):
+        with self.lock:
+            self.link(self.ports, port).frameTime.add(seconds)
+
+    def snapshot(self):
+        with self.lock:
+            return {"time": self.clock(),
+                    "uptime": self.clock() - self.started,
+                    "profiling": self.profiler != None,
+                    "compression": self.compression_snapshot(),
+                    "ports": dict((name, stats.snapshot())
+                                  for name, stats in self.ports.items()),
+                    "neighbours": dict((name, stats.snapshot())
+                                       for name, stats in
+                                       self.neighbours.items())}
+
+    # Writes a snapshot to path, replacing the previous one whole.
+    def write_json(self, path):
+        data = json.dumps(self.snapshot(), indent = 1, sort_keys = True)
+        with open(path + ".tmp", "w") as f:
+            f.write(data)
+        # rename replaces the file in one step on POSIX, so readers never
+        # see half a snapshot; Windows will not rename over a file
+        if os.name == "nt" and os.path.exists(path):
+            os.remove(path)
+        os.rename(path + ".tmp", path)
+
+    # Starts collecting a profile of the receive loop.
+    def start_profile(self):
+        if self.profiler == None:
+            self.profiler = cProfile.Profile()
+
+    # Stops profiling and returns the busiest functions as text, saving the
+    # raw profile to path if one is given.
+    def stop_profile(self, path = None, limit = 20):
+        profiler, self.profiler = self.profiler, None
+        if profiler == None:
+            return ""
+        if path != None:
+            profiler.dump_stats(path)
+        out = io.BytesIO() if str is bytes else io.StringIO()
+        stats = pstats.Stats(profiler, stream = out)
+        stats.sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+# Name used for a port in the statistics.
+def port_label(port):
+    return str(getattr(port, "port", None) or "port")
@@ -0,0 +1,239 @@
+"""
+Network Testing Application
+
+This application allows for the sending and retrieval of data across a network
+which uses serial ports on multiple machines. It adopts its own protocol and
+allows for text to be sent from one machine to another.
+
+Author: Nick Klose (nick.klose@ualberta.ca)
+http://ualberta.ca/~klose
+
+Baud rate negotiation between the two ends of a point to point link, using
+{BAUD=...} frames. The end with the lower address leads: it proposes the
+next rate up the list, both ends switch, and the leader sends a burst of
+test frames. The other end counts the ones arriving intact and either keeps
+the rate or goes back to the previous one and says so. The leader carries
+on upwards until a rate fails or the list ends.
+
+Both ends also watch the share of corrupt frames and step down a rate when
+it passes ERROR_LIMIT, and go back to the rate the user chose when the
+neighbour is lost, so a link which broke halfway through a switch finds
+itself again.
+"""
+import protocol
+import metrics
+import send_queue
+
+CHECK_INTERVAL = 10.0 # seconds between error checks and attempts to go up
+SWITCH_DELAY = 0.5 # seconds for the last frames to leave before switching
+TEST_FRAMES = 20 # test frames sent at each new rate
+TEST_SIZE = 64 # filler bytes in each test frame
+PASS_RATIO = 0.95 # fraction of test frames which must arrive intact
+TEST_TIMEOUT = 5.0 # seconds to wait for an answer at each step
+ERROR_LIMIT = 0.05 # share of corrupt frames which makes a link step down
+FILLER = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+
+# States
+IDLE = "idle"
+PROPOSED = "proposed" # the leader is waiting for the proposal to be accepted
+TESTING = "testing" # the leader sent test frames and waits for the result
+CHECKING = "checking" # the other end is counting test frames
+
+def test_filler(sequence):
+    start = sequence % len(FILLER)
+    return (FILLER * (TEST_SIZE // len(FILLER) + 2))[start:start + TEST_SIZE]
+
+class Negotiator(object):
+    def __init__(self, core, rates):
+        self.core = core
+        self.rates = sorted(rates)
+        self.enabled = False
+        self.base = None # rate chosen by the user, where negotiation starts
+        self.ceiling = None # lowest rate known to fail on this link
+        self.state = IDLE
+        self.rate = None # rate being tried
+        self.previous = None # rate to go back to if it fails
+        self.intact = 0 # test frames received intact
+        self.timer = None # task ending the current step
+        self.errorMark = (0, 0) # corrupt and total frames at the last check
+
+    def enable(self, enabled = True):
+        self.enabled = enabled
+        self.base = int(self.core.baud)
+        self.ceiling = None
+        self.finish()
+
+    # The neighbour this node negotiates with, if it has exactly one.
+    def neighbour(self):
+        names = self.core.neighbours.names()
+        return names.pop() if len(names) == 1 else None
+
+    def leads(self, neighbour):
+        core = self.core
+        theirs = core.address_of(neighbour)
+        if core.directory.assigned(theirs):
+            return core.address < theirs
+        # older nodes go by the hashes of the names
+        return protocol.address(core.name) < theirs
+
+    def higher_rate(self):
+        baud = int(self.core.baud)
+        for rate in self.rates:
+            if rate > baud and (self.ceiling == None or rate < self.ceiling):
+                return rate
+        return None
+
+    def lower_rate(self):
+        baud = int(self.core.baud)
+        lower = [rate for rate in self.rates if self.base <= rate < baud]
+        return lower[-1] if lower else None
+
+    def send(self, text):
+        self.core.write("{BAUD=" + text + "}", priority = send_queue.CONTROL)
+
+    def wait(self, seconds, func):
+        self.cancel()
+        self.timer = self.core.scheduler.call_later(seconds, func)
+
+    def cancel(self):
+        if self.timer != None:
+            self.timer.cancel()
+            self.timer = None
+
+    def finish(self):
+        self.cancel()
+        self.state = IDLE
+        self.rate = None
+        self.previous = None
+
+    # Switches this end once the frames already queued had time to leave.
+    def switch_later(self, rate):
+        self.core.scheduler.call_later(SWITCH_DELAY,
+                                       lambda: self.core.set_baud(rate))
+
+    # Called periodically: steps down if too many frames are corrupt, and
+    # otherwise lets the leader try the next rate up.
+    def tick(self):
+        if not self.enabled or not self.core.is_open():
+            return
+        if self.state == IDLE and self.too_many_errors():
+            lower = self.lower_rate()
+            if lower != None:
+                self.ceiling = int(self.core.baud)
+                self.send("DOWN " + str(lower))
+                self.switch_later(lower)
+                return
+
+        neighbour = self.neighbour()
+        if self.state != IDLE or neighbour == None or not self.leads(neighbour):
+            return
+        rate = self.higher_rate()
+        if rate != None:
+            self.state = PROPOSED
+            self.rate = rate
+            self.previous = int(self.core.baud)
+            self.send("PROPOSE " + str(rate))
+            # a neighbour which does not negotiate never answers
+            self.wait(TEST_TIMEOUT, self.refused)
+
+    def too_many_errors(self):
+        port = metrics.port_label(self.core.serial)
+        corrupt = self.core.metrics.counter(port, "parseErrors")
+        frames = self.core.metrics.counter(port, "framesIn")
+        lastCorrupt, lastFrames = self.errorMark
+        self.errorMark = (corrupt, frames)
+        seen = (corrupt - lastCorrupt) + (frames - lastFrames)
+        return seen > 0 and float(corrupt - lastCorrupt) / seen > ERROR_LIMIT
+
+    # Acts on a {BAUD=...} frame from the neighbour. Like every other step
+    # this runs on the scheduler's thread, so no locking is needed.
+    def handle(self, value):
+        if not self.enabled:
+            return
+        parts = value.split(" ")
+        if len(parts) < 2 or not parts[1].isdigit():
+            return
+        verb, rate = parts[0], int(parts[1])
+        if verb == "PROPOSE":
+            self.proposed(rate)
+        elif verb == "ACCEPT" and self.state == PROPOSED and rate == self.rate:
+            self.accepted()
+        elif verb == "TEST" and self.state == CHECKING and rate == self.rate:
+            if len(parts) == 4 and parts[3] == test_filler(int(parts[2])):
+                self.intact += 1
+                if self.intact >= TEST_FRAMES:
+                    self.judge()
+        elif verb == "RESULT" and self.state == TESTING and rate == self.rate:
+            self.cancel()
+            intact = int(parts[2]) if parts[2:3] and parts[2].isdigit() else 0
+            if intact >= PASS_RATIO * TEST_FRAMES:
+                self.core.msg("Link running at " + str(rate) + " baud.")
+                self.finish()
+            else:
+                self.failed()
+        elif verb == "FAIL" and self.state == TESTING and rate == self.rate:
+            self.failed()
+        elif verb == "DOWN" and rate < int(self.core.baud):
+            self.ceiling = int(self.core.baud)
+            self.finish()
+            self.switch_later(rate)
+
+    # The other end: accepts a proposal and counts the test frames after.
+    def proposed(self, rate):
+        if (rate not in self.rates or self.state != IDLE or
+                (self.ceiling != None and rate >= self.ceiling)):
+            return
+        self.send("ACCEPT " + str(rate))
+        self.state = CHECKING
+        self.rate = rate
+        self.previous = int(self.core.baud)
+        self.intact = 0
+        self.switch_later(rate)
+        self.wait(SWITCH_DELAY + TEST_TIMEOUT, self.judge)
+
+    def judge(self):
+        rate, previous = self.rate, self.previous
+        passed = self.intact >= PASS_RATIO * TEST_FRAMES
+        self.finish()
+        if passed:
+            self.send("RESULT %d %d" % (rate, self.intact))
+            self.core.msg("Link running at " + str(rate) + " baud.")
+        else:
+            # say so at the old rate, where the leader will be listening
+            self.ceiling = rate
+            self.core.set_baud(previous)
+            self.send("FAIL " + str(rate))
+
+    # The leader: switches and sends the test frames.
+    def accepted(self):
+        self.state = TESTING
+        self.switch_later(self.rate)
+        self.core.scheduler.call_later(2 * SWITCH_DELAY, self.send_tests)
+        self.wait(2 * SWITCH_DELAY + TEST_TIMEOUT, self.failed)
+
+    def send_tests(self):
+        if self.state != TESTING:
+            return
+        for sequence in range(TEST_FRAMES):
+            self.send("TEST %d %d %s" % (self.rate, sequence,
+                                         test_filler(sequence)))
+
+    def refused(self):
+        self.ceiling = self.rate
+        self.finish()
+
+    def failed(self):
+        rate, previous = self.rate, self.previous
+        self.finish()
+        self.ceiling = rate
+        if previous != None:
+            self.core.set_baud(previous)
+
+    # The neighbour is gone, so return to where negotiation started.
+    def lost(self):
+        if not self.enabled:
+            return
+        self.finish()
+        self.ceiling = None
+        if int(self.core.baud) != self.base:
+            self.core.set_baud(self.base)
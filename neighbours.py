@@ -0,0 +1,142 @@
+"""
+Network Testing Application
+
+This application allows for the sending and retrieval of data across a network
+which uses serial ports on multiple machines. It adopts its own protocol and
+allows for text to be sent from one machine to another.
+
+Author: Nick Klose (nick.klose@ualberta.ca)
+http://ualberta.ca/~klose
+
+The neighbour table records every node heard directly, when it was last
+heard and how reliably its pings arrive. Entries expire in order of their
+deadline using a min-heap, and each change is returned as an added/removed
+diff so that user interfaces never have to rebuild their whole list.
+"""
+import time
+import heapq
+import threading
+
+PING_INTERVAL = 5.0 # seconds between pings unless a node says otherwise
+MISSED_PINGS = 2.4 # ping intervals without a ping before a node is dropped
+
+class Neighbour(object):
+    def __init__(self, name, now):
+        self.name = name
+        self.firstSeen = now # when the neighbour was first heard
+        self.lastSeen = now # when the neighbour was last heard
+        self.pings = 0 # pings received
+        self.missed = 0 # pings which should have arrived but did not
+        self.frames = 0 # other frames which came straight from it
+        self.interval = PING_INTERVAL # seconds between its pings
+
+    # Seconds without a ping after which the neighbour is dropped.
+    def timeout(self):
+        return MISSED_PINGS * self.interval
+
+    # Fraction of expected pings which actually arrived.
+    def quality(self):
+        expected = self.pings + self.missed
+        return float(self.pings) / expected if expected else 1.0
+
+class NeighbourTable(object):
+    """
+    Thread-safe table of neighbours keyed by name. Membership checks are
+    dictionary lookups; expiry pops deadlines off a heap, skipping the
+    stale ones left behind whenever a neighbour was heard again.
+    """
+    def __init__(self, clock = time.time):
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.entries = {} # name -> Neighbour
+        self.deadlines = [] # heap of (expiry time, name)
+
+    # Records a ping from a node. Returns True if it is a new neighbour.
+    def pinged(self, name):
+        now = self.clock()
+        with self.lock:
+            entry = self.entries.get(name)
+            added = entry == None
+            if added:
+                entry = self.entries[name] = Neighbour(name, now)
+            else:
+                # count the pings lost since the last one arrived
+                gap = now - entry.lastSeen
+                entry.missed += max(0, int(gap / entry.interval + 0.5) - 1)
+            entry.pings += 1
+            entry.lastSeen = now
+            self.push(entry)
+            return added
+
+    # Records the ping interval a neighbour announced.
+    def set_interval(self, name, interval):
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry != None and interval > 0:
+                entry.interval = interval
+                self.push(entry)
+
+    # Seconds without a ping after which a neighbour is dropped.
+    def timeout(self, name):
+        entry = self.entries.get(name)
+        return MISSED_PINGS * (PING_INTERVAL if entry == None else entry.interval)
+
+    def push(self, entry):
+        expiry = entry.lastSeen + entry.timeout()
+        heapq.heappush(self.deadlines, (expiry, entry.name))
+        if len(self.deadlines) > 4 * len(self.entries) + 16:
+            self.compact()
+
+    # Moves a neighbour to a new name. Returns True if it was in the table.
+    def rename(self, old, new):
+        with self.lock:
+            entry = self.entries.pop(old, None)
+            if entry == None:
+                return False
+            entry.name = new
+            self.entries[new] = entry
+            self.push(entry)
+            return True
+
+    # Counts a frame which came straight from a neighbour.
+    def heard(self, name):
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry != None:
+                entry.frames += 1
+
+    # Drops neighbours which have been quiet too long and returns their names.
+    def expire(self):
+        now = self.clock()
+        removed = []
+        with self.lock:
+            deadlines = self.deadlines
+            while deadlines and deadlines[0][0] <= now:
+                expiry, name = heapq.heappop(deadlines)
+                entry = self.entries.get(name)
+                # a later ping pushed a newer deadline for this neighbour
+                if entry == None or entry.lastSeen + entry.timeout() != expiry:
+                    continue
+                del self.entries[name]
+                removed.append(name)
+        return removed
+
+    # Rebuilds the heap with only the current deadline of each neighbour.
+    def compact(self):
+        self.deadlines = [(entry.lastSeen + entry.timeout(), name)
+                          for name, entry in self.entries.items()]
+        heapq.heapify(self.deadlines)
+
+    def get(self, name):
+        with self.lock:
+            return self.entries.get(name)
+
+    def names(self):
+        with self.lock:
+            return set(self.entries)
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def __len__(self):
+        return len(self.entries)
@@ -2,303 +2,201 @@
 Network Testing Application
 
 This application allows for the sending and retrieval of data across a network
-which uses serial ports on multiple machines. It adopts its own protocol and 
+which uses serial ports on multiple machines. It adopts its own protocol and
 allows for text to be sent from one machine to another.
 
+Run without arguments for the graphical interface, or with --headless to
+run a node (for example an unattended relay) without loading Qt:
+
+    python network.py --headless --port /dev/ttyUSB0 --baud 9600
+
+In headless mode lines typed on standard input of the form "NAME text"
+send text to the node called NAME. --stats FILE keeps a JSON snapshot of
+the link statistics in FILE, and sending the process SIGUSR1 switches
+profiling of the receive loop on and off.
+
+With --gateway the node opens several ports at once and relays between the
+mesh segments attached to them (every serial port found if none are named):
+
+    python network.py --gateway /dev/ttyUSB0 /dev/ttyUSB1
+
 Author: Nick Klose (nick.klose@ualberta.ca)
 http://ualberta.ca/~klose
 """
-import time
-import serial
-import platform
-import glob
-import random
+import sys
+import signal
+import argparse
 import threading
-import os, sys
-from PyQt4 import QtCore, QtGui
-from serial_listen import SerialListen
-from gui import Ui_MainWindow
-from PIL import Image
+import node
+import gateway
+import protocol
+import fragments
+import fec
 
-# Default connection parameters
-PORT = None
-BAUD_RATE = 9600
-PARITY = serial.PARITY_EVEN
-STOP_BITS = serial.STOPBITS_TWO
-BYTE_SIZE = serial.EIGHTBITS
-NODE_NAME = None
+class ConsoleEvents(node.NodeEvents):
+    """
+    Prints node events on standard output for headless mode.
+    """
+    def write(self, line):
+        sys.stdout.write(line + "\n")
+        sys.stdout.flush()
 
-class NetworkTest(QtGui.QMainWindow):
-    def __init__(self, parent = None):
-        QtGui.QWidget.__init__(self, parent)
-        self.ui = Ui_MainWindow()
-        self.ui.setupUi(self)
-        
-        self.setFixedSize(self.size()) # disable resizing
-        
-        self.serial = None # serial object with configs
-        self.ports = [] # list of open ports
-        self.name = NODE_NAME # name of this node
-        self.node = None # name of node to send to
-        self.input = "" # text input from another device
-        self.nodes = [] # nodes in range of this one
-        self.oldNodes = []
-        self.thread = None # thread for listening to the network
-        self.queue = [] # queue of messages to send when possible
-        
-        self.port = PORT
-        self.baud = BAUD_RATE
-        self.parity = PARITY
-        self.stopBits = STOP_BITS
-        self.byteSize = BYTE_SIZE
-        
-        self.initialize() # initialize the interface
-        
-        # QT signals used
-        clicked = QtCore.SIGNAL("clicked()")
-        toggled = QtCore.SIGNAL("toggled(bool)")
-        itemClicked = QtCore.SIGNAL("itemClicked(QListWidgetItem *)")
-        indexChanged = QtCore.SIGNAL("currentIndexChanged(const QString&)")
-        textChanged = QtCore.SIGNAL("textChanged(const QString&)")
-        returnPressed = QtCore.SIGNAL("returnPressed()")
-        
-        # list widget connections
-        QtCore.QObject.connect(self.ui.listPorts, itemClicked, self.select_port)
-        QtCore.QObject.connect(self.ui.listNodes, itemClicked, self.select_node)
-        
-        # radio button connections
-        QtCore.QObject.connect(self.ui.radioEven, toggled, self.select_parity)
-        QtCore.QObject.connect(self.ui.radioOdd, toggled, self.select_parity)
-        QtCore.QObject.connect(self.ui.radioMark, toggled, self.select_parity)
-        QtCore.QObject.connect(self.ui.radioSpace, toggled, self.select_parity)
-        QtCore.QObject.connect(self.ui.radioNone, toggled, self.select_parity)
-        
-        QtCore.QObject.connect(self.ui.radio1, toggled, self.select_stop_bits)
-        QtCore.QObject.connect(self.ui.radio15, toggled, self.select_stop_bits)
-        QtCore.QObject.connect(self.ui.radio2, toggled, self.select_stop_bits)
-        
-        QtCore.QObject.connect(self.ui.radio5, toggled, self.select_byte_size)
-        QtCore.QObject.connect(self.ui.radio6, toggled, self.select_byte_size)
-        QtCore.QObject.connect(self.ui.radio7, toggled, self.select_byte_size)
-        QtCore.QObject.connect(self.ui.radio8, toggled, self.select_byte_size)
-        
-        # combo box connections
-        QtCore.QObject.connect(self.ui.comboBaudRate, indexChanged, self.select_baud)
-       
-        # line edit connections
-        QtCore.QObject.connect(self.ui.textName, textChanged, self.change_name)
-        QtCore.QObject.connect(self.ui.textSend, returnPressed, self.send_text)
-        
-        # button connections
-        QtCore.QObject.connect(self.ui.btnSend, clicked, self.send_text)
-        QtCore.QObject.connect(self.ui.btnSendImage, clicked, self.send_image)
-    
-    def refresh(self):
-        if self.thread != None:
-            self.thread.stop()
-        if self.serial != None:
-            if self.serial.isOpen():
-                self.serial.close()
-                self.update_serial()
-        self.thread = SerialListen(self)
-        self.thread.start()
-                
-    def initialize(self):
-        self.msg("Initializing...")
-        
-        self.ui.listPorts.clear()
-        self.ports = self.list_ports()
-        for port in self.ports:
-            self.ui.listPorts.addItem(str(port))
-        
-        # Set default baud rate
-        self.select_baud(BAUD_RATE)
-        
-        # Set default parity
-        if PARITY == serial.PARITY_NONE:
-            self.ui.radioNone.setChecked(True)
-        elif PARITY == serial.PARITY_ODD:
-            self.ui.radioOdd.setChecked(True)
-        elif PARITY == serial.PARITY_MARK:
-            self.ui.radioMark.setChecked(True)
-        elif PARITY == serial.PARITY_SPACE:
-            self.ui.radioSpace.setChecked(True)
-        else:
-            self.ui.radioEven.setChecked(True)
-            self.parity = serial.PARITY_EVEN
-        
-        # Set default stop bits
-        if float(STOP_BITS) == 1.0:
-            self.ui.radio1.setChecked(True)
-        elif float(STOP_BITS) == 1.5:
-            self.ui.radio15.setChecked(True)
-        else:
-            self.stopBits = 2
-            self.ui.radio2.setChecked(True)
-        
-        # Set default byte size
-        if BYTE_SIZE == 5:
-            self.ui.radio5.setChecked(True)
-        elif BYTE_SIZE == 6:
-            self.ui.radio6.setChecked(True)
-        elif BYTE_SIZE == 7:
-            self.ui.radio7.setChecked(True)
-        else:
-            self.ui.radio8.setChecked(True)
-            self.byteSize = 8
-        
-        # Set default name
-        self.change_name(self.random_name())
-        
-        # Clear list widgets
-        self.ui.listNodes.clear()
-        self.ui.listSentData.clear()
-        self.ui.listReceivedData.clear()
-        self.ui.listRelayedData.clear()
-        
-        
-        self.msg("Initialized.")
-    
-    def send_ping(self):
-        threading.Timer(5.0, self.send_ping).start()
-        self.serial.write("{NAME=" + self.name + "}")
-        self.oldNodes = self.nodes
-        self.nodes = []
-        
-    def select_port(self, item):
-        self.msg("Selecting new port: " + str(item.text()))
-        self.port = int(item.text()[3:])
-        self.update_serial()
-        self.refresh()
-        
-    def select_node(self, item):
-        self.msg("Selecting new node: " + str(item.text()))
-        self.node = str(item.text())
-        
-    def select_parity(self, button):
-        self.msg("Selecting new parity.")
-        if self.ui.radioEven.isChecked():
-            self.parity = serial.PARITY_EVEN
-        elif self.ui.radioOdd.isChecked():
-            self.parity = serial.PARITY_ODD
-        elif self.ui.radioMark.isChecked():
-            self.parity = serial.PARITY_MARK
-        elif self.ui.radioSpace.isChecked():
-            self.parity = serial.PARITY_SPACE
-        else:
-            selfparity = serial.PARITY_NONE
-        
-        
-    def select_stop_bits(self, button):
-        self.msg("Selecting new stop bits.")
-        if self.ui.radio1.isChecked():
-            self.stopBits = serial.STOPBITS_ONE
-        elif self.ui.radio15.isChecked():
-            self.stopBits = serial.STOPBITS_ONE_POINT_FIVE
-        else:
-            self.stopBits = serial.STOPBITS_TWO
-            
-        
-    def select_byte_size(self, button):
-        self.msg("Selecting new byte size.")
-        if self.ui.radio5.isChecked():
-            self.byteSize = serial.FIVEBITS
-        elif self.ui.radio6.isChecked():
-            self.byteSize = serial.SIXBITS
-        elif self.ui.radio7.isChecked():
-            self.byteSize = serial.SEVENBITS
-        else:
-            self.byteSize = serial.EIGHTBITS
-            
-        self.refresh()
-    
-    def select_baud(self, baud):
-        self.msg("Selecting new baud rate: " + str(baud))
-        index = self.ui.comboBaudRate.findText(str(baud))
-        self.baud = self.ui.comboBaudRate.itemText(index)
-        self.ui.comboBaudRate.setCurrentIndex(index)
-        
-        self.refresh()
-        
-    def change_name(self, name):
-        self.msg("Changing this node's name to " + str(name))
-        self.ui.textName.setText(name)
-        self.name = name
-        
-    def send_text(self):
-        if str(self.ui.textSend.text()) != "" and self.node != None:
-            self.msg("Sending text: " + str(self.ui.textSend.text()))
-            self.send(self.name, self.node, self.ui.textSend.text())
-            self.ui.textSend.clear()
-        elif self.node == None:
-            self.msg("You must select a node to send this message.")
-        else:
-            self.msg("No text entered.")
-     
-    def send_image(self):
-        image = str(QtGui.QFileDialog.getOpenFileName())
-        imageStr = Image.open(image).tostring()
-        self.serial.write(imageStr)
-     
-    # Sends a message with a specified sender and recipient
-    def send(self, sender, recipient, text):
-        message = "{FROM=" + sender + "}{TO=" + recipient + "}{TEXT=" + text + "}"
-        #self.queue.append(message)
-        self.serial.write(message)
-        if sender == self.name:
-            self.ui.listSentData.addItem("<To: " + recipient + "> " + text)
-        
-    # Prints a message to the user via the status bar.
-    def msg(self, text):
-        self.ui.statusbar.showMessage(str(text))
+    def status(self, text):
+        self.write("* " + text)
 
-    def list_ports(self):
-        ports = None
-        if platform.system() == "Windows":
-            ports = []
-            for i in range(256):
-                try:
-                    s = serial.Serial(i)
-                    ports.append("USB" + str("%03d" % (i,)))
-                    s.close()
-                except serial.SerialException:
-                    pass
-        else:
-            ports = glob.glob("/dev/ttyS*") + glob.glob("/dev/ttyUSB*")
-        return ports
-        
-    # Generates a random name for this node.
-    def random_name(self):
-        names = ["Donut", "Penguin", "Stumpy", "Whicker", "Howard",
-                 "Wilshire", "Disco", "Jack", "Bear", "Sneak", "Wisp",
-                 "Crazy", "Goat", "Pirate", "Hambone", "Walla", "Snake",
-                 "Caboose", "Sleepy", "Stompy", "Mopey", "Dopey", "Weasel",
-                 "Ghost", "Dasher", "Grumpy", "Hollywood", "Noodle", "Cupid",
-                 "Abraham", "Prancer", "Blinky", "Bonobo", "Banana", "Cinnabon"]
-                 
-        rand = random.randint(0, len(names) - 1)
-        return names[rand]
-    
-    def update_serial(self):
-        try:
-            #self.serial = serial.Serial(self.port, self.baud, self.byteSize, 
-            #                            self.parity, self.stopBits)
-            if self.thread != None:
-                self.thread.stop()
-                self.thread = None
-            if self.serial != None:
-                if self.serial.isOpen():
-                    self.serial.close()
-                    self.serial = None
-                    
-            self.serial = serial.Serial(self.port)
-            self.send_ping()
-        except Exception as e:
-            self.msg("Serial already initialized, " + str(e))
-           
-# call main function
-if __name__ == "__main__":
-    app = QtGui.QApplication(sys.argv)
+    def name_changed(self, name):
+        self.write("* Name is now " + name)
+
+    def node_added(self, name):
+        self.write("* " + name + " is in range")
+
+    def node_removed(self, name):
+        self.write("* " + name + " is out of range")
+
+    def sent(self, recipient, text, key = None):
+        if key != None:
+            text += " [#%d]" % key
+        self.write("<To: " + recipient + "> " + text)
+
+    def delivered(self, recipient, key, confirmed):
+        self.write("* Message #%d to %s %s" % (key, recipient,
+                                             "delivered" if confirmed else
+                                             "could not be delivered"))
+
+    def received(self, sender, text):
+        self.write("<From: " + sender + "> " + text)
+
+    def relayed(self, sender, recipient, text):
+        self.write("<From: " + sender + "> <To: " + recipient + "> " + text)
+
+    def image_updated(self, sender, imageId, image, complete):
+        if complete:
+            path = "image-%s-%d.png" % (sender, imageId)
+            image.save(path)
+            self.write("<From: " + sender + "> [Image: " + path + "]")
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description = "Network Testing Application")
+    parser.add_argument("--headless", action = "store_true",
+                        help = "run without the graphical interface")
+    parser.add_argument("--port", help = "serial port, e.g. /dev/ttyUSB0 or 3")
+    parser.add_argument("--gateway", nargs = "*", metavar = "PORT",
+                        help = "relay between several ports without a window")
+    parser.add_argument("--baud", type = int, default = node.BAUD_RATE)
+    parser.add_argument("--auto-baud", action = "store_true",
+                        help = "negotiate the fastest rate, starting at --baud")
+    parser.add_argument("--parity", default = node.PARITY,
+                        choices = ["N", "E", "O", "M", "S"])
+    parser.add_argument("--stop-bits", type = float, default = node.STOP_BITS,
+                        choices = [1, 1.5, 2])
+    parser.add_argument("--byte-size", type = int, default = node.BYTE_SIZE,
+                        choices = [5, 6, 7, 8])
+    parser.add_argument("--name", help = "node name, random if not given")
+    parser.add_argument("--stats", metavar = "FILE",
+                        help = "write link statistics to FILE as JSON")
+    parser.add_argument("--mtu", type = int, default = fragments.MTU,
+                        help = "longest payload sent in one frame, longer "
+                               "ones are split")
+    parser.add_argument("--fec", type = fec.parse_mode, default = fec.OFF,
+                        metavar = "PARITY",
+                        help = "send binary frames with PARITY bytes of "
+                               "error correction per block, 'auto' to adapt "
+                               "to the error rate or 'off'")
+    parser.add_argument("--reliable", action = "store_true",
+                        help = "resend messages until they are acknowledged")
+    parser.add_argument("--capture", metavar = "DIR",
+                        help = "save the raw bytes of each port to DIR")
+    # anything else is left for Qt, e.g. -style
+    args = parser.parse_known_args(argv)[0]
+    if not fragments.MIN_MTU <= args.mtu <= protocol.MAX_PAYLOAD:
+        parser.error("--mtu must be between %d and %d"
+                     % (fragments.MIN_MTU, protocol.MAX_PAYLOAD))
+    return args
+
+# Lets SIGUSR1 switch profiling of the receive loop on and off, printing
+# the profile when it is switched off.
+def profile_on_signal(core):
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, lambda signum, frame:
+                      sys.stdout.write(core.toggle_profile()))
+
+# Runs a node with no user interface until interrupted.
+def run_headless(args):
+    core = node.Node(ConsoleEvents())
+    core.port = int(args.port) if args.port.isdigit() else args.port
+    core.baud = args.baud
+    core.parity = args.parity
+    core.stopBits = args.stop_bits
+    core.byteSize = args.byte_size
+    core.change_name(args.name or core.random_name())
+    core.statsFile = args.stats
+    core.captureDir = args.capture
+    core.set_mtu(args.mtu)
+    core.set_fec(args.fec)
+    core.reliable = args.reliable
+    profile_on_signal(core)
+    core.open()
+    core.auto_baud(args.auto_baud)
+
+    try:
+        # send "NAME text" lines from standard input
+        for line in iter(sys.stdin.readline, ""):
+            parts = line.strip().split(" ", 1)
+            if len(parts) == 2:
+                core.send(core.name, parts[0], parts[1])
+        # keep relaying once input is closed, e.g. when run as a service
+        stopped = threading.Event()
+        while not stopped.is_set():
+            stopped.wait(1.0)
+    except KeyboardInterrupt:
+        pass
+    core.close()
+    return 0
+
+# Bridges several ports from a single loop until interrupted.
+def run_gateway(args):
+    core = gateway.Gateway(ConsoleEvents())
+    core.baud = args.baud
+    core.parity = args.parity
+    core.stopBits = args.stop_bits
+    core.byteSize = args.byte_size
+    core.change_name(args.name or core.random_name())
+    core.statsFile = args.stats
+    core.captureDir = args.capture
+    core.set_mtu(args.mtu)
+    core.set_fec(args.fec)
+    profile_on_signal(core)
+    core.open_ports(args.gateway or core.list_ports())
+    if not core.is_open():
+        sys.stderr.write("no serial ports could be opened\n")
+        return 1
+
+    try:
+        core.run()
+    except KeyboardInterrupt:
+        pass
+    core.close()
+    return 0
+
+def run_gui(argv):
+    from PyQt4 import QtGui
+    from window import NetworkTest
+    app = QtGui.QApplication(argv)
     nt = NetworkTest()
     nt.show()
-    sys.exit(app.exec_())
+    return app.exec_()
+
+def main(argv):
+    args = parse_args(argv[1:])
+    if args.gateway != None:
+        return run_gateway(args)
+    if args.headless:
+        if args.port == None:
+            sys.stderr.write("--port is required in headless mode\n")
+            return 2
+        return run_headless(args)
+    return run_gui(argv)
+
+# call main function
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,816 @@
+"""
+Network Testing Application
+
+This application allows for the sending and retrieval of data across a network
+which uses serial ports on multiple machines. It adopts its own protocol and
+allows for text to be sent from one machine to another.
+
+Author: Nick Klose (nick.klose@ualberta.ca)
+http://ualberta.ca/~klose
+
+The node core holds everything a node does on the network: port settings,
+pinging, sending, receiving and relaying. It has no user interface of its
+own and reports what happens through a NodeEvents object, so the same core
+runs behind the Qt window and in headless mode.
+"""
+import serial
+import random
+import time
+import os
+import protocol
+import imaging
+import relay
+import routing
+import neighbours
+import scheduler
+import send_queue
+import ports
+import metrics
+import negotiation
+import compression
+import capture
+import fragments
+import fec
+import arq
+import addressing
+import frame_parser
+from serial_listen import SerialListen
+
+# Default connection parameters
+PORT = None
+BAUD_RATE = 9600
+PARITY = serial.PARITY_EVEN
+STOP_BITS = serial.STOPBITS_TWO
+BYTE_SIZE = serial.EIGHTBITS
+NODE_NAME = None
+READ_TIMEOUT = 0.5 # seconds a read waits, so a stopped listener notices
+
+# Settings offered by the user interface
+BAUD_RATES = (50, 75, 110, 134, 150, 200, 300, 600, 1200, 1800, 2400, 4800,
+              9600, 19200, 38400, 57600, 115200)
+PARITIES = (serial.PARITY_NONE, serial.PARITY_EVEN, serial.PARITY_ODD,
+            serial.PARITY_MARK, serial.PARITY_SPACE)
+STOP_BITS_CHOICES = (serial.STOPBITS_ONE, serial.STOPBITS_ONE_POINT_FIVE,
+                     serial.STOPBITS_TWO)
+BYTE_SIZES = (serial.FIVEBITS, serial.SIXBITS, serial.SEVENBITS,
+              serial.EIGHTBITS)
+
+# Pings go out every PING_INTERVAL seconds on an idle link, stretching up to
+# MAX_PING_INTERVAL as the link gets busier
+PING_INTERVAL = neighbours.PING_INTERVAL
+MAX_PING_INTERVAL = 30.0
+
+# Outbox priority of each kind of binary packet
+PRIORITY = {protocol.TEXT: send_queue.TEXT, protocol.IMAGE: send_queue.BULK,
+            protocol.ROUTES: send_queue.CONTROL,
+            protocol.ECHO_REQUEST: send_queue.TEXT,
+            protocol.ECHO_REPLY: send_queue.TEXT,
+            protocol.ACK: send_queue.CONTROL}
+
+# Image transfer settings
+IMAGE_SIZE = (320, 240)
+IMAGE_FORMAT = "JPEG"
+IMAGE_QUALITY = 60
+
+class NodeEvents(object):
+    """
+    Receives notifications from a node. Every method does nothing here;
+    user interfaces override the ones they display.
+    """
+    # A status message for the user.
+    def status(self, text):
+        pass
+
+    # The name of this node changed.
+    def name_changed(self, name):
+        pass
+
+    # A node came into range.
+    def node_added(self, name):
+        pass
+
+    # A node has not been heard for a while and is out of range.
+    def node_removed(self, name):
+        pass
+
+    # This node sent a message. key is set for messages sent for confirmed
+    # delivery, and given again to delivered() once the outcome is known.
+    def sent(self, recipient, text, key = None):
+        pass
+
+    # A message sent with a key was acknowledged by its recipient, or was
+    # given up on if confirmed is False.
+    def delivered(self, recipient, key, confirmed):
+        pass
+
+    # A message for this node arrived.
+    def received(self, sender, text):
+        pass
+
+    # A message for another node passed through this one.
+    def relayed(self, sender, recipient, text):
+        pass
+
+    # Part of an incoming image was decoded.
+    def image_updated(self, sender, imageId, image, complete):
+        pass
+
+    # An echo reply arrived, rtt seconds after its request was sent with
+    # the given ttl. expired is set if the request ran out of hops at the
+    # sender rather than reaching the node it was sent to.
+    def echo_replied(self, sender, sequence, ttl, rtt, expired):
+        pass
+
+class Node(object):
+    # clock gives the time to every part of the node, so a simulation can
+    # run it on virtual time.
+    def __init__(self, events = None, clock = time.time):
+        self.events = events or NodeEvents() # receives everything that happens
+        self.clock = clock
+
+        self.serial = None # serial object with configs
+        self.name = NODE_NAME # name of this node
+        self.neighbours = neighbours.NeighbourTable(clock) # nodes in range
+        self.thread = None # thread for listening to the network
+        self.scheduler = scheduler.Scheduler(clock, self.msg) # periodic work
+        self.tasks = [] # periodic tasks tied to the open port
+        self.pingInterval = PING_INTERVAL # seconds until the next ping
+        self.bytesIn = 0 # bytes read from the port
+        self.bytesOut = 0 # bytes written to the port
+        self.loadMark = (clock(), 0) # time and traffic at the last ping
+        self.outbox = send_queue.SendQueue() # frames waiting for the port
+        self.metrics = metrics.Metrics(clock) # statistics per port and node
+        self.statsFile = None # where to write statistics snapshots, if any
+        self.captureDir = None # where to save raw captures of ports, if any
+        self.capture = None # raw capture of the port being used
+        self.negotiator = negotiation.Negotiator(self, BAUD_RATES)
+        self.writer = None # thread moving frames from the outbox to the port
+        self.v2Nodes = set() # nodes which advertised the binary protocol
+        self.zipNodes = {} # dictionary each node compresses payloads with
+        self.fragmentNodes = set() # nodes which reassemble fragments
+        # fragments received
+        self.fragments = fragments.Reassembler(clock = clock)
+        self.fec = fec.LinkCoding() # forward error correction on the port
+        self.mtu = None # longest payload sent in one frame
+        self.set_mtu(fragments.MTU)
+        self.codec = compression.Codec() # compresses and expands payloads
+        self.reliable = False # whether messages wait to be acknowledged
+        self.arq = arq.Reliable(self.write_reliable, clock) # reliable messages
+        self.deliveryId = 0 # key of the last message sent reliably
+        self.uid = addressing.node_uid() # tells nodes sharing an address apart
+        self.address = addressing.candidate(self.uid) # address on the wire
+        self.attempt = 0 # addresses given up because another node had them
+        # node names by their short address
+        self.directory = addressing.Directory(clock = clock)
+        self.imageCache = imaging.ImageCache() # recently encoded images
+        self.imageId = 0 # id of the last image sent
+        self.ids = relay.MessageIds() # ids for messages sent from this node
+        # messages already delivered or relayed
+        self.seen = relay.SeenCache(clock = clock)
+        # next hops towards other nodes
+        self.routes = routing.RoutingTable(self.address, clock = clock)
+
+        self.port = PORT
+        self.baud = BAUD_RATE
+        self.parity = PARITY
+        self.stopBits = STOP_BITS
+        self.byteSize = BYTE_SIZE
+
+    def refresh(self):
+        if self.thread != None:
+            self.thread.stop()
+        if self.serial != None:
+            if self.serial.isOpen():
+                self.serial.close()
+                self.update_serial()
+        self.listen()
+
+    # Starts the thread reading from the port.
+    def listen(self):
+        self.thread = SerialListen(self)
+        self.thread.start()
+
+    def update_serial(self):
+        try:
+            if self.thread != None:
+                self.thread.stop()
+                self.thread = None
+            if self.serial != None:
+                if self.serial.isOpen():
+                    self.serial.close()
+                    self.serial = None
+
+            self.serial = serial.Serial(self.port, baudrate = int(self.baud),
+                                        bytesize = self.byteSize,
+                                        parity = self.parity,
+                                        stopbits = self.stopBits,
+                                        timeout = READ_TIMEOUT)
+            self.stop_capture()
+            self.capture = self.open_capture(self.serial)
+            self.start_writer()
+            self.start_tasks()
+        except Exception as e:
+            self.msg("Serial already initialized, " + str(e))
+
+    # Opens the configured port, and its capture, once and starts listening
+    # on it.
+    def open(self):
+        self.update_serial()
+        self.listen()
+
+    # Stops listening and closes the port.
+    def close(self):
+        self.stop_tasks()
+        self.scheduler.stop()
+        self.outbox.close()
+        if self.writer != None:
+            self.writer.join(1.0)
+            self.writer = None
+        if self.thread != None:
+            self.thread.stop()
+            self.thread = None
+        if self.serial != None and self.serial.isOpen():
+            self.serial.close()
+        self.serial = None
+        self.stop_capture()
+
+    # Saves the raw bytes of the port to a new file in directory, and of
+    # every port opened after.
+    def start_capture(self, directory):
+        self.captureDir = directory
+        self.stop_capture()
+        self.capture = self.open_capture(self.serial)
+        if self.thread != None:
+            self.thread.capture = self.capture
+
+    def stop_capture(self):
+        if self.capture != None:
+            self.capture.close()
+            self.msg("Capture saved to " + self.capture.path)
+        self.capture = None
+        if self.thread != None:
+            self.thread.capture = None
+
+    def flush_captures(self):
+        if self.capture != None:
+            self.capture.flush()
+
+    # Returns a new capture of a port if captures are wanted.
+    def open_capture(self, port):
+        if self.captureDir == None or port == None:
+            return None
+        label = metrics.port_label(port)
+        info = {"name": self.name, "uid": self.uid, "address": self.address,
+                "port": label, "baud": int(self.baud),
+                "parity": self.parity, "stopBits": self.stopBits,
+                "byteSize": self.byteSize, "started": time.time()}
+        try:
+            captureFile = capture.CaptureFile(capture.capture_path(
+                self.captureDir, self.name, label), info)
+        except (IOError, OSError) as e:
+            self.msg("Could not capture " + label + ", " + str(e))
+            return None
+        self.msg("Capturing " + label + " to " + captureFile.path)
+        return captureFile
+
+    # Starts the thread which does all writing to the port.
+    def start_writer(self):
+        if self.writer == None or not self.writer.is_alive():
+            self.outbox.reopen()
+            self.writer = send_queue.Writer(self.outbox, self.write_now)
+            self.writer.start()
+
+    # Writes everything waiting in the outbox from the calling thread, for
+    # nodes run without a writer.
+    def flush(self):
+        batch = self.outbox.get_batch(0)
+        while batch != None:
+            self.write_now(batch)
+            batch = self.outbox.get_batch(0)
+
+    # Lets the link settle on the fastest rate both ends manage, starting
+    # from the current one.
+    def auto_baud(self, enabled = True):
+        self.negotiator.enable(enabled)
+
+    # Changes the baud rate of the open port without reopening it.
+    def set_baud(self, baud):
+        self.baud = baud
+        port = self.serial
+        if port == None:
+            return
+        try:
+            port.flush() # let everything written go out at the old rate
+            port.baudrate = baud
+        except (serial.SerialException, OSError, ValueError) as e:
+            self.msg("Could not change the baud rate, " + str(e))
+
+    # Schedules the periodic work for a freshly opened port, replacing
+    # whatever was scheduled for the previous one.
+    def start_tasks(self):
+        self.schedule_tasks()
+        self.scheduler.start()
+
+    # Queues the periodic work without starting the scheduler's thread, for
+    # callers which run the scheduler from their own loop.
+    def schedule_tasks(self):
+        self.stop_tasks()
+        self.pingInterval = PING_INTERVAL
+        self.loadMark = (self.clock(), self.bytesIn + self.bytesOut)
+        self.tasks.append(self.scheduler.call_every(self.pingInterval,
+                                                    self.send_ping, 0))
+        self.tasks.append(self.scheduler.call_every(1.0, self.expire))
+        self.tasks.append(self.scheduler.call_every(metrics.STATS_INTERVAL,
+                                                    self.write_stats))
+        self.tasks.append(self.scheduler.call_every(
+            negotiation.CHECK_INTERVAL, self.negotiator.tick))
+        self.tasks.append(self.scheduler.call_every(capture.FLUSH_INTERVAL,
+                                                    self.flush_captures))
+        self.tasks.append(self.scheduler.call_every(fec.TUNE_INTERVAL,
+                                                    self.tune_fec))
+        self.tasks.append(self.scheduler.call_every(arq.GRANULARITY,
+                                                    self.retransmit))
+
+    def stop_tasks(self):
+        for task in self.tasks:
+            task.cancel()
+        self.tasks = []
+
+    # Sends a ping and returns the number of seconds until the next one.
+    def send_ping(self):
+        if not self.is_open():
+            return
+        self.write(self.ping_message(), priority = send_queue.CONTROL)
+        if self.v2Nodes:
+            for message in self.routes_messages():
+                self.write(message, priority = send_queue.CONTROL)
+        return self.adapt_ping_interval()
+
+    # Spaces pings out further the more of the link's capacity is in use.
+    def adapt_ping_interval(self):
+        now = self.clock()
+        since, traffic = self.loadMark
+        if now - since < 1.0:
+            return self.pingInterval # too little traffic seen to judge
+        total = self.bytesIn + self.bytesOut
+        self.loadMark = (now, total)
+        capacity = int(self.baud) / 10.0 * (now - since)
+        load = min(1.0, (total - traffic) / capacity)
+        self.pingInterval = min(MAX_PING_INTERVAL,
+                                PING_INTERVAL * (1.0 + 5.0 * load))
+        return self.pingInterval
+
+    # Drops neighbours and routes which went quiet.
+    def expire(self):
+        self.expire_neighbours()
+        self.routes.expire()
+        self.fragments.expire()
+
+    # Drops neighbours which stopped pinging and tells the user interface.
+    def expire_neighbours(self):
+        for name in self.neighbours.expire():
+            self.events.node_removed(name)
+            self.negotiator.lost()
+
+    # Builds the ping announcing this node, its address and the protocols it
+    # speaks, followed by as many entries of its directory as fit in the
+    # MTU.
+    def ping_message(self):
+        message = ("{ADDR=" + addressing.format_claim(self.address, self.uid) +
+                   "}{NAME=" + self.name + "}{PROTO=" + str(protocol.VERSION) +
+                   "}{ZIP=" + str(compression.DICTIONARY_ID) + "}{FRAG=1}" +
+                   "{FEC=" + str(self.wanted_parity()) + "}" +
+                   "{INTERVAL=" + str(int(self.pingInterval)) + "}")
+        entries = self.directory.gossip(self.mtu)
+        if entries:
+            message += "{DIR=" + addressing.format_entries(entries) + "}"
+        return message
+
+    # Parity per block this node asks its neighbours to send with.
+    def wanted_parity(self):
+        return self.fec.advertise()
+
+    # Sets how the port sends with forward error correction: fec.OFF, a
+    # fixed number of parity bytes per block or fec.AUTO.
+    def set_fec(self, mode):
+        self.fec.mode = mode
+
+    # Updates the error rate estimate of the port.
+    def tune_fec(self):
+        if self.thread != None:
+            self.thread.tune_coding()
+
+    # Builds the ROUTES packets advertising every destination known here.
+    def routes_messages(self):
+        src = self.address
+        entries = self.routes.advertisement()
+        messages = []
+        for payload in routing.pack_routes(entries, self.mtu):
+            packet = protocol.Packet(protocol.ROUTES, src, protocol.BROADCAST,
+                                     payload, msgId = self.new_id(), ttl = 1)
+            messages.append(protocol.encode(packet))
+        return messages
+
+    def change_name(self, name):
+        if name == self.name:
+            return
+        self.msg("Changing this node's name to " + str(name))
+        self.name = name
+        self.events.name_changed(name)
+
+    # Takes a new unique id and the address hashed from it, or address if
+    # given, for example the one a captured node had moved to.
+    def set_uid(self, uid, address = None):
+        self.uid = uid
+        self.attempt = 0
+        self.address = address
+        if address == None:
+            self.address = addressing.candidate(uid)
+        self.routes.me = self.address
+
+    # Records the name of the node using an address, and its id if it
+    # announced one, which may show that another node has this node's
+    # address.
+    def learn(self, addr, name, uid = None, heard = True):
+        if addr == self.address and uid != None:
+            # gossip about this node need not be passed on
+            if uid != self.uid:
+                self.address_taken(uid)
+            return
+        # another node of the same name changes how the others are shown
+        names = (name, self.directory.name(addr))
+        before = self.directory.labels(names)
+        if self.directory.learn(addr, name, uid, heard):
+            after = self.directory.labels(names)
+            for other, label in before.items():
+                if after.get(other, label) != label:
+                    self.relabel(label, after[other])
+
+    # Moves what is known about a node from the label it was shown with to
+    # a new one.
+    def relabel(self, old, new):
+        if self.neighbours.rename(old, new):
+            self.events.node_removed(old)
+            self.events.node_added(new)
+        for nodes in (self.v2Nodes, self.fragmentNodes):
+            if old in nodes:
+                nodes.discard(old)
+                nodes.add(new)
+        if old in self.zipNodes:
+            self.zipNodes[new] = self.zipNodes.pop(old)
+
+    # Returns how a recipient is named in a brace frame. Nodes which
+    # announce an address are named with it, as NAME#ADDR, so that another
+    # node of the same name does not take the message as well.
+    def brace_recipient(self, recipient):
+        addr = self.address_of(recipient)
+        name = self.directory.name(addr)
+        if name == None or not self.directory.assigned(addr):
+            return recipient
+        return "%s#%04X" % (name, addr)
+
+    # Moves to a new address if the node sharing this one has the smaller
+    # id, and tells the neighbours straight away. The other node keeps it.
+    def address_taken(self, uid):
+        if uid > self.uid:
+            return
+        old = self.address
+        while self.address == old or self.address in self.directory:
+            self.attempt += 1
+            self.address = addressing.candidate(self.uid, self.attempt)
+        self.routes.me = self.address
+        self.msg("Address %04X is taken, now using %04X" % (old, self.address))
+        self.scheduler.call_later(0, self.send_ping)
+
+    # Returns the short address of a node from its name, or the label it is
+    # shown with. Nodes not in the directory are taken to be older ones,
+    # which use the hash of their name.
+    def address_of(self, name):
+        if name == self.name:
+            return self.address
+        addr = self.directory.resolve(name)
+        return protocol.address(name) if addr == None else addr
+
+    # Sends a message with a specified sender and recipient. Messages
+    # being relayed keep the id and remaining hops they arrived with.
+    # Returns False if the message was dropped because the outbox is full.
+    def send(self, sender, recipient, text, msgId = None,
+             ttl = relay.DEFAULT_TTL):
+        if msgId == None:
+            msgId = self.new_id()
+        dst = self.address_of(recipient)
+        hop = self.routes.next_hop(dst)
+        # text too long for binary frames goes out as a brace frame, which
+        # has no limit of its own
+        binary = (self.supports_v2(recipient) and
+                  len(text) + arq.DATA.size <= self.max_payload(recipient))
+        if self.reliable and sender == self.name:
+            if binary:
+                return self.send_reliable(recipient, text)
+            if self.supports_v2(recipient):
+                self.msg("Message too long to confirm, sent without.")
+        if binary:
+            packet = protocol.Packet(protocol.TEXT, self.address_of(sender),
+                                     dst, str(text), msgId = msgId, ttl = ttl,
+                                     hop = hop)
+            self.compress(packet, recipient)
+            written = self.write_packet(packet, recipient)
+        else:
+            message = "{ID=" + str(msgId) + "}{TTL=" + str(ttl) + "}"
+            # without a name for the next hop the message is flooded
+            if hop in self.directory:
+                message += "{VIA=" + self.directory.name(hop) + "}"
+            message += ("{FROM=" + sender + "}{TO=" +
+                        self.brace_recipient(recipient) + "}{TEXT=" + text +
+                        "}")
+            written = self.write(message, hop)
+        if not written:
+            if sender == self.name:
+                self.msg("Too much waiting to be sent, message dropped.")
+            return False
+        if sender == self.name:
+            self.events.sent(recipient, text)
+        return True
+
+    # Sends a message which is sent again until its recipient acknowledges
+    # it. The outcome is reported through events.delivered().
+    def send_reliable(self, recipient, text):
+        self.deliveryId += 1
+        key = self.deliveryId
+        dst = self.address_of(recipient)
+        self.events.sent(recipient, text, key)
+        self.arq.send(dst, str(text), key)
+        return True
+
+    # Queues one transmission of a reliable message, with an id of its own
+    # so that relays pass it on again. Returns the seconds until it will
+    # have left the port.
+    def write_reliable(self, dst, payload):
+        recipient = self.directory.label(dst)
+        packet = protocol.Packet(protocol.TEXT, self.address, dst, payload,
+                                 protocol.RELIABLE, self.new_id(),
+                                 hop = self.routes.next_hop(dst))
+        self.compress(packet, recipient)
+        self.write_packet(packet, recipient)
+        return self.backlog()
+
+    # Seconds until everything in the outbox, and in the port's own buffer
+    # where the driver says, has gone out on the line.
+    def backlog(self):
+        waiting = self.outbox.size
+        port = self.serial
+        if port != None and hasattr(port, "outWaiting"):
+            try:
+                waiting += port.outWaiting()
+            except (serial.SerialException, IOError, OSError, ValueError):
+                pass
+        return waiting * self.byte_time()
+
+    # Seconds one byte takes on the line with the current settings.
+    def byte_time(self):
+        bits = 1 + self.byteSize + self.stopBits
+        if self.parity != serial.PARITY_NONE:
+            bits += 1
+        return bits / float(self.baud)
+
+    # Takes the payload of a reliable message and acknowledges it. Returns
+    # its text, or None if it arrived before.
+    def receive_reliable(self, src, payload):
+        text, ack = self.arq.receive(src, payload)
+        if ack != None:
+            packet = protocol.Packet(protocol.ACK, self.address,
+                                     src, ack, msgId = self.new_id(),
+                                     hop = self.routes.next_hop(src))
+            self.write(protocol.encode(packet), packet.hop,
+                       send_queue.CONTROL)
+        return text
+
+    # Handles an acknowledgement of reliable messages.
+    def acknowledged(self, packet):
+        finished = self.arq.acknowledge(packet.src, packet.payload)
+        self.report_deliveries([(packet.src, key, state)
+                                for key, state in finished])
+
+    # Sends again the reliable messages whose timeout passed.
+    def retransmit(self):
+        self.report_deliveries(self.arq.due())
+
+    def report_deliveries(self, finished):
+        for dst, key, state in finished:
+            recipient = self.directory.label(dst)
+            self.events.delivered(recipient, key, state == arq.DELIVERED)
+
+    # Sends an image file to a node as a preview followed by tiles.
+    def send_image(self, recipient, path):
+        if not self.supports_v2(recipient):
+            self.msg(recipient + " does not support image transfer.")
+            return
+
+        self.msg("Sending image: " + path)
+        encoded = self.imageCache.encode(path, IMAGE_SIZE, IMAGE_FORMAT,
+                                         IMAGE_QUALITY)
+        self.imageId = (self.imageId + 1) & 0xFFFF
+        src = self.address
+        dst = self.address_of(recipient)
+        hop = self.routes.next_hop(dst)
+        for payload in imaging.image_payloads(encoded, self.imageId):
+            packet = protocol.Packet(protocol.IMAGE, src, dst, payload,
+                                     msgId = self.new_id(), hop = hop)
+            self.compress(packet, recipient)
+            if not self.write_packet(packet, recipient, send_queue.BULK):
+                self.msg("Too much waiting to be sent, image cut short.")
+                break
+        self.events.sent(recipient, "[Image: " + os.path.basename(path) + "]")
+
+    # Sends an echo request, padded with size extra bytes. The reply is
+    # reported through events.echo_replied().
+    def send_echo(self, recipient, sequence, ttl = relay.DEFAULT_TTL,
+                  size = 0):
+        dst = self.address_of(recipient)
+        payload = protocol.ECHO.pack(sequence, ttl, time.time()) + b"\0" * size
+        hop = self.routes.next_hop(dst)
+        packet = protocol.Packet(protocol.ECHO_REQUEST, self.address, dst,
+                                 payload,
+                                 msgId = self.new_id(), ttl = ttl, hop = hop)
+        return self.write_packet(packet, recipient)
+
+    # Answers an echo request with its own payload.
+    def send_echo_reply(self, request, expired = False):
+        hop = self.routes.next_hop(request.src)
+        packet = protocol.Packet(protocol.ECHO_REPLY, self.address,
+                                 request.src, request.payload,
+                                 flags = protocol.EXPIRED if expired else 0,
+                                 msgId = self.new_id(), hop = hop)
+        self.write_packet(packet, self.directory.label(request.src))
+
+    # Sets the longest payload sent in one frame. Writes are limited to
+    # about one such frame as well, so a ping never waits behind more.
+    def set_mtu(self, mtu):
+        self.mtu = max(fragments.MIN_MTU, min(protocol.MAX_PAYLOAD, int(mtu)))
+        self.outbox.batchSize = min(send_queue.BATCH_SIZE,
+                                    self.mtu + protocol.OVERHEAD)
+        self.fec.frameSize = self.mtu + protocol.OVERHEAD
+
+    # Queues a packet, split into fragments no longer than the MTU if the
+    # recipient can put them back together. Returns False if the outbox
+    # had no room or the payload is too long.
+    def write_packet(self, packet, recipient, priority = send_queue.TEXT):
+        mtu = protocol.MAX_PAYLOAD
+        if recipient in self.fragmentNodes:
+            mtu = self.mtu
+        try:
+            frames = fragments.split(packet, mtu, self.new_id)
+        except ValueError as e:
+            self.msg(str(e) + ", not sent.")
+            return False
+        for frame in frames:
+            if not self.write(frame, packet.hop, priority):
+                return False
+        return True
+
+    # Returns the longest payload a node can take: one frame's worth, or as
+    # many fragments as it puts back together.
+    def max_payload(self, recipient):
+        if recipient in self.fragmentNodes:
+            return fragments.max_payload(self.mtu)
+        return protocol.MAX_PAYLOAD
+
+    # Compresses the payload of a packet for a node able to expand it, if
+    # that makes the payload smaller. Relays pass the payload on as it is.
+    def compress(self, packet, recipient):
+        if self.zipNodes.get(recipient) != compression.DICTIONARY_ID:
+            return
+        start = time.time()
+        compressed = self.codec.try_compress(packet.payload, packet.kind)
+        self.metrics.count_compression("compressTime", time.time() - start)
+        self.metrics.count_compression("payloads")
+        self.metrics.count_compression("bytesBefore", len(packet.payload))
+        if compressed != None:
+            packet.payload = compressed
+            packet.flags |= protocol.COMPRESSED
+            self.metrics.count_compression("compressed")
+        self.metrics.count_compression("bytesAfter", len(packet.payload))
+
+    # Forwards a binary packet for another node one hop further, along its
+    # route if one is known and to every neighbour otherwise.
+    def relay_packet(self, packet):
+        packet.ttl -= 1
+        packet.hop = self.routes.next_hop(packet.dst)
+        if packet.hop == None:
+            packet.hop = protocol.BROADCAST
+        self.write(protocol.encode(packet), packet.hop, PRIORITY[packet.kind])
+
+    # Queues raw bytes for the port and returns whether there was room.
+    # hop is the address of the neighbour meant to take the data, which
+    # only matters to nodes with more than one port.
+    def write(self, data, hop = None, priority = send_queue.TEXT):
+        data = self.protect(data, self.fec)
+        label = metrics.port_label(self.serial)
+        if not self.outbox.put(data, priority):
+            self.metrics.count(label, "dropped")
+            return False
+        self.metrics.count(label, "framesOut")
+        self.count_sent(data, hop)
+        return True
+
+    # Wraps a binary frame with FEC if the link sends with it.
+    def protect(self, data, coding):
+        if coding.mode == fec.OFF or data[:1] != frame_parser.SYNC:
+            return data
+        parity = coding.parity(self.neighbours.names())
+        if parity > 0:
+            data = fec.encode(data, parity)
+        return data
+
+    # Counts a frame going out towards a neighbour.
+    def count_sent(self, data, hop):
+        if hop in self.directory:
+            name = self.directory.label(hop)
+            self.metrics.count_neighbour(name, "framesOut")
+            self.metrics.count_neighbour(name, "bytesOut", len(data))
+
+    # Writes to the port straight away, counting towards the link load.
+    def write_now(self, data):
+        port = self.serial
+        if port == None:
+            return
+        self.bytesOut += len(data)
+        label = metrics.port_label(port)
+        self.metrics.count(label, "bytesOut", len(data))
+        if self.capture != None:
+            self.capture.write(capture.OUT, data)
+        try:
+            port.write(data)
+        except (serial.SerialException, OSError) as e:
+            self.metrics.count(label, "errors")
+            self.msg("Could not write to the port, " + str(e))
+
+    # Records the current outbox depth.
+    def sample_stats(self):
+        label = metrics.port_label(self.serial)
+        self.metrics.gauge(label, "queueDepth", len(self.outbox))
+        self.metrics.gauge(label, "queueBytes", self.outbox.size)
+        self.metrics.gauge(label, "reassembling", len(self.fragments))
+        self.metrics.gauge(label, "incomplete", self.fragments.dropped)
+        self.metrics.gauge(label, "unacknowledged", self.arq.pending())
+
+    # Writes a statistics snapshot if a file is set.
+    def write_stats(self):
+        self.sample_stats()
+        if self.statsFile != None:
+            try:
+                self.metrics.write_json(self.statsFile)
+            except (IOError, OSError) as e:
+                self.msg("Could not write statistics, " + str(e))
+
+    # Switches profiling of the receive loop on or off. Returns the profile
+    # collected when switching it off.
+    def toggle_profile(self, path = None):
+        if self.metrics.profiler == None:
+            self.metrics.start_profile()
+            self.msg("Profiling the receive loop.")
+            return ""
+        return self.metrics.stop_profile(path)
+
+    def is_open(self):
+        return self.serial != None
+
+    # Takes a new message id and remembers it so that copies of the message
+    # relayed back to this node are ignored.
+    def new_id(self):
+        msgId = self.ids.next_id()
+        self.seen.add((self.address, msgId))
+        return msgId
+
+    # Checks whether a message can use the binary protocol. Every node in
+    # range has to understand it, since any of them may relay the message.
+    # Nodes further away qualify once their own address reached the
+    # directory, as only nodes speaking it announce one.
+    def supports_v2(self, recipient):
+        return ((recipient in self.v2Nodes or
+                 self.directory.assigned(self.address_of(recipient))) and
+                not self.brace_framing())
+
+    # Whether a neighbour only understands brace frames, which name nodes
+    # by name alone.
+    def brace_framing(self):
+        return not self.neighbours.names() <= self.v2Nodes
+
+    # Passes a status message on to the user.
+    def msg(self, text):
+        self.events.status(str(text))
+
+    def list_ports(self):
+        return ports.discover()
+
+    # Generates a random name for this node.
+    def random_name(self):
+        names = ["Donut", "Penguin", "Stumpy", "Whicker", "Howard",
+                 "Wilshire", "Disco", "Jack", "Bear", "Sneak", "Wisp",
+                 "Crazy", "Goat", "Pirate", "Hambone", "Walla", "Snake",
+                 "Caboose", "Sleepy", "Stompy", "Mopey", "Dopey", "Weasel",
+                 "Ghost", "Dasher", "Grumpy", "Hollywood", "Noodle", "Cupid",
+                 "Abraham", "Prancer", "Blinky", "Bonobo", "Banana", "Cinnabon"]
+
+        rand = random.randint(0, len(names) - 1)
+        return names[rand]
@@ -0,0 +1,189 @@
+"""
+Network Testing Application
+
+This application allows for the sending and retrieval of data across a network
+which uses serial ports on multiple machines. It adopts its own protocol and
+allows for text to be sent from one machine to another.
+
+Author: Nick Klose (nick.klose@ualberta.ca)
+http://ualberta.ca/~klose
+
+Serial port discovery. On Windows every port number is probed by opening
+it, with the probes run side by side and given up on after PROBE_TIMEOUT.
+Elsewhere the device directory is listed instead. The ports found are saved
+so the next launch can show them straight away, and a PortWatcher thread
+reports adapters as they are plugged in and pulled out: it only lists the
+device directory again when the directory itself changes. Windows has no
+device directory, so there the ports the system lists are polled instead;
+with a pyserial too old to list them, ports are only found at startup.
+"""
+import os
+import time
+import json
+import fnmatch
+import platform
+import threading
+from multiprocessing.pool import ThreadPool
+import serial
+try:
+    from serial.tools import list_ports
+except ImportError:
+    list_ports = None
+
+WINDOWS = platform.system() == "Windows"
+DEVICE_DIR = "/dev"
+PATTERNS = ("ttyS*", "ttyUSB*", "ttyACM*") # device names of serial ports
+PORT_COUNT = 256 # port numbers probed on Windows
+PROBE_TIMEOUT = 0.5 # seconds before a port which will not open is skipped
+PROBE_THREADS = 32
+WATCH_INTERVAL = 1.0 # seconds between checks of the device directory
+POLL_INTERVAL = 2.0 # seconds between listings of the ports on Windows
+CACHE_FILE = os.path.join(os.path.expanduser("~"), ".network_test_ports")
+
+# Name shown for a Windows port number.
+def port_name(number):
+    return "USB" + str("%03d" % (number,))
+
+# The value serial.Serial() takes for a port name.
+def device(name):
+    if name.startswith("USB") and name[3:].isdigit():
+        return int(name[3:])
+    return name
+
+# Checks whether a port can be opened.
+def probe(name):
+    try:
+        serial.Serial(device(name)).close()
+        return True
+    except (serial.SerialException, OSError, ValueError):
+        return False
+
+# Probes every name at once and returns those which opened in time.
+def probe_all(names, timeout = PROBE_TIMEOUT):
+    threads = min(PROBE_THREADS, max(1, len(names)))
+    pool = ThreadPool(threads)
+    try:
+        results = [(name, pool.apply_async(probe, (name,))) for name in names]
+        # every thread gets through its share of the probes in time unless
+        # they time out
+        rounds = (len(names) + threads - 1) // threads
+        deadline = time.time() + rounds * timeout
+        found = []
+        for name, result in results:
+            try:
+                if result.get(max(0.0, deadline - time.time())):
+                    found.append(name)
+            except Exception:
+                pass
+        return found
+    finally:
+        # a probe stuck inside the driver is left to finish on its own
+        pool.terminate()
+
+# Lists the serial devices in the device directory.
+def list_devices(directory = DEVICE_DIR):
+    try:
+        entries = os.listdir(directory)
+    except OSError:
+        return []
+    names = [entry for entry in entries
+             if any(fnmatch.fnmatch(entry, pattern) for pattern in PATTERNS)]
+    return sorted(os.path.join(directory, name) for name in names)
+
+# Lists the ports Windows knows of, named as port_name() names them, or
+# None if this pyserial cannot list them.
+def list_comports():
+    if list_ports == None:
+        return None
+    names = []
+    for port in list_ports.comports():
+        name = port[0]
+        # port number n opens COMn+1
+        if name.upper().startswith("COM") and name[3:].isdigit():
+            name = port_name(int(name[3:]) - 1)
+        names.append(name)
+    return sorted(names)
+
+# Finds the serial ports on this machine.
+def discover():
+    if WINDOWS:
+        return probe_all([port_name(i) for i in range(PORT_COUNT)])
+    return list_devices()
+
+def load_cache(path = CACHE_FILE):
+    try:
+        with open(path) as f:
+            return [str(name) for name in json.load(f)]
+    except (IOError, OSError, ValueError, TypeError):
+        return []
+
+def save_cache(names, path = CACHE_FILE):
+    try:
+        with open(path, "w") as f:
+            json.dump(sorted(names), f)
+    except (IOError, OSError):
+        pass
+
+class PortWatcher(threading.Thread):
+    """
+    Reports the cached ports at once, then corrects the list with a real
+    discovery and keeps it up to date. Callbacks run on this thread.
+    """
+    def __init__(self, added, removed, directory = DEVICE_DIR,
+                 cache = CACHE_FILE):
+        super(PortWatcher, self).__init__()
+        self.daemon = True
+        self.added = added # called with the name of each new port
+        self.removed = removed # called with the name of each vanished port
+        self.directory = directory
+        self.cache = cache
+        self.ports = set() # ports reported so far
+        self.stopped = threading.Event()
+
+    def run(self):
+        self.update(load_cache(self.cache))
+        if WINDOWS:
+            self.update(discover())
+            self.poll()
+            return
+
+        changed = -1 # modification time of the directory when last listed
+        while not self.stopped.is_set():
+            try:
+                mtime = os.stat(self.directory).st_mtime
+            except OSError:
+                mtime = None
+            # adding or removing a device node changes the directory itself
+            if mtime != changed:
+                changed = mtime
+                self.update(list_devices(self.directory))
+            self.stopped.wait(WATCH_INTERVAL)
+
+    # Reports the ports Windows adds and removes. Ports only the probe found
+    # are kept until Windows lists and then drops them.
+    def poll(self):
+        listed = set() # ports Windows listed last time
+        while not self.stopped.is_set():
+            names = list_comports()
+            if names == None:
+                return
+            names = set(names)
+            if names != listed:
+                self.update((self.ports | names) - (listed - names))
+                listed = names
+            self.stopped.wait(POLL_INTERVAL)
+
+    # Reports the difference between the known ports and names.
+    def update(self, names):
+        names = set(names)
+        if names == self.ports:
+            return
+        for name in sorted(self.ports - names):
+            self.removed(name)
+        for name in sorted(names - self.ports):
+            self.added(name)
+        self.ports = names
+        save_cache(names, self.cache)
+
+    def stop(self):
+        self.stopped.set()
@@ -0,0 +1,150 @@
+"""
+Network Testing Application
+
+This application allows for the sending and retrieval of data across a network
+which uses serial ports on multiple machines. It adopts its own protocol and
+allows for text to be sent from one machine to another.
+
+Author: Nick Klose (nick.klose@ualberta.ca)
+http://ualberta.ca/~klose
+
+Measures round trip times across the mesh with echo requests:
+
+    python probe.py --port /dev/ttyUSB0 --target Penguin --count 20
+
+Bursts of requests are sent with a TTL of 1, 2, ... so that each node along
+the route answers in turn, until the target itself answers. For every hop
+the node which answered is printed with the min, median and 99th percentile
+round trip time and the fraction of requests which got no answer; the last
+line is the end to end result.
+"""
+import sys
+import time
+import argparse
+import threading
+import node
+import relay
+
+class ProbeEvents(node.NodeEvents):
+    """
+    Collects echo replies by probe number.
+    """
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.replies = {} # probe number -> (sender, rtt, expired)
+
+    def echo_replied(self, sender, sequence, ttl, rtt, expired):
+        with self.condition:
+            if sequence not in self.replies:
+                self.replies[sequence] = (sender, rtt, expired)
+                self.condition.notify_all()
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def summary(rtts, sent):
+    return {"sent": sent, "received": len(rtts),
+            "loss": 1.0 - float(len(rtts)) / sent if sent else 0.0,
+            "min": min(rtts) if rtts else 0.0,
+            "median": percentile(rtts, 0.5), "p99": percentile(rtts, 0.99)}
+
+# Sends count requests with the given TTL and returns the replies to them.
+def burst(core, events, target, ttl, first, count, interval, size, timeout):
+    sequences = [(first + i) & 0xFFFF for i in range(count)]
+    for sequence in sequences:
+        core.send_echo(target, sequence, ttl, size)
+        time.sleep(interval)
+
+    deadline = time.time() + timeout
+    with events.condition:
+        while True:
+            replies = [events.replies[s] for s in sequences
+                       if s in events.replies]
+            remaining = deadline - time.time()
+            if len(replies) == count or remaining <= 0:
+                return replies
+            events.condition.wait(remaining)
+
+# Probes each hop towards target in turn. Returns (ttl, node, summary)
+# for every hop, the last being the target if it answered.
+def run(core, events, target, count, interval, size, timeout, maxHops,
+        perHop = True):
+    results = []
+    first = 0
+    for ttl in (range(1, maxHops + 1) if perHop else [maxHops]):
+        replies = burst(core, events, target, ttl, first, count, interval,
+                        size, timeout)
+        first += count
+
+        # nodes never heard directly are only known by their address
+        unnamed = "#%04X" % core.address_of(target)
+        replies = [(target if sender == unnamed else sender, rtt, expired)
+                   for sender, rtt, expired in replies]
+        senders = [sender for sender, rtt, expired in replies]
+        # floods may be answered by several nodes at the same distance
+        responder = max(set(senders), key = senders.count) if senders else None
+        rtts = [rtt for sender, rtt, expired in replies if sender == responder]
+        results.append((ttl, responder, summary(rtts, count)))
+        if any(not expired for sender, rtt, expired in replies):
+            break
+    return results
+
+def report(results, out = sys.stdout):
+    out.write("%-4s %-12s %8s %8s %8s %6s\n" %
+              ("hop", "node", "min ms", "med ms", "p99 ms", "loss"))
+    for ttl, responder, stats in results:
+        out.write("%-4d %-12s %8.1f %8.1f %8.1f %5.0f%%\n" %
+                  (ttl, responder or "*", stats["min"] * 1000,
+                   stats["median"] * 1000, stats["p99"] * 1000,
+                   stats["loss"] * 100))
+
+def main(argv):
+    parser = argparse.ArgumentParser(description = "Echo probe")
+    parser.add_argument("--port", required = True)
+    parser.add_argument("--baud", type = int, default = node.BAUD_RATE)
+    parser.add_argument("--name", help = "name of the probing node")
+    parser.add_argument("--target", required = True, help = "node to probe")
+    parser.add_argument("--count", type = int, default = 20,
+                        help = "requests per hop")
+    parser.add_argument("--interval", type = float, default = 0.2,
+                        help = "seconds between requests")
+    parser.add_argument("--size", type = int, default = 0,
+                        help = "padding bytes added to each request")
+    parser.add_argument("--timeout", type = float, default = 5.0,
+                        help = "seconds to wait for late replies")
+    parser.add_argument("--max-hops", type = int, default = relay.DEFAULT_TTL)
+    parser.add_argument("--end-to-end", action = "store_true",
+                        help = "skip the per hop measurements")
+    parser.add_argument("--wait", type = float, default = 12.0,
+                        help = "seconds to listen for the mesh first")
+    args = parser.parse_args(argv[1:])
+
+    events = ProbeEvents()
+    core = node.Node(events)
+    core.port = int(args.port) if args.port.isdigit() else args.port
+    core.baud = args.baud
+    core.change_name(args.name or core.random_name())
+    core.open()
+    try:
+        # routes are learnt from the pings and advertisements of the mesh,
+        # and the target's address from the names they pass on
+        route = lambda: core.routes.next_hop(core.address_of(args.target))
+        deadline = time.time() + args.wait
+        while route() == None and time.time() < deadline:
+            time.sleep(0.5)
+        if route() == None:
+            sys.stderr.write("No route to %s, flooding the requests\n"
+                             % args.target)
+        report(run(core, events, args.target, args.count, args.interval,
+                   args.size, args.timeout, args.max_hops,
+                   not args.end_to_end))
+    except KeyboardInterrupt:
+        pass
+    core.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,173 @@
+"""
+Network Testing Application
+
+This application allows for the sending and retrieval of data across a network
+which uses serial ports on multiple machines. It adopts its own protocol and
+allows for text to be sent from one machine to another.
+
+Author: Nick Klose (nick.klose@ualberta.ca)
+http://ualberta.ca/~klose
+
+Version 2 of the protocol is a compact binary framing used between nodes
+which advertise it with a {PROTO=2} frame after their {NAME=...} ping.
+Every frame is laid out as
+
+    SYNC | TYPE | SRC (2) | DST (2) | HOP (2) | ID (2) | TTL | LENGTH (2) |
+    CHECK | PAYLOAD | CRC16 (2)
+
+with multi-byte fields in network byte order. SRC is the node the frame
+came from originally and ID the number it gave the frame. HOP names the
+neighbour which should relay the frame next, or is BROADCAST when any node
+may relay it. Relays forward a frame unchanged apart from HOP and TTL. The
+CRC is CRC-16/CCITT computed over everything between SYNC and the CRC
+itself. CHECK is the high byte of the CRC of the header before it, so a
+stray SYNC byte or a garbled LENGTH is rejected before the receiver waits
+for, or skips, the bytes LENGTH claims.
+
+Every node answers an ECHO_REQUEST addressed to it with an ECHO_REPLY
+carrying the same payload. A node which would have to relay a request
+with no hops left answers it too, with the EXPIRED flag set, so probes
+with increasing TTLs find each hop along a route in turn.
+"""
+import struct
+from relay import DEFAULT_TTL
+
+VERSION = 2
+SYNC = 0x02 # start of a binary frame, never used by the brace protocol
+HEADER = struct.Struct("!BBHHHHBHB")
+CRC = struct.Struct("!H")
+HEADER_SIZE = HEADER.size
+OVERHEAD = HEADER_SIZE + CRC.size
+MAX_PAYLOAD = 1024
+
+# Packet types, kept in the low nibble of the type byte
+TEXT = 0x01
+IMAGE = 0x02
+ROUTES = 0x03
+ECHO_REQUEST = 0x04
+ECHO_REPLY = 0x05
+ACK = 0x06 # acknowledges reliable messages, see arq.py
+
+# Flags, kept in the high nibble of the type byte
+TYPE_MASK = 0x0F
+FLAG_MASK = 0xF0
+EXPIRED = 0x10 # an echo reply from a node the request ran out of hops at
+COMPRESSED = 0x20 # the payload is compressed, see compression.py
+FRAGMENT = 0x40 # the payload is part of a longer one, see fragments.py
+RELIABLE = 0x80 # the text waits for an ACK and is resent, see arq.py
+
+# Probe number, TTL the request was sent with and its send time
+ECHO = struct.Struct("!HBd")
+
+# Destination used for frames meant for every node in range
+BROADCAST = 0xFFFF
+
+# Results of decode() besides a packet
+INCOMPLETE = "incomplete"
+CORRUPT = "corrupt"
+
+def _make_table():
+    table = []
+    for byte in range(256):
+        crc = byte << 8
+        for bit in range(8):
+            if crc & 0x8000:
+                crc = ((crc << 1) ^ 0x1021) & 0xFFFF
+            else:
+                crc = (crc << 1) & 0xFFFF
+        table.append(crc)
+    return table
+
+CRC_TABLE = _make_table()
+
+# Computes the CRC-16/CCITT of a byte string or bytearray.
+def crc16(data, crc = 0xFFFF):
+    table = CRC_TABLE
+    for byte in bytearray(data):
+        crc = ((crc << 8) & 0xFFFF) ^ table[(crc >> 8) ^ byte]
+    return crc
+
+# Derives the short on-air address used for a node name.
+def address(name):
+    if not isinstance(name, bytes):
+        name = str(name).encode("utf-8")
+    addr = crc16(name)
+    if addr == BROADCAST:
+        addr = 0
+    return addr
+
+class Packet(object):
+    def __init__(self, kind, src, dst, payload = b"", flags = 0, msgId = 0,
+                 ttl = DEFAULT_TTL, hop = None):
+        self.kind = kind # packet type, one of the constants above
+        self.src = src # short address of the node which sent it first
+        self.dst = dst # short address of the destination node
+        self.payload = payload # raw payload bytes
+        self.flags = flags # option bits sent with the type
+        self.msgId = msgId # number given to the packet by its sender
+        self.ttl = ttl # hops the packet may still be relayed
+        self.hop = BROADCAST if hop == None else hop # node to relay it next
+
+    def __repr__(self):
+        return "Packet(%d, %04X -> %04X, %d bytes)" % (self.kind, self.src,
+                                                        self.dst,
+                                                        len(self.payload))
+
+# Serialises a packet into a complete binary frame.
+def encode(packet):
+    payload = bytes(packet.payload)
+    if len(payload) > MAX_PAYLOAD:
+        raise ValueError("Payload too large: " + str(len(payload)))
+    kind = (packet.kind & TYPE_MASK) | (packet.flags & FLAG_MASK)
+    frame = bytearray(HEADER.pack(SYNC, kind, packet.src, packet.dst,
+                                  packet.hop, packet.msgId, packet.ttl,
+                                  len(payload), 0))
+    frame[HEADER_SIZE - 1] = header_check(frame, 0)
+    frame += payload
+    frame += CRC.pack(crc16(memoryview(frame)[1:]))
+    return bytes(frame)
+
+# Returns the check byte of the header starting at buf[pos].
+def header_check(buf, pos):
+    return crc16(memoryview(buf)[pos + 1:pos + HEADER_SIZE - 1]) >> 8
+
+# Decodes the frame starting at buf[pos], which must hold the SYNC byte.
+# Returns (packet, end) on success, (INCOMPLETE, pos) if more bytes are
+# needed and (CORRUPT, pos + 1) if the frame is damaged. Only the SYNC byte
+# is skipped then, as the length of a damaged frame cannot be trusted and
+# good frames may follow inside the bytes it claims.
+def decode(buf, pos = 0):
+    available = len(buf) - pos
+    if available < HEADER_SIZE:
+        return INCOMPLETE, pos
+    (sync, kind, src, dst, hop, msgId, ttl, length,
+     check) = HEADER.unpack_from(buf, pos)
+    if length > MAX_PAYLOAD or check != header_check(buf, pos):
+        return CORRUPT, pos + 1
+    end = pos + HEADER_SIZE + length + CRC.size
+    if len(buf) < end:
+        return INCOMPLETE, pos
+    crc, = CRC.unpack_from(buf, end - CRC.size)
+    if crc16(memoryview(buf)[pos + 1:end - CRC.size]) != crc:
+        return CORRUPT, pos + 1
+    payload = bytes(buf[pos + HEADER_SIZE:end - CRC.size])
+    packet = Packet(kind & TYPE_MASK, src, dst, payload, kind & FLAG_MASK,
+                    msgId, ttl, hop)
+    return packet, end
+
+# Bytes on the wire for a legacy text message, used to compare framings.
+def legacy_size(sender, recipient, text, msgId = 65535, ttl = DEFAULT_TTL):
+    return (len("{ID=}{TTL=}{FROM=}{TO=}{TEXT=}") + len(str(msgId)) +
+            len(str(ttl)) + len(sender) + len(recipient) + len(text))
+
+if __name__ == "__main__":
+    # compare goodput of both framings on a 9600 baud 8E2 link
+    bytesPerSec = 9600 / 12.0
+    for text in ("hi", "Meet at the lab at noon.", "x" * 200):
+        legacy = legacy_size("Donut", "Penguin", text)
+        binary = OVERHEAD + len(text)
+        print("%3d byte text: legacy %3d bytes (%5.1f%%), v2 %3d bytes "
+              "(%5.1f%%), %5.1f vs %5.1f msgs/s"
+              % (len(text), legacy, 100.0 * len(text) / legacy, binary,
+                 100.0 * len(text) / binary, bytesPerSec / legacy,
+                 bytesPerSec / binary))
@@ -0,0 +1,73 @@
+"""
+Network Testing Application
+
+This application allows for the sending and retrieval of data across a network
+which uses serial ports on multiple machines. It adopts its own protocol and
+allows for text to be sent from one machine to another.
+
+Author: Nick Klose (nick.klose@ualberta.ca)
+http://ualberta.ca/~klose
+
+Store-and-forward relaying. Every message carries the name of the node it
+came from, an id chosen by that node and a hop limit. A node forwards a
+message at most once: the (origin, id) pair is remembered in a bounded
+cache whose entries expire after a while, and the hop limit drops by one on
+every relay so nothing circulates forever.
+"""
+import time
+import random
+import collections
+
+DEFAULT_TTL = 8 # hops a new message may take
+SEEN_TIME = 60.0 # seconds a message id is remembered
+SEEN_SIZE = 4096 # most message ids remembered at once
+
+class SeenCache(object):
+    """
+    Remembers recently seen message keys. Entries are kept in insertion
+    order, which is also expiry order, so adding and checking a key and
+    dropping expired keys are all constant time.
+    """
+    def __init__(self, lifetime = SEEN_TIME, capacity = SEEN_SIZE,
+                 clock = time.time):
+        self.lifetime = lifetime
+        self.capacity = capacity
+        self.clock = clock
+        self.entries = collections.OrderedDict() # key -> expiry time
+
+    # Records a key. Returns False if it was already seen and still fresh.
+    def add(self, key):
+        now = self.clock()
+        self.expire(now)
+        if key in self.entries:
+            return False
+        self.entries[key] = now + self.lifetime
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last = False)
+        return True
+
+    def expire(self, now):
+        entries = self.entries
+        while entries:
+            key = next(iter(entries))
+            if entries[key] > now:
+                break
+            del entries[key]
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+class MessageIds(object):
+    """
+    Hands out 16-bit message ids, starting at a random point so that a
+    restarted node does not reuse the ids its neighbours still remember.
+    """
+    def __init__(self):
+        self.last = random.randint(0, 0xFFFF)
+
+    def next_id(self):
+        self.last = (self.last + 1) & 0xFFFF
+        return self.last
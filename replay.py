@@ -0,0 +1,167 @@
+"""
+Network Testing Application
+
+This application allows for the sending and retrieval of data across a network
+which uses serial ports on multiple machines. It adopts its own protocol and
+allows for text to be sent from one machine to another.
+
+Author: Nick Klose (nick.klose@ualberta.ca)
+http://ualberta.ca/~klose
+
+Feeds a capture taken with --capture back through the receive path of a
+node with the same name and address, without any hardware attached:
+
+    python replay.py Donut-_dev_ttyUSB0-20131018-120000.cap
+    python replay.py --speed 1 --profile replay.prof capture.cap
+
+Without --speed the reads follow each other as fast as possible; --speed 1
+keeps their original timing and --speed 10 runs ten times as fast. Each
+read is handed to the parser exactly as the port returned it. Either way
+the node runs on the times in the capture, so caches, timeouts and its
+periodic work behave as they did in the session. Frames the node relays
+are written to a virtual port rather than a real one.
+
+The report gives the throughput, the time taken per frame, what was
+delivered and relayed, and a digest of the messages delivered and relayed,
+which stays the same as long as the parser and relay logic behave the
+same. --expect DIGEST makes a differing digest an error, for regression
+tests.
+"""
+import sys
+import time
+import zlib
+import argparse
+import capture
+import metrics
+import protocol
+from node import Node, NodeEvents
+from serial_listen import SerialListen
+from virtual_serial import VirtualSerial
+
+class ReplayEvents(NodeEvents):
+    """
+    Counts what a replayed node delivers and keeps a digest of it.
+    """
+    def __init__(self):
+        self.counts = {"received": 0, "relayed": 0, "images": 0, "echoes": 0}
+        self.digest = 0
+
+    def add(self, kind, *fields):
+        self.counts[kind] += 1
+        for field in (kind,) + fields:
+            if not isinstance(field, bytes):
+                field = field.encode("utf-8")
+            self.digest = zlib.crc32(field + b"\0", self.digest)
+
+    def received(self, sender, text):
+        self.add("received", sender, text)
+
+    def relayed(self, sender, recipient, text):
+        self.add("relayed", sender, recipient, text)
+
+    def image_updated(self, sender, imageId, image, complete):
+        self.add("images", sender, str(imageId), str(complete))
+
+    def echo_replied(self, sender, sequence, ttl, rtt, expired):
+        self.add("echoes", sender, str(sequence), str(expired))
+
+# Replays the reads of a capture. speed scales the original timing, or is
+# None to replay as fast as possible. Returns the node, the events and the
+# seconds spent handling the reads.
+def replay(info, records, speed = None, profile = False):
+    reads = [(when, data) for when, direction, data in records
+             if direction == capture.IN]
+    # the node runs on the capture's clock, so caches and timeouts expire
+    # as they did in the session however fast it is replayed
+    now = [reads[0][0] if reads else 0.0]
+    events = ReplayEvents()
+    core = Node(events, clock = lambda: now[0])
+    core.change_name(info.get("name") or "Replay")
+    if info.get("uid") != None:
+        core.set_uid(info["uid"], info.get("address"))
+    else:
+        # captured before nodes had ids, when addresses were name hashes
+        core.set_uid(core.uid, protocol.address(core.name))
+    # every read must come out of the virtual port whole
+    port = VirtualSerial(chunkSize = sys.maxsize)
+    core.serial = port
+    listener = SerialListen(core)
+    if profile:
+        core.metrics.start_profile()
+    profiler = core.metrics.profiler
+    core.schedule_tasks()
+
+    busy = 0.0
+    start = time.time()
+    for when, data in reads:
+        if speed != None:
+            delay = start + (when - reads[0][0]) / speed - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        # periodic work falls due between reads as it did in the session
+        now[0] = when
+        core.scheduler.run_pending(when)
+        port.inject(data)
+        began = time.time()
+        if profiler != None:
+            profiler.runcall(listener.poll)
+        else:
+            listener.poll()
+        # relayed frames go out through the outbox
+        core.flush()
+        busy += time.time() - began
+    return core, events, busy
+
+def report(info, records, core, events, busy, out = sys.stdout):
+    reads = [data for when, direction, data in records
+             if direction == capture.IN]
+    length = sum(len(data) for data in reads)
+    span = records[-1][0] - records[0][0] if records else 0.0
+    stats = core.metrics.snapshot()["ports"].get(
+        metrics.port_label(core.serial), {})
+    frameTime = stats.get("frameTime", {})
+    frames = stats.get("framesIn", 0)
+    out.write("capture   %s on %s at %s baud: %d reads, %d bytes over "
+              "%.1f s\n" % (info.get("name"), info.get("port"),
+                            info.get("baud"), len(reads), length, span))
+    out.write("replay    %.1f ms busy: %.0f bytes/s, %.0f frames/s\n"
+              % (busy * 1000, length / busy if busy else 0.0,
+                 frames / busy if busy else 0.0))
+    out.write("frames    %d, p50 %.0f us, p99 %.0f us, max %.0f us; "
+              "%d parse errors, %d bytes discarded\n"
+              % (frames, frameTime.get("p50", 0) * 1e6,
+                 frameTime.get("p99", 0) * 1e6, frameTime.get("max", 0) * 1e6,
+                 stats.get("parseErrors", 0), stats.get("discardedBytes", 0)))
+    out.write("delivered %d received, %d relayed, %d image updates, "
+              "%d echo replies; %d bytes written\n"
+              % (events.counts["received"], events.counts["relayed"],
+                 events.counts["images"], events.counts["echoes"],
+                 len(core.serial.written)))
+    out.write("digest    %08X\n" % (events.digest & 0xFFFFFFFF))
+
+def main(argv):
+    parser = argparse.ArgumentParser(description = "Replay a capture")
+    parser.add_argument("capture", help = "file written with --capture")
+    parser.add_argument("--speed", type = float,
+                        help = "replay at this multiple of the original "
+                               "timing instead of as fast as possible")
+    parser.add_argument("--profile", metavar = "FILE",
+                        help = "profile the receive path, saving to FILE")
+    parser.add_argument("--expect", metavar = "DIGEST",
+                        help = "fail unless the digest comes out the same")
+    args = parser.parse_args(argv[1:])
+
+    info, records = capture.read_capture(args.capture)
+    core, events, busy = replay(info, records, args.speed,
+                                args.profile != None)
+    report(info, records, core, events, busy)
+    if args.profile != None:
+        sys.stdout.write(core.metrics.stop_profile(args.profile))
+    if args.expect != None:
+        if int(args.expect, 16) != events.digest & 0xFFFFFFFF:
+            sys.stdout.write("DIGEST DIFFERS, expected %s\n" % args.expect)
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,133 @@
+"""
+Network Testing Application
+
+This application allows for the sending and retrieval of data across a network
+which uses serial ports on multiple machines. It adopts its own protocol and
+allows for text to be sent from one machine to another.
+
+Author: Nick Klose (nick.klose@ualberta.ca)
+http://ualberta.ca/~klose
+
+Distance-vector routing. Along with every ping a node broadcasts a ROUTES
+packet listing each destination it can reach, the cost in hops and the
+neighbour it goes through. Receivers keep, per destination, the neighbour
+offering the cheapest route. Entries a neighbour reaches through the
+receiver itself are ignored (split horizon), and routes through a neighbour
+that has gone quiet are advertised as unreachable for a short while before
+being forgotten, so the rest of the mesh drops them quickly too.
+"""
+import time
+import struct
+
+INFINITY = 16 # cost meaning "unreachable"
+ROUTE_TIMEOUT = 16.0 # seconds a route lives without being refreshed, unless
+                     # the neighbour pings so rarely that it needs longer
+HOLD_TIME = 10.0 # seconds an unreachable route is still advertised
+
+# Destination address, cost and next hop of one advertised route
+ENTRY = struct.Struct("!HBH")
+
+class Route(object):
+    __slots__ = ("nextHop", "cost", "expires")
+
+    def __init__(self, nextHop, cost, expires):
+        self.nextHop = nextHop # neighbour to hand messages to
+        self.cost = cost # hops to the destination
+        self.expires = expires # time after which the route is stale
+
+class RoutingTable(object):
+    def __init__(self, me = None, timeout = ROUTE_TIMEOUT, clock = time.time):
+        self.me = me # address of this node
+        self.timeout = timeout
+        self.clock = clock
+        self.routes = {} # destination address -> Route
+
+    # A neighbour was heard directly, so it is one hop away.
+    def heard(self, neighbour, timeout = None):
+        if neighbour == self.me:
+            return
+        timeout = max(self.timeout, timeout or 0)
+        self.routes[neighbour] = Route(neighbour, 1, self.clock() + timeout)
+
+    # Merges the (destination, cost, next hop) entries a neighbour advertised.
+    def update(self, neighbour, entries, timeout = None):
+        self.heard(neighbour, timeout)
+        expires = self.clock() + max(self.timeout, timeout or 0)
+        routes = self.routes
+        for dest, cost, theirHop in entries:
+            if dest == self.me or dest == neighbour or theirHop == self.me:
+                continue
+            cost = min(cost + 1, INFINITY)
+            route = routes.get(dest)
+            if route == None:
+                if cost < INFINITY:
+                    routes[dest] = Route(neighbour, cost, expires)
+            elif route.nextHop == neighbour:
+                # the current next hop always has the latest word
+                if cost < INFINITY:
+                    route.cost = cost
+                    route.expires = expires
+                elif route.cost < INFINITY:
+                    route.cost = INFINITY
+                    route.expires = self.clock() + HOLD_TIME
+            elif cost < route.cost:
+                route.nextHop = neighbour
+                route.cost = cost
+                route.expires = expires
+
+    # Returns the neighbour to send to for a destination, or None.
+    def next_hop(self, dest):
+        route = self.routes.get(dest)
+        if route == None or route.cost >= INFINITY:
+            return None
+        if route.expires <= self.clock():
+            self.expire()
+            return None
+        return route.nextHop
+
+    def cost(self, dest):
+        route = self.routes.get(dest)
+        return INFINITY if route == None else route.cost
+
+    # Marks stale routes unreachable and forgets them after the hold time.
+    def expire(self):
+        now = self.clock()
+        lost = set()
+        for dest, route in list(self.routes.items()):
+            if route.expires > now:
+                continue
+            if route.cost < INFINITY:
+                route.cost = INFINITY
+                route.expires = now + HOLD_TIME
+                if route.nextHop == dest:
+                    lost.add(dest)
+            else:
+                del self.routes[dest]
+
+        # everything reached through a lost neighbour is lost as well
+        if lost:
+            for route in self.routes.values():
+                if route.nextHop in lost and route.cost < INFINITY:
+                    route.cost = INFINITY
+                    route.expires = now + HOLD_TIME
+
+    # Lists the entries to advertise to neighbours.
+    def advertisement(self):
+        return [(dest, route.cost, route.nextHop)
+                for dest, route in self.routes.items()]
+
+    def __len__(self):
+        return len(self.routes)
+
+# Packs advertised entries into ROUTES payloads no larger than size bytes.
+def pack_routes(entries, size):
+    perPacket = max(1, size // ENTRY.size)
+    payloads = []
+    for i in range(0, len(entries), perPacket):
+        payloads.append(b"".join(ENTRY.pack(*entry)
+                                 for entry in entries[i:i + perPacket]))
+    return payloads
+
+def unpack_routes(payload):
+    count = len(payload) // ENTRY.size
+    return [ENTRY.unpack_from(payload, i * ENTRY.size) for i in range(count)]
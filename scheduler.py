@@ -0,0 +1,109 @@
+"""
+Network Testing Application
+
+This application allows for the sending and retrieval of data across a network
+which uses serial ports on multiple machines. It adopts its own protocol and
+allows for text to be sent from one machine to another.
+
+Author: Nick Klose (nick.klose@ualberta.ca)
+http://ualberta.ca/~klose
+
+A single thread runs all periodic work of a node (pings, expiry, retransmits,
+statistics) from a heap of deadlines, instead of a new timer thread per job.
+run_pending() can also be called directly with a virtual time, which is how
+the simulator drives many nodes without any threads at all.
+"""
+import time
+import heapq
+import itertools
+import threading
+
+class Task(object):
+    def __init__(self, func, interval, when):
+        self.func = func # called when the task is due
+        self.interval = interval # seconds between runs, None to run once
+        self.when = when # next time the task is due
+        self.cancelled = False
+
+    # Stops the task from running again.
+    def cancel(self):
+        self.cancelled = True
+
+class Scheduler(object):
+    def __init__(self, clock = time.time, onError = None):
+        self.clock = clock
+        self.onError = onError # called with any exception a task raises
+        self.heap = [] # (due time, sequence number, task)
+        self.counter = itertools.count() # keeps equal due times in order
+        self.condition = threading.Condition()
+        self.thread = None
+        self.running = False
+
+    # Runs func once after delay seconds.
+    def call_later(self, delay, func):
+        return self.add(Task(func, None, self.clock() + delay))
+
+    # Runs func every interval seconds, first after delay (default interval).
+    # If func returns a number it becomes the interval from then on.
+    def call_every(self, interval, func, delay = None):
+        if delay == None:
+            delay = interval
+        return self.add(Task(func, interval, self.clock() + delay))
+
+    def add(self, task):
+        with self.condition:
+            heapq.heappush(self.heap, (task.when, next(self.counter), task))
+            self.condition.notify()
+        return task
+
+    # Runs every task due at or before now. Returns the next due time.
+    def run_pending(self, now = None):
+        if now == None:
+            now = self.clock()
+        while True:
+            with self.condition:
+                if not self.heap or self.heap[0][0] > now:
+                    return self.heap[0][0] if self.heap else None
+                when, count, task = heapq.heappop(self.heap)
+            if task.cancelled:
+                continue
+            try:
+                interval = task.func()
+                if interval != None and task.interval != None:
+                    task.interval = interval
+            except Exception as e:
+                if self.onError != None:
+                    self.onError(e)
+            if task.interval != None and not task.cancelled:
+                task.when = max(when + task.interval, now)
+                self.add(task)
+
+    def start(self):
+        with self.condition:
+            self.running = True
+            # a thread told to stop but not yet gone simply carries on
+            if self.thread != None and self.thread.is_alive():
+                return
+        self.thread = threading.Thread(target = self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            self.run_pending()
+            with self.condition:
+                if not self.running:
+                    return
+                if not self.heap:
+                    self.condition.wait()
+                    continue
+                # adding a task notifies the condition, so a sooner task
+                # cuts the wait short
+                wait = self.heap[0][0] - self.clock()
+                if wait > 0:
+                    self.condition.wait(wait)
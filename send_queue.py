@@ -0,0 +1,121 @@
+"""
+Network Testing Application
+
+This application allows for the sending and retrieval of data across a network
+which uses serial ports on multiple machines. It adopts its own protocol and
+allows for text to be sent from one machine to another.
+
+Author: Nick Klose (nick.klose@ualberta.ca)
+http://ualberta.ca/~klose
+
+Outgoing frames wait in a bounded queue with three priorities: control
+frames (pings and routes) go first, then text, then bulk data such as image
+tiles. A single writer thread takes whatever is waiting, highest priority
+first, and hands it to the port in one write. Senders never block on the
+port; when the queue is full their frames are refused instead.
+"""
+import time
+import threading
+import collections
+
+# Priorities, most urgent first
+CONTROL = 0
+TEXT = 1
+BULK = 2
+PRIORITIES = (CONTROL, TEXT, BULK)
+
+CAPACITY = 64 * 1024 # bytes of text and bulk frames held at most
+BATCH_SIZE = 256 # bytes gathered into one write, so a ping never waits long
+
+class SendQueue(object):
+    def __init__(self, capacity = CAPACITY, batchSize = BATCH_SIZE):
+        self.capacity = capacity
+        self.batchSize = batchSize
+        self.queues = [collections.deque() for p in PRIORITIES]
+        self.size = 0 # bytes waiting
+        self.dropped = 0 # frames refused because the queue was full
+        self.closed = False
+        self.condition = threading.Condition()
+
+    # Queues a frame. Control frames are always taken; others wait up to
+    # timeout seconds for room and are refused if there is none. Returns
+    # whether the frame was queued.
+    def put(self, data, priority = TEXT, timeout = 0):
+        with self.condition:
+            if self.closed:
+                return False
+            if priority != CONTROL and self.size + len(data) > self.capacity:
+                deadline = time.time() + timeout
+                while self.size + len(data) > self.capacity:
+                    remaining = deadline - time.time()
+                    if remaining <= 0 or self.closed:
+                        self.dropped += 1
+                        return False
+                    self.condition.wait(remaining)
+            self.queues[priority].append(data)
+            self.size += len(data)
+            self.condition.notify_all()
+            return True
+
+    # Takes the most urgent frames waiting, up to about batchSize bytes, as
+    # one string. Waits up to timeout seconds (forever if None) for a frame
+    # and returns None if there is none or the queue was closed.
+    def get_batch(self, timeout = None):
+        with self.condition:
+            if timeout == None:
+                while self.size == 0 and not self.closed:
+                    self.condition.wait()
+            elif self.size == 0 and not self.closed and timeout > 0:
+                self.condition.wait(timeout)
+            if self.size == 0:
+                return None
+
+            batch = []
+            taken = 0
+            for queue in self.queues:
+                while queue and (not batch or
+                                 taken + len(queue[0]) <= self.batchSize):
+                    data = queue.popleft()
+                    batch.append(data)
+                    taken += len(data)
+                if queue:
+                    break # keep strict priority order across batches
+            self.size -= taken
+            self.condition.notify_all()
+            return b"".join(batch)
+
+    # Drops everything waiting, stops the writer and refuses further frames
+    # until reopened.
+    def close(self):
+        with self.condition:
+            self.closed = True
+            for queue in self.queues:
+                queue.clear()
+            self.size = 0
+            self.condition.notify_all()
+
+    def reopen(self):
+        with self.condition:
+            self.closed = False
+
+    def __len__(self):
+        with self.condition:
+            return sum(len(queue) for queue in self.queues)
+
+class Writer(threading.Thread):
+    """
+    Moves batches from a send queue to a write function until the queue
+    is closed.
+    """
+    def __init__(self, queue, write):
+        super(Writer, self).__init__()
+        self.daemon = True
+        self.queue = queue
+        self.write = write
+
+    def run(self):
+        while True:
+            batch = self.queue.get_batch()
+            if batch == None:
+                return
+            self.write(batch)
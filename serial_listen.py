@@ -12,84 +12,340 @@ import serial
 import threading
 import os, sys
 import time
+import protocol
+import imaging
+import relay
+import routing
+import metrics
+import capture
+import fragments
+import fec
+import arq
+import addressing
+from frame_parser import FrameParser, PACKET
 
 class SerialListen(threading.Thread):
-    def __init__(self, parent):
+    def __init__(self, parent, port = None):
         super(SerialListen, self).__init__()
         self._stop = threading.Event()
         
-        self.serial = parent.serial # take control of parent's serial connection
-        self.ui = parent.ui # enable parent UI updating
-        self.input = "" # the string being read from the serial
-        self.name = parent.name # save parent name to check if messages are for us
+        # take control of parent's serial connection unless given another
+        self.serial = port or parent.serial
+        self.port = metrics.port_label(self.serial) # name in the statistics
+        # raw capture of what is read, kept by the parent for its own port
+        self.capture = parent.capture if port == None else None
+        # forward error correction settings, kept by the parent for its own
+        # port so they outlast the thread
+        self.coding = parent.fec
+        if port != None:
+            self.coding = fec.LinkCoding(parent.fec.mode,
+                                         parent.fec.frameSize)
+        self.bytesIn = 0 # bytes read from the port
+        self.metrics = parent.metrics # counters for the port and neighbours
+        self.events = parent.events # report what arrives to the user
+        self.parser = FrameParser() # incremental parser for incoming bytes
         self.sender = "" # save sender name from serial
         self.recipient = "" # save recipient name from serial
         self.pinger = "" # name of node having sent most recent ping
+        self.claim = None # address and id announced for the next name
         self.text = "" # save text message from sender
+        self.msgId = None # id of the message being read, if it has one
+        self.ttl = relay.DEFAULT_TTL # hops left for the message being read
+        self.via = None # node asked to relay the message being read
         self.parent = parent
-        self.queue = parent.queue
-        self.oldNodes = parent.oldNodes
-        self.nodes = parent.nodes
-        self.pastNodes = [] # nodes which were detected during the last ping
+        self.v2Nodes = parent.v2Nodes # nodes which understand binary frames
+        self.zipNodes = parent.zipNodes # dictionaries nodes compress with
+        self.directory = parent.directory # names of nodes by their address
+        self.images = imaging.ImageAssembler() # images being received
+        self.neighbours = parent.neighbours # nodes heard directly
+        
+    # The parent's current name, to check if messages are for us.
+    @property
+    def name(self):
+        return self.parent.name
         
     def run(self):
-        while self.serial != None:
+        while self.serial != None and not self._stop.is_set():
+            profiler = self.metrics.profiler
             try:
-                c = self.serial.read()
-                self.input += c
-                
-                # reset buffer if a new command is sent
-                if self.input[-1:] == "{":
-                    self.input = "{"
-                    
-                # end buffer if command close character is sent
-                if self.input[-1:] == "}":
-                    if self.input[:6] == "{NAME=":
-                        pinger = self.input[6:-1]
-                        self.pinger = pinger
-                        if pinger not in self.nodes:
-                            self.nodes.append(pinger)
-                        self.update_nodes_in_range()
-                    elif self.input[:6] == "{FROM=":
-                        self.sender = self.input[6:-1]
-                    elif self.input[:4] == "{TO=":
-                        self.recipient = self.input[4:-1]
-                    elif self.input[:6] == "{TEXT=":
-                        self.text = self.input[6:-1]
-                        # the recipient is this node
-                        if self.recipient == self.name:
-                            message = "<From: " + self.sender + "> " + self.text
-                            self.ui.listReceivedData.addItem(message)
-                        # the recipient is another node, so relay the message
-                        else:
-                            #self.parent.send(self.sender, self.recipient, self.text)
-                            message = "<From: " + self.sender + "> <To: "
-                            message += self.recipient + "> " + self.text
-                            self.ui.listRelayedData.addItem(message)
+                if profiler != None:
+                    profiler.runcall(self.poll)
                 else:
-                    try:
-                        Image.show(Image.fromstring(self.input))
-                    except:
-                        pass
-                        
-                # send any queued messages
-                for message in self.queue:
-                    self.serial.write(message)
-                    del message
-            except:
-                pass
-        
-    def update_nodes_in_range(self):
-        self.ui.listNodes.clear()
-        allNodes = list(set(self.nodes + self.oldNodes))
-        for node in allNodes:
-            self.ui.listNodes.addItem(node)
-        self.oldNodes = self.nodes
-        self.nodes = []
-        
-        # change name if necessary
-        if self.name in self.nodes + self.oldNodes:
-            self.parent.change_name(self.random_name())
+                    self.poll()
+            except (serial.SerialException, OSError) as e:
+                # the port is most likely gone, so do not spin on it
+                self.metrics.count(self.port, "errors")
+                self.parent.msg("Could not read from the port, " + str(e))
+                self._stop.wait(1.0)
+            except Exception as e:
+                self.metrics.count(self.port, "errors")
+                self.parent.msg("Error handling incoming data, " + repr(e))
+    
+    # Reads whatever is waiting on the port and handles the frames in it.
+    # Returns the number of bytes read.
+    def poll(self):
+        # drain everything waiting on the port in a single read
+        data = self.serial.read(self.serial.inWaiting() or 1)
+        self.parent.bytesIn += len(data)
+        self.bytesIn += len(data)
+        if self.capture != None and data:
+            self.capture.write(capture.IN, data)
+        parser = self.parser
+        corrupt, dropped = parser.corrupt, parser.dropped
+        coded = parser.coded
+        blocks, corrected, failed = coded.blocks, coded.corrected, coded.failed
+        frames = parser.feed(data)
+
+        stats = self.metrics
+        stats.count(self.port, "bytesIn", len(data))
+        stats.count(self.port, "framesIn", len(frames))
+        if parser.corrupt != corrupt:
+            stats.count(self.port, "parseErrors", parser.corrupt - corrupt)
+        if parser.dropped != dropped:
+            stats.count(self.port, "discardedBytes", parser.dropped - dropped)
+        if coded.blocks != blocks:
+            stats.count(self.port, "fecBlocks", coded.blocks - blocks)
+            stats.count(self.port, "fecCorrected", coded.corrected - corrected)
+            stats.count(self.port, "fecFailed", coded.failed - failed)
+        for key, value in frames:
+            start = time.time()
+            self.handle_frame(key, value)
+            stats.frame_time(self.port, time.time() - start)
+        return len(data)
+    
+    # Estimates the share of bytes corrupted on the way here, from the
+    # frames failing their CRC and the bytes FEC put right, and lets the
+    # link pick the parity to ask for.
+    def tune_coding(self):
+        parser = self.parser
+        self.coding.tune(self.bytesIn, parser.corrupt + parser.coded.errors,
+                         parser.packets, parser.packetBytes)
+        self.metrics.gauge(self.port, "errorRate", self.coding.errorRate)
+        self.metrics.gauge(self.port, "fecParity",
+                           self.coding.parity(self.neighbours.names()))
+
+    # Acts on a single {KEY=value} frame from the parser.
+    def handle_frame(self, key, value):
+        if key == "ADDR":
+            # a ping starts with the pinger's address and id
+            self.claim = addressing.parse_claim(value)
+        elif key == "NAME":
+            self.heard_name(value)
+        elif key == "INTERVAL":
+            # the most recent pinger says how long until its next ping
+            if value.isdigit():
+                self.neighbours.set_interval(self.pinger, float(value))
+        elif key == "PROTO":
+            # the most recent pinger advertises the protocols it supports
+            if value.isdigit() and int(value) >= protocol.VERSION:
+                self.v2Nodes.add(self.pinger)
+        elif key == "ZIP":
+            # and the dictionary it compresses payloads with
+            if value.isdigit():
+                self.zipNodes[self.pinger] = int(value)
+        elif key == "FRAG":
+            # and whether it puts fragmented payloads back together
+            self.parent.fragmentNodes.add(self.pinger)
+        elif key == "FEC":
+            # and the parity it would like frames sent to it with
+            if value.isdigit():
+                self.coding.advertised(self.pinger, int(value))
+        elif key == "DIR":
+            # and ends with a few of the names it knows
+            for addr, uid, name in addressing.parse_entries(value):
+                self.parent.learn(addr, name, uid, heard = False)
+        elif key == "BAUD":
+            negotiator = self.parent.negotiator
+            self.parent.scheduler.call_later(0, lambda: negotiator.handle(value))
+        elif key == "ID":
+            self.msgId = int(value) if value.isdigit() else None
+        elif key == "TTL":
+            self.ttl = int(value) if value.isdigit() else 0
+        elif key == "VIA":
+            self.via = value
+        elif key == "FROM":
+            self.sender = value
+        elif key == "TO":
+            self.recipient = value
+        elif key == "TEXT":
+            self.text = value
+            self.handle_message(self.sender, self.recipient, self.text,
+                                self.msgId, self.ttl, self.via)
+            self.msgId = None
+            self.ttl = relay.DEFAULT_TTL
+            self.via = None
+        elif key == PACKET:
+            self.handle_packet(value)
     
+    # Takes the name in a ping, with the address announced before it.
+    # Returns the address.
+    def heard_name(self, name):
+        claim, self.claim = self.claim, None
+        if claim != None:
+            addr, uid = claim
+            # older nodes in range tell nodes apart by name, so the node of
+            # the two with the larger id takes another one
+            if name == self.name and uid < self.parent.uid and \
+                    self.parent.brace_framing():
+                self.parent.change_name(self.parent.random_name())
+        else:
+            # an older node, known by the hash of its name, which cannot
+            # tell apart two nodes of the same name
+            addr, uid = protocol.address(name), None
+            if name == self.name:
+                self.parent.change_name(self.parent.random_name())
+        self.parent.learn(addr, name, uid)
+        label = self.directory.label(addr)
+        self.pinger = label
+        self.coding.heard(label)
+        self.metrics.count_neighbour(label, "framesIn")
+        self.parent.routes.heard(addr, self.neighbours.timeout(label))
+        if self.neighbours.pinged(label):
+            self.events.node_added(label)
+        return addr
+
+    # Acts on a binary frame which passed its CRC check.
+    def handle_packet(self, packet):
+        me = self.parent.address
+        # older nodes know this one by the hash of its name
+        alias = protocol.address(self.name)
+        forMe = packet.dst == me or packet.dst == alias
+        # routed frames are only relayed by the neighbour they name
+        if not forMe and packet.hop not in (protocol.BROADCAST, me, alias):
+            return
+        if not self.parent.seen.add((packet.src, packet.msgId)):
+            self.metrics.count(self.port, "duplicates")
+            return
+        source = self.lookup(packet.src)
+        self.neighbours.heard(source)
+        self.metrics.count_neighbour(source, "framesIn")
+        self.metrics.count_neighbour(source, "bytesIn",
+                                     len(packet.payload) + protocol.OVERHEAD)
+        if packet.kind == protocol.ROUTES:
+            entries = routing.unpack_routes(packet.payload)
+            timeout = self.neighbours.timeout(self.lookup(packet.src))
+            self.parent.routes.update(packet.src, entries, timeout)
+            return
+        if packet.kind == protocol.ACK and forMe:
+            self.parent.acknowledged(packet)
+            return
+        # fragments are put back together where the whole payload is needed
+        whole = packet
+        if packet.flags & protocol.FRAGMENT:
+            whole = None
+            if forMe or packet.kind == protocol.TEXT or (
+                    packet.kind == protocol.ECHO_REQUEST and packet.ttl <= 1):
+                whole = self.parent.fragments.add(packet)
+        if not forMe:
+            if packet.kind == protocol.ECHO_REQUEST and packet.ttl <= 1:
+                # tell the prober this is as far as the request got
+                if whole != None:
+                    self.parent.send_echo_reply(whole, expired = True)
+            elif packet.ttl > 1:
+                self.parent.relay_packet(packet)
+                self.metrics.count(self.port, "relayed")
+                self.metrics.count_neighbour(source, "relayed")
+                if packet.kind == protocol.TEXT and whole != None:
+                    text = self.message_text(whole)
+                    if text != None:
+                        self.events.relayed(self.lookup(packet.src),
+                                            self.lookup(packet.dst), text)
+            return
+        if whole == None:
+            return
+        packet = whole
+            
+        if packet.kind == protocol.TEXT:
+            text = self.expand(packet)
+            if text != None and packet.flags & protocol.RELIABLE:
+                # copies of a message resent before its ACK got back are
+                # acknowledged again but shown only once
+                text = self.parent.receive_reliable(packet.src, text)
+            if text != None:
+                self.events.received(self.lookup(packet.src), text)
+        elif packet.kind == protocol.ECHO_REQUEST:
+            self.parent.send_echo_reply(packet)
+        elif packet.kind == protocol.ECHO_REPLY:
+            if len(packet.payload) >= protocol.ECHO.size:
+                sequence, ttl, sent = protocol.ECHO.unpack_from(packet.payload)
+                expired = bool(packet.flags & protocol.EXPIRED)
+                self.events.echo_replied(self.lookup(packet.src), sequence,
+                                         ttl, time.time() - sent, expired)
+        elif packet.kind == protocol.IMAGE:
+            payload = self.expand(packet)
+            update = None
+            if payload != None:
+                update = self.images.feed(packet.src, payload)
+            if update != None:
+                key, image, complete = update
+                self.events.image_updated(self.lookup(packet.src), key[1],
+                                          image.copy(), complete)
+    
+    # Returns the payload of a packet, expanded if it came compressed, or
+    # None if it could not be expanded.
+    def expand(self, packet):
+        if not packet.flags & protocol.COMPRESSED:
+            return packet.payload
+        start = time.time()
+        try:
+            payload = self.parent.codec.expand(packet.payload,
+                                               fragments.MAX_MESSAGE)
+        except ValueError as e:
+            self.metrics.count_compression("expandErrors")
+            self.parent.msg(str(e))
+            return None
+        self.metrics.count_compression("expanded")
+        self.metrics.count_compression("expandTime", time.time() - start)
+        return payload
+
+    # Returns the text of a TEXT packet, leaving out the header of a reliable
+    # one, or None if it could not be expanded.
+    def message_text(self, packet):
+        text = self.expand(packet)
+        if text != None and packet.flags & protocol.RELIABLE:
+            text = text[arq.DATA.size:]
+        return text
+
+    # Returns the name of the node using a short address.
+    def lookup(self, addr):
+        if addr == self.parent.address:
+            return self.name
+        return self.directory.label(addr)
+    
+    # Shows or relays a complete brace protocol message.
+    def handle_message(self, sender, recipient, text, msgId, ttl, via = None):
+        # nodes without relaying send no id, so go by the contents instead
+        source = self.parent.address_of(sender)
+        if msgId == None:
+            key = (source, recipient, text)
+        else:
+            key = (source, msgId)
+        if not self.parent.seen.add(key):
+            self.metrics.count(self.port, "duplicates")
+            return
+            
+        # the recipient is this node
+        if self.is_me(recipient):
+            self.events.received(sender, text)
+        # the recipient is another node, so relay the message unless it is
+        # routed through a different neighbour
+        elif ttl > 1 and (via == None or via == self.name):
+            if msgId == None:
+                msgId = self.parent.ids.next_id()
+                self.parent.seen.add((source, msgId))
+            self.parent.send(sender, recipient, text, msgId, ttl - 1)
+            self.metrics.count(self.port, "relayed")
+            self.metrics.count_neighbour(sender, "relayed")
+            self.events.relayed(sender, recipient, text)
+        
+    # Whether a brace frame is meant for this node, named either by its name
+    # alone, as NAME#ADDR or by its address alone as #ADDR.
+    def is_me(self, recipient):
+        name, mark, number = recipient.rpartition("#")
+        if mark and len(number) == 4:
+            return (name in ("", self.name) and
+                    number.upper() == "%04X" % self.parent.address)
+        return recipient == self.name
+
     def stop(self):
         self._stop.set()
\ No newline at end of file
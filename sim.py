@@ -0,0 +1,663 @@
+"""
+Network Testing Application
+
+This application allows for the sending and retrieval of data across a network
+which uses serial ports on multiple machines. It adopts its own protocol and
+allows for text to be sent from one machine to another.
+
+Author: Nick Klose (nick.klose@ualberta.ca)
+http://ualberta.ca/~klose
+
+Simulates a mesh of many nodes on one machine. Every node runs the real
+node core and receive loop (pings, neighbours, routing, relaying) on a
+virtual port, so meshes far larger than the adapters on a desk can be
+tried:
+
+    python sim.py --nodes 200 --topology grid
+    python sim.py --nodes 50,100,200,400 --topology random --degree 6
+
+Time is virtual and advances in steps of --step seconds. The nodes are
+shared out between --processes worker processes, which run their nodes
+step by step and pass the bytes crossing to other workers through this
+one. Workers only meet once per link latency, since nothing sent can
+arrive sooner.
+
+A node sends no faster than its baud rate allows. Whatever it sends
+reaches each node it is linked to --latency seconds later; each write to
+the port is lost on its way to a neighbour with probability --loss, and
+bytes are corrupted at the rate --errors. Links are full duplex and
+nodes sending at once do not collide. --edges FILE gives the links as
+"NAME NAME [LATENCY [LOSS]]" lines instead of a generated topology.
+
+Nodes are switched on at random within the first ping interval. After
+--warmup seconds each sends --rate messages a minute to random nodes it
+can reach, stopping --drain seconds before the end so the last messages
+have time to arrive. For each mesh size the report gives:
+
+    moves     addresses given up because another node had them too
+    converge  seconds until every node heard all its neighbours, and
+              until every node knew the address of every node it can
+              reach and had a route to it
+    deliver   share of messages delivered, and the median and 99th
+              percentile time they took
+    relay     relays and discarded duplicate copies per message sent
+    load      mean and highest share of a node's line in use
+    cpu       milliseconds of processor time per simulated second spent
+              on a node: mean, 99th percentile and highest
+
+--json FILE saves all of it, with the figures of every node.
+"""
+import sys
+import json
+import math
+import time
+import heapq
+import random
+import argparse
+import itertools
+import traceback
+import collections
+import multiprocessing
+import routing
+import addressing
+from node import Node, NodeEvents, PING_INTERVAL, BAUD_RATE
+from serial_listen import SerialListen
+from virtual_serial import VirtualSerial
+
+TOPOLOGIES = ("line", "ring", "grid", "random", "full")
+STEP = 0.05 # seconds of virtual time per step
+LATENCY = 0.05 # seconds for bytes to cross a link
+DURATION = 300.0 # seconds simulated
+WARMUP = 60.0 # seconds before the first message
+DRAIN = 30.0 # seconds at the end without new messages
+RATE = 1.0 # messages each node sends a minute
+MESSAGE_SIZE = 40 # characters in each message
+DEGREE = 6.0 # mean neighbours of a node in a random topology
+SAMPLE_INTERVAL = 1.0 # seconds between checks for convergence
+
+# Seconds of processor time used by this process
+cpu_time = getattr(time, "process_time", None) or time.clock
+
+# Returns the value at fraction of the way through sorted values.
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+# Corrupts bytes of data at rate, with gaps drawn so that only the bytes
+# hit cost a random number.
+def damage(data, rate, rng):
+    if rate <= 0:
+        return data
+    data = bytearray(data)
+    i = int(rng.expovariate(rate))
+    while i < len(data):
+        data[i] ^= rng.randint(1, 255)
+        i += 1 + int(rng.expovariate(rate))
+    return bytes(data)
+
+class Topology(object):
+    """
+    The simulated nodes and the links between them, each with its latency
+    and loss.
+    """
+    def __init__(self, names):
+        self.names = names
+        self.links = dict((name, {}) for name in names) # name -> neighbour
+                                                         # -> (latency, loss)
+
+    def connect(self, a, b, latency, loss):
+        if a != b:
+            self.links[a][b] = (latency, loss)
+            self.links[b][a] = (latency, loss)
+
+    def edges(self):
+        return sum(len(links) for links in self.links.values()) // 2
+
+    def min_latency(self):
+        return min([latency for links in self.links.values()
+                    for latency, loss in links.values()] or [LATENCY])
+
+    # Returns the names of the nodes each node can reach, itself included.
+    def components(self):
+        component = {}
+        for name in self.names:
+            if name in component:
+                continue
+            members = set([name])
+            todo = [name]
+            while todo:
+                for neighbour in self.links[todo.pop()]:
+                    if neighbour not in members:
+                        members.add(neighbour)
+                        todo.append(neighbour)
+            members = frozenset(members)
+            for member in members:
+                component[member] = members
+        return component
+
+
+# Builds one of TOPOLOGIES with count nodes.
+def build_topology(kind, count, args, rng):
+    width = len(str(count - 1))
+    names = ["N%0*d" % (width, i) for i in range(count)]
+    topology = Topology(names)
+    link = lambda a, b: topology.connect(names[a], names[b], args.latency,
+                                         args.loss)
+    if kind in ("line", "ring"):
+        for i in range(count - 1):
+            link(i, i + 1)
+        if kind == "ring" and count > 2:
+            link(count - 1, 0)
+    elif kind == "grid":
+        side = int(math.ceil(math.sqrt(count)))
+        for i in range(count):
+            if (i + 1) % side and i + 1 < count:
+                link(i, i + 1)
+            if i + side < count:
+                link(i, i + side)
+    elif kind == "random":
+        # nodes scattered over a square, in range of those close enough to
+        # have degree neighbours on average
+        spots = [(rng.random(), rng.random()) for i in range(count)]
+        reach = math.sqrt(args.degree / (math.pi * max(1, count - 1)))
+        for i in range(count):
+            for j in range(i + 1, count):
+                if math.hypot(spots[i][0] - spots[j][0],
+                              spots[i][1] - spots[j][1]) <= reach:
+                    link(i, j)
+    elif kind == "full":
+        for i in range(count):
+            for j in range(i + 1, count):
+                link(i, j)
+    return topology
+
+# Reads links as "NAME NAME [LATENCY [LOSS]]" lines.
+def read_topology(path, args):
+    links = []
+    with open(path) as f:
+        for line in f:
+            fields = line.split("#")[0].split()
+            if len(fields) < 2:
+                continue
+            latency = float(fields[2]) if len(fields) > 2 else args.latency
+            loss = float(fields[3]) if len(fields) > 3 else args.loss
+            links.append((fields[0], fields[1], latency, loss))
+    names = sorted(set([link[0] for link in links] +
+                       [link[1] for link in links]))
+    topology = Topology(names)
+    for a, b, latency, loss in links:
+        topology.connect(a, b, latency, loss)
+    return topology
+
+class SimEvents(NodeEvents):
+    """
+    Notes when the simulated messages for a node arrive.
+    """
+    def __init__(self, clock):
+        self.clock = clock
+        self.deliveries = [] # (message number, time)
+
+    def received(self, sender, text):
+        fields = text.split(" ", 2)
+        if len(fields) > 1 and fields[0] == "SIM" and fields[1].isdigit():
+            self.deliveries.append((int(fields[1]), self.clock()))
+
+class SimNode(object):
+    """
+    A node core on a virtual port, and the line it sends on. Each write
+    takes as long as the baud rate needs and then reaches the neighbours
+    whole, as radio modems pass it on, so writes from several neighbours
+    never mix within a frame.
+    """
+    def __init__(self, name, links, start, uid, baud, clock):
+        self.name = name
+        self.links = links # neighbour -> (latency, loss)
+        self.start = start # time the node is switched on
+        self.events = SimEvents(clock)
+        self.core = Node(self.events, clock)
+        self.core.change_name(name)
+        self.core.set_uid(uid)
+        self.core.baud = baud
+        self.port = self.core.serial = VirtualSerial()
+        self.listener = self.core.thread = SerialListen(self.core)
+        self.rate = 1.0 / self.core.byte_time() # bytes per second
+        self.started = False
+        self.due = start # next time the scheduler has work
+        self.arrivals = [] # heap of (time, order, bytes)
+        self.sending = None # write going out on the line
+        self.lost = None # neighbours it will not reach
+        self.left = 0.0 # bytes of it still to go out
+        self.credit = 0.0 # bytes the line may send
+        self.cpu = 0.0 # seconds of processor time spent on the node
+        self.converged = [None, None] # when the neighbours and routes were
+                                      # first complete
+
+    # Whether the node has anything to do at now.
+    def busy(self, now):
+        return (now >= self.due or self.sending != None or
+                self.core.outbox.size or
+                (self.arrivals and self.arrivals[0][0] <= now))
+
+    # Runs the node up to now. Returns the (bytes, neighbours losing them)
+    # writes which finished going out during the last dt seconds.
+    def step(self, now, dt, rng):
+        core = self.core
+        if not self.started:
+            self.arrivals = [] # nothing is heard while switched off
+            if now < self.start:
+                return []
+            self.started = True
+            core.schedule_tasks()
+        while self.arrivals and self.arrivals[0][0] <= now:
+            self.port.inject(heapq.heappop(self.arrivals)[2])
+        while self.port.incoming:
+            try:
+                self.listener.poll()
+            except Exception as e:
+                core.metrics.count(self.listener.port, "errors")
+                core.msg("Error handling incoming data, " + repr(e))
+        self.due = core.scheduler.run_pending(now)
+        if self.due == None:
+            self.due = float("inf")
+
+        self.credit += self.rate * dt
+        written = []
+        while True:
+            if self.sending == None:
+                batch = core.outbox.get_batch(0)
+                if batch == None:
+                    self.credit = 0.0 # an idle line saves nothing up
+                    break
+                core.write_now(batch)
+                self.sending = bytes(self.port.written)
+                del self.port.written[:]
+                self.lost = set(neighbour for neighbour, (latency, loss)
+                                in self.links.items()
+                                if loss and rng.random() < loss)
+                self.left = len(self.sending)
+            if self.left > self.credit:
+                self.left -= self.credit
+                self.credit = 0.0
+                break
+            self.credit -= self.left
+            written.append((self.sending, self.lost))
+            self.sending = None
+        return written
+
+    # Checks whether the node knows all its neighbours, and the address of
+    # every node in reach and a route to it, noting when each first came
+    # true.
+    def check(self, now, neighbours, reachable):
+        core = self.core
+        known = core.neighbours.names()
+        complete = (all(name in known for name in neighbours),
+                    all(core.routes.cost(core.address_of(name)) <
+                        routing.INFINITY for name in reachable))
+        for i in range(2):
+            if complete[i] and self.converged[i] == None:
+                self.converged[i] = now
+        return complete
+
+    # The figures of the node at the end of the run.
+    def summary(self, now, neighbours, reachable):
+        core = self.core
+        label = self.listener.port
+        count = lambda key: core.metrics.counter(label, key)
+        hasNeighbours, hasRoutes = self.check(now, neighbours, reachable)
+        return {"name": self.name, "cpu": self.cpu,
+                "load": core.bytesOut / (self.rate * max(1e-9,
+                                                         now - self.start)),
+                "bytesOut": core.bytesOut, "bytesIn": core.bytesIn,
+                "relayed": count("relayed"), "duplicates": count("duplicates"),
+                "dropped": count("dropped"),
+                "parseErrors": count("parseErrors"),
+                "errors": count("errors"), "neighbours": len(core.neighbours),
+                "routes": len(core.routes), "moves": core.attempt,
+                "neighboursConverged": self.converged[0],
+                "routesConverged": self.converged[1],
+                "hasNeighbours": hasNeighbours, "hasRoutes": hasRoutes}
+
+class Partition(object):
+    """
+    The nodes of one worker, stepped together on virtual time.
+    """
+    def __init__(self, topology, names, starts, uids, args, seed):
+        random.seed(seed) # message ids and the like
+        self.rng = random.Random(seed)
+        self.links = topology.links
+        self.step = args.step
+        self.errors = args.errors
+        self.steps = 0
+        self.now = 0.0
+        clock = lambda: self.now
+        self.nodes = collections.OrderedDict(
+            (name, SimNode(name, self.links[name], starts[name], uids[name],
+                           args.baud, clock))
+            for name in names)
+        component = topology.components()
+        self.expected = dict((name, (list(self.links[name]),
+                                     [other for other in component[name]
+                                      if other != name]))
+                             for name in names)
+        self.sends = [] # heap of (time, number, sender, recipient, text)
+        self.order = itertools.count() # keeps equal arrival times in order
+        self.nextSample = 0.0
+
+    # Runs every node up to until, after adding the bytes arriving from
+    # other workers as (name, time, bytes) and the messages to send as
+    # (time, number, sender, recipient, text). Returns the bytes for nodes
+    # of other workers and the (number, time) messages delivered.
+    def run(self, until, arrivals, sends):
+        for name, when, data in arrivals:
+            heapq.heappush(self.nodes[name].arrivals,
+                           (when, next(self.order), data))
+        for send in sends:
+            heapq.heappush(self.sends, send)
+        departures = []
+        while self.now < until - self.step / 2:
+            self.steps += 1
+            self.now = now = self.steps * self.step
+            while self.sends and self.sends[0][0] <= now:
+                when, number, sender, recipient, text = \
+                    heapq.heappop(self.sends)
+                simNode = self.nodes[sender]
+                if simNode.started:
+                    simNode.core.send(sender, recipient, text)
+            for simNode in self.nodes.values():
+                if not simNode.busy(now):
+                    continue
+                started = cpu_time()
+                written = simNode.step(now, self.step, self.rng)
+                simNode.cpu += cpu_time() - started
+                if written:
+                    self.transmit(simNode, written, now, departures)
+            if now >= self.nextSample:
+                self.nextSample = now + SAMPLE_INTERVAL
+                for name, simNode in self.nodes.items():
+                    if None in simNode.converged:
+                        simNode.check(now, *self.expected[name])
+        deliveries = []
+        for simNode in self.nodes.values():
+            deliveries += simNode.events.deliveries
+            simNode.events.deliveries = []
+        return departures, deliveries
+
+    # Hands what a node sent to each node linked to it.
+    def transmit(self, simNode, written, now, departures):
+        for neighbour, (latency, loss) in simNode.links.items():
+            data = b"".join(data for data, lost in written
+                            if neighbour not in lost)
+            if not data:
+                continue
+            data = damage(data, self.errors, self.rng)
+            when = now + latency
+            target = self.nodes.get(neighbour)
+            if target != None:
+                heapq.heappush(target.arrivals, (when, next(self.order), data))
+            else:
+                departures.append((neighbour, when, data))
+
+    def summary(self):
+        return [simNode.summary(self.now, *self.expected[name])
+                for name, simNode in self.nodes.items()]
+
+# Serves the calls made on a Partition in a worker process.
+def serve(conn, args):
+    partition = Partition(*args)
+    while True:
+        request = conn.recv()
+        if request == None:
+            break
+        method, params = request
+        try:
+            result = (True, getattr(partition, method)(*params))
+        except Exception:
+            result = (False, traceback.format_exc())
+        conn.send(result)
+    conn.close()
+
+class Worker(object):
+    """
+    A Partition run in a process of its own, or in this one if process is
+    False. Calls are made with send() and their results collected with
+    receive(), so that every worker can be busy at once.
+    """
+    def __init__(self, args, process = True):
+        self.partition = None
+        self.result = None
+        if process:
+            self.conn, child = multiprocessing.Pipe()
+            self.process = multiprocessing.Process(target = serve,
+                                                   args = (child, args))
+            self.process.daemon = True
+            self.process.start()
+            child.close()
+        else:
+            self.partition = Partition(*args)
+
+    def send(self, method, *params):
+        if self.partition != None:
+            self.result = getattr(self.partition, method)(*params)
+        else:
+            self.conn.send((method, params))
+
+    def receive(self):
+        if self.partition != None:
+            return self.result
+        ok, result = self.conn.recv()
+        if not ok:
+            raise RuntimeError("simulation worker failed\n" + result)
+        return result
+
+    def close(self):
+        if self.partition == None:
+            self.conn.send(None)
+            self.process.join()
+
+# Draws the messages nodes send, as (time, number, sender, recipient, text)
+# in order of time.
+def plan_traffic(topology, args, rng):
+    component = topology.components()
+    rate = args.rate / 60.0
+    plan = []
+    if rate <= 0:
+        return plan
+    for name in topology.names:
+        others = sorted(component[name] - set([name]))
+        if not others:
+            continue
+        when = args.warmup + rng.expovariate(rate)
+        while when < args.duration - args.drain:
+            plan.append([when, name, rng.choice(others)])
+            when += rng.expovariate(rate)
+    plan.sort()
+    messages = []
+    for number, (when, sender, recipient) in enumerate(plan):
+        text = "SIM %d " % number
+        text += "x" * max(0, args.size - len(text))
+        messages.append((when, number, sender, recipient, text))
+    return messages
+
+# Simulates a mesh and returns its figures.
+def simulate(topology, args):
+    rng = random.Random(args.seed)
+    names = topology.names
+    starts = dict((name, rng.uniform(0, PING_INTERVAL)) for name in names)
+    uids = dict((name, rng.getrandbits(64)) for name in names)
+    messages = collections.deque(plan_traffic(topology, args, rng))
+    sent = dict((number, when) for when, number, s, r, t in messages)
+
+    count = max(1, min(args.processes, len(names)))
+    shares = [names[len(names) * i // count:len(names) * (i + 1) // count]
+              for i in range(count)]
+    owner = dict((name, i) for i, share in enumerate(shares) for name in share)
+    began = time.time()
+    workers = [Worker((topology, share, starts, uids, args, args.seed + i),
+                      args.processes > 0)
+               for i, share in enumerate(shares)]
+
+    # bytes sent during one window arrive in a later one at the earliest
+    window = args.step * max(1, int(topology.min_latency() / args.step + 1e-9))
+    arrivals = [[] for worker in workers]
+    delivered = {}
+    copies = 0
+    now = 0.0
+    try:
+        while now < args.duration - args.step / 2:
+            until = min(args.duration, now + window)
+            sends = [[] for worker in workers]
+            while messages and messages[0][0] < until:
+                message = messages.popleft()
+                sends[owner[message[2]]].append(message)
+            for i, worker in enumerate(workers):
+                worker.send("run", until, arrivals[i], sends[i])
+            arrivals = [[] for worker in workers]
+            for worker in workers:
+                departures, deliveries = worker.receive()
+                for departure in departures:
+                    arrivals[owner[departure[0]]].append(departure)
+                for number, when in deliveries:
+                    if number in delivered:
+                        copies += 1
+                    else:
+                        delivered[number] = when - sent[number]
+            now = until
+        for worker in workers:
+            worker.send("summary")
+        nodes = []
+        for worker in workers:
+            nodes += worker.receive()
+    finally:
+        for worker in workers:
+            worker.close()
+    elapsed = time.time() - began
+    result = report(topology, args, nodes, sent, delivered, copies, elapsed)
+    # nodes drawing the same address at first, which the mesh sorts out
+    count = collections.Counter(addressing.candidate(uid)
+                                for uid in uids.values())
+    result["clashes"] = sum(n for n in count.values() if n > 1)
+    return result
+
+# Works out the figures of a run from those of its nodes.
+def report(topology, args, nodes, sent, delivered, copies, elapsed):
+    def converged(key):
+        times = [node[key] for node in nodes]
+        return None if None in times else max(times)
+    cpu = sorted(node["cpu"] * 1000 / args.duration for node in nodes)
+    load = [node["load"] for node in nodes]
+    latency = sorted(delivered.values())
+    busiest = max(nodes, key = lambda node: node["cpu"])
+    messages = max(1, len(sent))
+    return {"nodes": len(nodes), "links": topology.edges(),
+            "moves": sum(node["moves"] for node in nodes),
+            "neighboursConverged": converged("neighboursConverged"),
+            "routesConverged": converged("routesConverged"),
+            "neighboursComplete": sum(node["hasNeighbours"]
+                                      for node in nodes) / float(len(nodes)),
+            "routesComplete": sum(node["hasRoutes"]
+                                  for node in nodes) / float(len(nodes)),
+            "sent": len(sent), "delivered": len(delivered),
+            "deliveredTwice": copies,
+            "deliveryRatio": len(delivered) / float(messages),
+            "latencyP50": percentile(latency, 0.5),
+            "latencyP99": percentile(latency, 0.99),
+            "relaysPerMessage": sum(node["relayed"]
+                                    for node in nodes) / float(messages),
+            "duplicatesPerMessage": sum(node["duplicates"]
+                                        for node in nodes) / float(messages),
+            "loadMean": sum(load) / len(load), "loadMax": max(load),
+            "cpuMean": sum(cpu) / len(cpu), "cpuP99": percentile(cpu, 0.99),
+            "cpuMax": cpu[-1], "busiest": busiest["name"],
+            "wallTime": elapsed, "speed": args.duration / elapsed,
+            "perNode": nodes}
+
+HEADER = ("nodes links moves | converge s: nbrs routes | deliver   p50 s"
+          "   p99 s | relay  dups | load avg  max | cpu ms/s avg   p99   max"
+          " | speed")
+
+def format_time(seconds):
+    return "   -  " if seconds == None else "%6.1f" % seconds
+
+def format_row(result):
+    return ("%5d %5d %5d | %18s %6s | %6.1f%% %7.2f %7.2f | %5.1f %5.1f |"
+            " %7.0f%% %3.0f%% | %12.2f %5.2f %5.2f | %4.0fx"
+            % (result["nodes"], result["links"], result["moves"],
+               format_time(result["neighboursConverged"]),
+               format_time(result["routesConverged"]),
+               result["deliveryRatio"] * 100, result["latencyP50"],
+               result["latencyP99"], result["relaysPerMessage"],
+               result["duplicatesPerMessage"], result["loadMean"] * 100,
+               result["loadMax"] * 100, result["cpuMean"], result["cpuP99"],
+               result["cpuMax"], result["speed"]))
+
+# Parses a comma separated list of node counts.
+def node_counts(value):
+    try:
+        counts = [int(count) for count in value.split(",")]
+    except ValueError:
+        raise argparse.ArgumentTypeError("expected numbers such as 50,100")
+    if min(counts) < 2:
+        raise argparse.ArgumentTypeError("a mesh needs at least 2 nodes")
+    return counts
+
+def main(argv):
+    parser = argparse.ArgumentParser(description = "Simulate a large mesh")
+    parser.add_argument("--nodes", type = node_counts, default = [100],
+                        help = "nodes to simulate, or a list such as "
+                               "50,100,200 to run each in turn")
+    parser.add_argument("--topology", choices = TOPOLOGIES, default = "random")
+    parser.add_argument("--edges", metavar = "FILE",
+                        help = "read the links from FILE instead")
+    parser.add_argument("--degree", type = float, default = DEGREE,
+                        help = "mean neighbours in a random topology")
+    parser.add_argument("--baud", type = int, default = BAUD_RATE)
+    parser.add_argument("--latency", type = float, default = LATENCY,
+                        help = "seconds for bytes to cross a link")
+    parser.add_argument("--loss", type = float, default = 0.0,
+                        help = "chance of a write being lost on a link")
+    parser.add_argument("--errors", type = float, default = 0.0,
+                        help = "share of bytes corrupted on a link")
+    parser.add_argument("--duration", type = float, default = DURATION,
+                        help = "seconds of virtual time")
+    parser.add_argument("--warmup", type = float, default = WARMUP,
+                        help = "seconds before the first message")
+    parser.add_argument("--drain", type = float, default = DRAIN,
+                        help = "seconds at the end without new messages")
+    parser.add_argument("--rate", type = float, default = RATE,
+                        help = "messages each node sends a minute")
+    parser.add_argument("--size", type = int, default = MESSAGE_SIZE,
+                        help = "characters in each message")
+    parser.add_argument("--step", type = float, default = STEP,
+                        help = "seconds of virtual time per step")
+    parser.add_argument("--processes", type = int,
+                        default = multiprocessing.cpu_count(),
+                        help = "worker processes, 0 to run in this one")
+    parser.add_argument("--seed", type = int, default = 1)
+    parser.add_argument("--json", metavar = "FILE",
+                        help = "save the figures of every run to FILE")
+    args = parser.parse_args(argv[1:])
+    if args.step <= 0 or args.latency < 0 or args.baud <= 0:
+        parser.error("--step and --baud must be positive, --latency not "
+                     "negative")
+
+    counts = [None] if args.edges else args.nodes
+    results = []
+    sys.stdout.write(HEADER + "\n")
+    for count in counts:
+        if args.edges:
+            topology = read_topology(args.edges, args)
+        else:
+            topology = build_topology(args.topology, count, args,
+                                      random.Random(args.seed))
+        result = simulate(topology, args)
+        results.append(result)
+        sys.stdout.write(format_row(result) + "\n")
+        sys.stdout.flush()
+    if args.json != None:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent = 1, sort_keys = True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,317 @@
+"""
+Network Testing Application
+
+This application allows for the sending and retrieval of data across a network
+which uses serial ports on multiple machines. It adopts its own protocol and
+allows for text to be sent from one machine to another.
+
+Author: Nick Klose (nick.klose@ualberta.ca)
+http://ualberta.ca/~klose
+
+Soak testing. One node receives and checks test traffic while another sends
+it at a steady rate with sizes drawn from a distribution:
+
+    python soak.py --port /dev/ttyUSB1 --name Penguin --receive
+    python soak.py --port /dev/ttyUSB0 --target Penguin --rate 5 \\
+        --size uniform:16-200 --duration 3600
+
+Every message starts with "SOAK <config> <sequence> <send time> <crc>"
+followed by filler the CRC covers. The receiver prints the goodput, loss,
+corruption and jitter of each configuration. Given lists of settings (or
+"all" for everything the window offers), both sides step through every
+combination, spending --duration seconds on each. The sender announces the
+timetable once, in the first combination, and both sides then switch on
+their own clocks, so a combination which garbles the traffic does not
+leave the receiver behind. Both sides need the same lists, and the first
+combination must be one the link carries.
+"""
+import sys
+import time
+import random
+import argparse
+import itertools
+import threading
+import node
+import protocol
+
+SWITCH_DELAY = 3.0 # seconds kept quiet either side of each switch
+ANNOUNCE_COUNT = 3 # times the timetable is announced
+ANNOUNCE_GAP = 0.2 # seconds between the announcements
+FILLER = b"abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+MAX_SIZE = protocol.MAX_PAYLOAD - 48 # filler bytes in the largest message
+
+# Returns a function drawing message sizes from a specification such as
+# "fixed:64", "uniform:16-512" or "exp:128".
+def size_sampler(spec, rng):
+    kind, _, value = spec.partition(":")
+    if kind == "fixed":
+        size = int(value)
+        return lambda: size
+    if kind == "uniform":
+        low, high = [int(x) for x in value.split("-")]
+        return lambda: rng.randint(low, high)
+    if kind == "exp":
+        mean = float(value)
+        return lambda: min(MAX_SIZE, int(rng.expovariate(1.0 / mean)))
+    raise ValueError("unknown size distribution: " + spec)
+
+def filler(sequence, size):
+    start = sequence % len(FILLER)
+    data = (FILLER * (size // len(FILLER) + 2))[start:start + size]
+    return data.decode("ascii") if not isinstance(data, str) else data
+
+def make_message(config, sequence, size):
+    body = filler(sequence, size)
+    return "SOAK %d %d %.6f %04X %s" % (config, sequence, time.time(),
+                                        protocol.crc16(body.encode("ascii")),
+                                        body)
+
+# Splits a message into (config, sequence, send time, intact, filler size),
+# or returns None if it is not a soak message.
+def parse_message(text):
+    parts = text.split(" ", 5)
+    if len(parts) < 5 or parts[0] != "SOAK":
+        return None
+    try:
+        config, sequence = int(parts[1]), int(parts[2])
+        sent, crc = float(parts[3]), int(parts[4], 16)
+    except ValueError:
+        return None
+    body = parts[5] if len(parts) > 5 else ""
+    intact = protocol.crc16(body.encode("ascii", "replace")) == crc
+    return config, sequence, sent, intact, len(body)
+
+class ConfigStats(object):
+    """
+    What arrived of one configuration's traffic.
+    """
+    def __init__(self):
+        self.sequences = set()
+        self.highest = -1
+        self.received = 0
+        self.corrupt = 0
+        self.duplicates = 0
+        self.bytes = 0 # filler bytes received intact
+        self.first = None # arrival of the first message
+        self.last = None # arrival of the latest message
+        self.transit = None # transit time of the previous message
+        self.jitter = 0.0 # interarrival jitter as in RFC 3550
+
+    def add(self, sequence, sent, intact, size, now):
+        self.received += 1
+        if not intact:
+            self.corrupt += 1
+            return
+        if sequence in self.sequences:
+            self.duplicates += 1
+            return
+        self.sequences.add(sequence)
+        self.highest = max(self.highest, sequence)
+        self.bytes += size
+        if self.first == None:
+            self.first = now
+        self.last = now
+        # clocks of the two nodes need not agree, only their differences count
+        transit = now - sent
+        if self.transit != None:
+            self.jitter += (abs(transit - self.transit) - self.jitter) / 16.0
+        self.transit = transit
+
+    def report(self):
+        expected = self.highest + 1
+        elapsed = (self.last - self.first) if self.first != None else 0.0
+        return {"received": len(self.sequences), "expected": expected,
+                "loss": 1.0 - float(len(self.sequences)) / expected
+                        if expected > 0 else 0.0,
+                "corrupt": self.corrupt, "duplicates": self.duplicates,
+                "goodput": self.bytes / elapsed if elapsed > 0 else 0.0,
+                "jitter": self.jitter}
+
+class SoakEvents(node.NodeEvents):
+    """
+    Checks soak traffic arriving at the receiving node and switches
+    settings on the timetable the sender announced.
+    """
+    def __init__(self, configs):
+        self.configs = configs
+        self.core = None
+        self.lock = threading.Lock()
+        self.stats = {} # configuration number -> ConfigStats
+        self.current = 0 # configuration in use
+        self.scheduled = False # whether the timetable arrived
+        self.reported = set() # configurations whose results were printed
+
+    def received(self, sender, text):
+        now = time.time()
+        if text.startswith("SOAKGO "):
+            try:
+                delay, duration = [float(x) for x in text.split()[1:3]]
+            except ValueError:
+                return
+            self.announced(delay, duration)
+            return
+        parsed = parse_message(text)
+        if parsed == None:
+            return
+        config, sequence, sent, intact, size = parsed
+        with self.lock:
+            stats = self.stats.get(config)
+            if stats == None:
+                stats = self.stats[config] = ConfigStats()
+            stats.add(sequence, sent, intact, size, now)
+
+    # Prints the results of a configuration once.
+    def report(self, config):
+        stats = self.stats.get(config)
+        if stats != None and config not in self.reported:
+            self.reported.add(config)
+            print_result(config, self.configs[config], stats.report())
+
+    # Schedules every switch from the timetable, which starts delay
+    # seconds from now. Later copies of the announcement are ignored.
+    def announced(self, delay, duration):
+        if self.scheduled:
+            return
+        self.scheduled = True
+        scheduler = self.core.scheduler
+        for config, start in enumerate(timetable(len(self.configs), duration)):
+            if config > 0:
+                scheduler.call_later(delay + start,
+                                     lambda config = config:
+                                     self.switch(config))
+        end = delay + timetable(len(self.configs) + 1, duration)[-1]
+        scheduler.call_later(end, lambda: self.switch(None))
+
+    # Moves on to a configuration, or None after the last one.
+    def switch(self, config):
+        with self.lock:
+            self.report(self.current)
+        if config == None:
+            return
+        self.current = config
+        apply_config(self.core, self.configs[config])
+
+# Returns when each of count configurations starts, in seconds from the
+# start of the first. Each runs for duration with a quiet SWITCH_DELAY
+# either side, so frames in flight at a switch are not counted.
+def timetable(count, duration):
+    period = duration + 2 * SWITCH_DELAY
+    return [index * period for index in range(count)]
+
+# Sleeps until the given time.
+def wait_until(when):
+    delay = when - time.time()
+    if delay > 0:
+        time.sleep(delay)
+
+# Opens the port again with new (baud, parity, stop bits, byte size).
+def apply_config(core, config):
+    core.baud, core.parity, core.stopBits, core.byteSize = config
+    core.open()
+
+def describe(config):
+    baud, parity, stopBits, byteSize = config
+    return "%d %d%s%g" % (baud, byteSize, parity, stopBits)
+
+def print_result(index, config, result, out = sys.stdout):
+    out.write("%-4d %-14s goodput %8.1f B/s  loss %5.1f%%  corrupt %d  "
+              "duplicates %d  jitter %.1f ms\n" %
+              (index, describe(config), result["goodput"],
+               result["loss"] * 100, result["corrupt"],
+               result["duplicates"], result["jitter"] * 1000))
+    out.flush()
+
+# Sends soak traffic for every configuration in turn, after announcing the
+# timetable in the first.
+def send(core, target, configs, rate, sampler, duration):
+    first = time.time() + ANNOUNCE_COUNT * ANNOUNCE_GAP + SWITCH_DELAY
+    for i in range(ANNOUNCE_COUNT):
+        core.send(core.name, target, "SOAKGO %.3f %.3f"
+                  % (first - time.time(), duration))
+        time.sleep(ANNOUNCE_GAP)
+
+    starts = timetable(len(configs), duration)
+    for index, config in enumerate(configs):
+        wait_until(first + starts[index])
+        if index > 0:
+            apply_config(core, config)
+        wait_until(first + starts[index] + SWITCH_DELAY)
+
+        sent = dropped = 0
+        start = time.time()
+        while time.time() - start < duration:
+            message = make_message(index, sent, sampler())
+            if not core.send(core.name, target, message):
+                dropped += 1
+            sent += 1
+            # keep to the rate on average even if a send was slow
+            delay = start + float(sent) / rate - time.time()
+            if delay > 0:
+                time.sleep(delay)
+        sys.stdout.write("%-4d %-14s sent %d, %d refused by the outbox\n" %
+                         (index, describe(config), sent, dropped))
+        sys.stdout.flush()
+
+# Expands a comma separated list of settings, "all" meaning every choice.
+def choices(value, every, convert):
+    if value == "all":
+        return list(every)
+    return [convert(x) for x in value.split(",")]
+
+def main(argv):
+    parser = argparse.ArgumentParser(description = "Soak test")
+    parser.add_argument("--port", required = True)
+    parser.add_argument("--name", help = "name of this node")
+    parser.add_argument("--target", help = "node to send to")
+    parser.add_argument("--receive", action = "store_true",
+                        help = "check traffic instead of sending it")
+    parser.add_argument("--rate", type = float, default = 2.0,
+                        help = "messages per second")
+    parser.add_argument("--size", default = "uniform:16-128",
+                        help = "fixed:N, uniform:LOW-HIGH or exp:MEAN")
+    parser.add_argument("--duration", type = float, default = 60.0,
+                        help = "seconds spent on each configuration")
+    parser.add_argument("--seed", type = int, default = 491)
+    parser.add_argument("--bauds", default = str(node.BAUD_RATE))
+    parser.add_argument("--parities", default = node.PARITY)
+    parser.add_argument("--stop-bits", default = str(node.STOP_BITS))
+    parser.add_argument("--byte-sizes", default = str(node.BYTE_SIZE))
+    args = parser.parse_args(argv[1:])
+    if not args.receive and args.target == None:
+        sys.stderr.write("--target is required unless receiving\n")
+        return 2
+
+    configs = list(itertools.product(
+        choices(args.bauds, node.BAUD_RATES, int),
+        choices(args.parities, node.PARITIES, str),
+        choices(args.stop_bits, node.STOP_BITS_CHOICES, float),
+        choices(args.byte_sizes, node.BYTE_SIZES, int)))
+
+    events = SoakEvents(configs) if args.receive else node.NodeEvents()
+    core = node.Node(events)
+    core.port = int(args.port) if args.port.isdigit() else args.port
+    core.change_name(args.name or core.random_name())
+    if args.receive:
+        events.core = core
+    apply_config(core, configs[0])
+    try:
+        if args.receive:
+            while True:
+                time.sleep(1.0)
+        else:
+            # give the receiver time to hear a ping first
+            time.sleep(SWITCH_DELAY)
+            send(core, args.target, configs, args.rate,
+                 size_sampler(args.size, random.Random(args.seed)),
+                 args.duration)
+    except KeyboardInterrupt:
+        pass
+    if args.receive:
+        with events.lock:
+            for index in sorted(events.stats):
+                events.report(index)
+    core.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
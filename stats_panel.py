@@ -0,0 +1,94 @@
+"""
+Network Testing Application
+
+This application allows for the sending and retrieval of data across a network
+which uses serial ports on multiple machines. It adopts its own protocol and
+allows for text to be sent from one machine to another.
+
+Author: Nick Klose (nick.klose@ualberta.ca)
+http://ualberta.ca/~klose
+"""
+from PyQt4 import QtCore, QtGui
+import metrics
+
+REFRESH_INTERVAL = 1000 # milliseconds between refreshes of the panel
+
+COLUMNS = ["Link"] + list(metrics.COUNTERS) + ["queueDepth", "fecParity",
+                                               "p50 us", "p99 us"]
+
+class StatsPanel(QtGui.QWidget):
+    """
+    Shows the statistics of a node's ports and neighbours, and switches
+    profiling of its receive loop on and off.
+    """
+    def __init__(self, core, parent = None):
+        QtGui.QWidget.__init__(self, parent, QtCore.Qt.Window)
+        self.core = core
+        self.setWindowTitle("Link Statistics")
+        self.resize(900, 400)
+
+        self.table = QtGui.QTableWidget(0, len(COLUMNS), self)
+        self.table.setHorizontalHeaderLabels(COLUMNS)
+        self.table.verticalHeader().setVisible(False)
+        self.labelCompression = QtGui.QLabel(self)
+        self.btnProfile = QtGui.QPushButton("Start Profiling", self)
+        self.textProfile = QtGui.QPlainTextEdit(self)
+        self.textProfile.setReadOnly(True)
+        self.textProfile.hide()
+
+        layout = QtGui.QVBoxLayout(self)
+        layout.addWidget(self.table)
+        layout.addWidget(self.labelCompression)
+        layout.addWidget(self.btnProfile)
+        layout.addWidget(self.textProfile)
+
+        clicked = QtCore.SIGNAL("clicked()")
+        timeout = QtCore.SIGNAL("timeout()")
+        QtCore.QObject.connect(self.btnProfile, clicked, self.toggle_profile)
+        self.timer = QtCore.QTimer(self)
+        QtCore.QObject.connect(self.timer, timeout, self.refresh)
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start(REFRESH_INTERVAL)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+
+    def refresh(self):
+        self.core.sample_stats()
+        snapshot = self.core.metrics.snapshot()
+        rows = [("Port " + name, stats)
+                for name, stats in sorted(snapshot["ports"].items())]
+        rows += [(name, stats)
+                 for name, stats in sorted(snapshot["neighbours"].items())]
+
+        self.table.setRowCount(len(rows))
+        for row, (name, stats) in enumerate(rows):
+            frameTime = stats["frameTime"]
+            values = [name] + [stats[key] for key in metrics.COUNTERS]
+            values += [stats.get("queueDepth", ""),
+                       stats.get("fecParity", ""),
+                       "%.0f" % (frameTime["p50"] * 1e6),
+                       "%.0f" % (frameTime["p99"] * 1e6)]
+            for column, value in enumerate(values):
+                self.table.setItem(row, column,
+                                   QtGui.QTableWidgetItem(str(value)))
+
+        zipped = snapshot["compression"]
+        self.labelCompression.setText(
+            "Compression: %d of %d payloads, %d bytes sent as %d (%.0f%%), "
+            "%.0f us to compress and %.0f us to expand, %d damaged" %
+            (zipped["compressed"], zipped["payloads"], zipped["bytesBefore"],
+             zipped["bytesAfter"], zipped["ratio"] * 100,
+             zipped["compressUs"], zipped["expandUs"],
+             zipped["expandErrors"]))
+
+    def toggle_profile(self):
+        profile = self.core.toggle_profile()
+        if self.core.metrics.profiler != None:
+            self.btnProfile.setText("Stop Profiling")
+        else:
+            self.btnProfile.setText("Start Profiling")
+            self.textProfile.setPlainText(profile)
+            self.textProfile.show()
@@ -1,8 +1,9 @@
 import serial
+import ports
 
-for i in range(256):
+for port in ports.discover():
     try:
-        s = serial.Serial(i)
+        s = serial.Serial(ports.device(port))
         
         s.write("{NAME=Nick}")
         s.close()
@@ -0,0 +1,166 @@
+"""
+Network Testing Application
+
+This application allows for the sending and retrieval of data across a network
+which uses serial ports on multiple machines. It adopts its own protocol and
+allows for text to be sent from one machine to another.
+
+Author: Nick Klose (nick.klose@ualberta.ca)
+http://ualberta.ca/~klose
+
+Tests of selective repeat delivery between two nodes over a lossy link
+which is simulated in memory.
+"""
+import unittest
+import arq
+
+A = 0x1111
+B = 0x2222
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class Link(object):
+    """
+    A sender and a receiver with the payloads in flight between them. Data
+    payloads whose sequence is in lose are dropped the first time they are
+    sent.
+    """
+    def __init__(self, lose = ()):
+        self.clock = Clock()
+        self.lose = set(lose)
+        self.flight = []
+        self.sent = [] # sequence of every data payload sent
+        self.sender = arq.Reliable(self.transmit, self.clock)
+        self.receiver = arq.Reliable(lambda dst, payload: 0.0, self.clock)
+        self.texts = []
+        self.finished = []
+
+    def transmit(self, dst, payload):
+        sequence = arq.DATA.unpack_from(payload)[1]
+        self.sent.append(sequence)
+        if sequence in self.lose:
+            self.lose.discard(sequence)
+        else:
+            self.flight.append(payload)
+        return 0.0
+
+    # Delivers every payload in flight and the acknowledgements to them.
+    def deliver(self):
+        flight, self.flight = self.flight, []
+        for payload in flight:
+            text, ack = self.receiver.receive(A, payload)
+            if text != None:
+                self.texts.append(text)
+            self.finished += self.sender.acknowledge(B, ack)
+
+    def wait(self, seconds):
+        self.clock.now += seconds
+        self.finished += [(key, state)
+                          for dst, key, state in self.sender.due()]
+
+class DeliveryTest(unittest.TestCase):
+    def test_in_order(self):
+        link = Link()
+        for i in range(5):
+            link.sender.send(B, b"m%d" % i, i)
+        link.deliver()
+        self.assertEqual(link.texts, [b"m0", b"m1", b"m2", b"m3", b"m4"])
+        self.assertEqual(link.finished, [(i, arq.DELIVERED)
+                                         for i in range(5)])
+        self.assertEqual(link.sender.pending(), 0)
+
+    def test_only_the_lost_message_is_resent(self):
+        link = Link(lose = [1])
+        for i in range(5):
+            link.sender.send(B, b"m%d" % i, i)
+        link.deliver()
+        # three later messages were acknowledged, so 1 went out again
+        self.assertEqual(link.sent, [0, 1, 2, 3, 4, 1])
+        link.deliver()
+        self.assertEqual(sorted(link.texts),
+                         [b"m0", b"m1", b"m2", b"m3", b"m4"])
+        self.assertEqual(link.sender.pending(), 0)
+
+    def test_timeout_resends(self):
+        link = Link(lose = [0])
+        link.sender.send(B, b"only", "key")
+        link.deliver()
+        link.wait(arq.INITIAL_RTO - 0.5)
+        self.assertEqual(link.sent, [0])
+        link.wait(1.0)
+        self.assertEqual(link.sent, [0, 0])
+        self.assertEqual(link.sender.rto(B), arq.INITIAL_RTO * 2)
+        link.deliver()
+        self.assertEqual(link.texts, [b"only"])
+        self.assertEqual(link.finished, [("key", arq.DELIVERED)])
+
+    def test_copies_are_not_handed_over_twice(self):
+        link = Link()
+        link.sender.send(B, b"once", 0)
+        link.flight = link.flight * 3
+        link.deliver()
+        self.assertEqual(link.texts, [b"once"])
+
+    def test_gives_up(self):
+        link = Link()
+        link.sender.send(B, b"lost", "key")
+        link.flight = []
+        for i in range(arq.MAX_TRANSMISSIONS + 1):
+            link.wait(arq.MAX_RTO)
+            link.flight = []
+        self.assertEqual(link.sent.count(0), arq.MAX_TRANSMISSIONS)
+        self.assertEqual(link.finished, [("key", arq.FAILED)])
+        self.assertEqual(link.sender.pending(), 0)
+
+    def test_window_holds_back_the_rest(self):
+        link = Link()
+        for i in range(arq.WINDOW + 5):
+            link.sender.send(B, b"m", i)
+        self.assertEqual(len(link.sent), arq.WINDOW)
+        link.deliver()
+        self.assertEqual(len(link.sent), arq.WINDOW + 5)
+
+    def test_restarted_sender_starts_a_new_stream(self):
+        link = Link()
+        link.sender.send(B, b"before", 0)
+        link.deliver()
+        link.sender = arq.Reliable(link.transmit, link.clock)
+        link.sender.epoch = (link.receiver.receivers[A].epoch + 1) % \
+            arq.SEQUENCES
+        link.sender.send(B, b"after", 0)
+        link.deliver()
+        self.assertEqual(link.texts, [b"before", b"after"])
+
+class RttTest(unittest.TestCase):
+    def test_timeout_follows_the_round_trip(self):
+        rtt = arq.RttEstimator()
+        for i in range(20):
+            rtt.sample(2.0)
+        self.assertTrue(2.0 <= rtt.rto < 3.0)
+        rtt.backoff()
+        self.assertTrue(rtt.rto >= 4.0)
+
+    def test_timeout_limits(self):
+        rtt = arq.RttEstimator()
+        rtt.sample(0.001)
+        self.assertEqual(rtt.rto, arq.MIN_RTO)
+        for i in range(10):
+            rtt.backoff()
+        self.assertEqual(rtt.rto, arq.MAX_RTO)
+
+    def test_sequence_wraps(self):
+        self.assertEqual(arq.distance(2, arq.SEQUENCES - 1), 3)
+        receiver = arq.Receiver(0)
+        receiver.next = arq.SEQUENCES - 1
+        self.assertTrue(receiver.receive(arq.SEQUENCES - 1,
+                                         arq.SEQUENCES - 1))
+        self.assertTrue(receiver.receive(0, arq.SEQUENCES - 1))
+        self.assertEqual(receiver.next, 1)
+
+if __name__ == "__main__":
+    unittest.main()
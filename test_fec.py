@@ -0,0 +1,146 @@
+"""
+Network Testing Application
+
+This application allows for the sending and retrieval of data across a network
+which uses serial ports on multiple machines. It adopts its own protocol and
+allows for text to be sent from one machine to another.
+
+Author: Nick Klose (nick.klose@ualberta.ca)
+http://ualberta.ca/~klose
+
+Tests of the Reed-Solomon code and the coded frame wrapping.
+"""
+import random
+import unittest
+import protocol
+import fec
+
+def make_frame(size = 150):
+    return protocol.encode(protocol.Packet(protocol.TEXT, 0x1111, 0x2222,
+                                           b"x" * size))
+
+# Flips count distinct bytes of data between start and end.
+def damage(data, count, rng, start = 0, end = None):
+    data = bytearray(data)
+    end = len(data) if end == None else end
+    for i in rng.sample(range(start, end), count):
+        data[i] ^= rng.randint(1, 255)
+    return data
+
+class BlockTest(unittest.TestCase):
+    def test_clean_block(self):
+        block = fec.encode_block(b"hello world", 8)
+        self.assertEqual(len(block), 19)
+        self.assertEqual(fec.decode_block(block, 8), (b"hello world", 0))
+
+    def test_corrects_up_to_half_the_parity(self):
+        rng = random.Random(3)
+        data = bytes(bytearray(rng.randint(0, 255) for i in range(64)))
+        for parity in (2, 4, 8, 16, 32):
+            for errors in range(parity // 2 + 1):
+                block = damage(fec.encode_block(data, parity), errors, rng)
+                decoded, fixed = fec.decode_block(block, parity)
+                self.assertEqual(bytes(decoded), data)
+                self.assertEqual(fixed, errors)
+
+    def test_too_many_errors(self):
+        rng = random.Random(4)
+        block = damage(fec.encode_block(b"y" * 64, 4), 5, rng)
+        try:
+            decoded, fixed = fec.decode_block(block, 4)
+        except ValueError:
+            return
+        # a rare miscorrection is caught by the frame CRC instead
+        self.assertNotEqual(bytes(decoded), b"y" * 64)
+
+class FrameTest(unittest.TestCase):
+    def test_round_trip(self):
+        frame = make_frame()
+        coded = fec.encode(frame, 8)
+        self.assertEqual(len(coded),
+                         fec.HEADER_SIZE + fec.coded_size(len(frame), 8))
+        counters = fec.Counters()
+        self.assertEqual(fec.decode(coded, 0, counters),
+                         (frame, len(coded)))
+        self.assertEqual(counters.corrected, 0)
+
+    def test_corrects_every_block(self):
+        rng = random.Random(5)
+        frame = make_frame()
+        coded = bytearray(fec.encode(frame, 8))
+        offset = fec.HEADER_SIZE
+        for start in range(0, len(frame), fec.BLOCK_DATA):
+            size = min(fec.BLOCK_DATA, len(frame) - start) + 8
+            coded = damage(coded, 4, rng, offset, offset + size)
+            offset += size
+        counters = fec.Counters()
+        self.assertEqual(fec.decode(coded, 0, counters)[0], frame)
+        self.assertEqual(counters.errors, 12)
+
+    def test_incomplete(self):
+        coded = fec.encode(make_frame(), 4)
+        for cut in (1, fec.HEADER_SIZE, len(coded) - 1):
+            self.assertEqual(fec.decode(coded[:cut], 0, fec.Counters()),
+                             (protocol.INCOMPLETE, 0))
+
+    def test_bad_header_skips_one_byte(self):
+        coded = damage(fec.encode(make_frame(), 4), 3, random.Random(6),
+                       1, fec.HEADER_SIZE)
+        self.assertEqual(fec.decode(coded, 0, fec.Counters()),
+                         (protocol.CORRUPT, 1))
+
+    def test_bad_block_skips_the_frame(self):
+        coded = fec.encode(make_frame(), 2)
+        coded = damage(coded, 5, random.Random(7), fec.HEADER_SIZE,
+                       fec.HEADER_SIZE + 20)
+        counters = fec.Counters()
+        result, end = fec.decode(coded, 0, counters)
+        self.assertEqual(end, len(coded))
+        self.assertNotEqual(result, make_frame())
+
+    def test_frame_too_large(self):
+        self.assertRaises(ValueError, fec.encode, b"x" * (fec.MAX_FRAME + 1),
+                          4)
+
+class LinkCodingTest(unittest.TestCase):
+    def test_parse_mode(self):
+        self.assertEqual(fec.parse_mode("auto"), fec.AUTO)
+        self.assertEqual(fec.parse_mode("off"), fec.OFF)
+        self.assertEqual(fec.parse_mode("8"), 8)
+        self.assertRaises(ValueError, fec.parse_mode, "3")
+        self.assertRaises(ValueError, fec.parse_mode, "64")
+
+    def test_only_used_once_every_peer_advertised(self):
+        link = fec.LinkCoding(8)
+        link.heard("Donut")
+        link.heard("Penguin")
+        link.advertised("Donut", 4)
+        self.assertEqual(link.parity(set(["Donut", "Penguin"])), 0)
+        self.assertEqual(link.parity(set(["Donut"])), 8)
+        link.advertised("Penguin", 2)
+        self.assertEqual(link.parity(set(["Donut", "Penguin"])), 8)
+
+    def test_auto_sends_what_peers_ask_for(self):
+        link = fec.LinkCoding(fec.AUTO)
+        link.heard("Donut")
+        link.heard("Penguin")
+        link.advertised("Donut", 4)
+        link.advertised("Penguin", 17)
+        self.assertEqual(link.parity(set(["Donut", "Penguin"])), 16)
+
+    def test_tune_follows_the_error_rate(self):
+        link = fec.LinkCoding(fec.AUTO)
+        link.tune(100000, 0, 100, 15000)
+        self.assertEqual(link.advertise(), 0)
+        for i in range(2, 10):
+            link.tune(100000 * i, 1000 * (i - 1), 100 * i, 15000 * i)
+        self.assertTrue(link.advertise() > 0)
+        self.assertEqual(link.frameSize, 150)
+
+    def test_best_parity(self):
+        self.assertEqual(fec.best_parity(0.0, 150), 0)
+        self.assertTrue(fec.best_parity(0.01, 150) >=
+                        fec.best_parity(0.001, 150))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+"""
+Network Testing Application
+
+This application allows for the sending and retrieval of data across a network
+which uses serial ports on multiple machines. It adopts its own protocol and
+allows for text to be sent from one machine to another.
+
+Author: Nick Klose (nick.klose@ualberta.ca)
+http://ualberta.ca/~klose
+
+Tests of splitting payloads into fragments and putting them back together.
+"""
+import random
+import unittest
+import itertools
+import protocol
+import fragments
+
+SRC = 0x1111
+DST = 0x2222
+
+def make_packet(payload, msgId = 7):
+    return protocol.Packet(protocol.TEXT, SRC, DST, payload, msgId = msgId)
+
+# Splits a packet and decodes each of its frames again.
+def split(packet, mtu):
+    ids = itertools.count(100)
+    frames = fragments.split(packet, mtu, lambda: next(ids))
+    return [protocol.decode(frame)[0] for frame in frames]
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class SplitTest(unittest.TestCase):
+    def test_short_payload_is_not_split(self):
+        parts = split(make_packet(b"hello"), 64)
+        self.assertEqual(len(parts), 1)
+        self.assertFalse(parts[0].flags & protocol.FRAGMENT)
+
+    def test_fragments_fit_the_mtu(self):
+        parts = split(make_packet(b"x" * 1000), 64)
+        self.assertEqual(len(parts), 17)
+        for part in parts:
+            self.assertTrue(len(part.payload) <= 64)
+            self.assertTrue(part.flags & protocol.FRAGMENT)
+
+    def test_fragments_get_their_own_ids(self):
+        parts = split(make_packet(b"x" * 300), 64)
+        ids = [part.msgId for part in parts]
+        self.assertEqual(ids[0], 7)
+        self.assertEqual(len(set(ids)), len(ids))
+
+    def test_too_many_fragments(self):
+        size = fragments.max_payload(32) + 1
+        self.assertRaises(ValueError, fragments.split,
+                          make_packet(b"x" * size), 32, lambda: 0)
+
+class ReassemblerTest(unittest.TestCase):
+    def test_out_of_order_and_duplicates(self):
+        payload = bytes(bytearray(range(256)) * 3)
+        parts = split(make_packet(payload), 64)
+        parts = parts + parts[:3]
+        random.Random(5).shuffle(parts)
+        reassembler = fragments.Reassembler()
+        whole = [p for p in map(reassembler.add, parts) if p != None]
+        self.assertEqual(len(whole), 1)
+        self.assertEqual(whole[0].payload, payload)
+        self.assertEqual(whole[0].msgId, 7)
+        self.assertFalse(whole[0].flags & protocol.FRAGMENT)
+        self.assertEqual(len(reassembler), 0)
+        self.assertEqual(reassembler.size, 0)
+
+    def test_messages_from_two_senders_kept_apart(self):
+        reassembler = fragments.Reassembler()
+        one = split(make_packet(b"a" * 200), 64)
+        two = split(make_packet(b"b" * 200), 64)
+        for part in two:
+            part.src = 0x3333
+        results = [reassembler.add(p) for p in itertools.chain(
+            *zip(one, two))]
+        payloads = sorted(p.payload for p in results if p != None)
+        self.assertEqual(payloads, [b"a" * 200, b"b" * 200])
+
+    def test_expire(self):
+        clock = Clock()
+        reassembler = fragments.Reassembler(timeout = 10, clock = clock)
+        reassembler.add(split(make_packet(b"x" * 200), 64)[0])
+        clock.now = 5
+        self.assertEqual(reassembler.expire(), 0)
+        clock.now = 11
+        self.assertEqual(reassembler.expire(), 1)
+        self.assertEqual(len(reassembler), 0)
+        self.assertEqual(reassembler.dropped, 1)
+
+    def test_limit_drops_oldest_first(self):
+        reassembler = fragments.Reassembler(limit = 150)
+        for msgId in (1, 2, 3):
+            part = split(make_packet(b"x" * 200, msgId), 64)[0]
+            reassembler.add(part)
+        self.assertTrue(reassembler.size <= 150)
+        self.assertEqual(list(reassembler.partial), [(SRC, 2), (SRC, 3)])
+
+    def test_short_fragment_ignored(self):
+        packet = make_packet(b"\x00", 1)
+        self.assertEqual(fragments.Reassembler().add(packet), None)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+"""
+Network Testing Application
+
+This application allows for the sending and retrieval of data across a network
+which uses serial ports on multiple machines. It adopts its own protocol and
+allows for text to be sent from one machine to another.
+
+Author: Nick Klose (nick.klose@ualberta.ca)
+http://ualberta.ca/~klose
+
+Tests of the incremental frame parser, which needs no port or Qt. Run with
+
+    python -m unittest discover -p "test_*.py"
+"""
+import unittest
+import protocol
+import frame_parser
+from frame_parser import FrameParser, PACKET
+
+# addresses with no SYNC byte in them, so only real frames start a decode
+SRC = 0x1111
+DST = 0x2222
+
+def packet(text, msgId = 1):
+    return protocol.encode(protocol.Packet(protocol.TEXT, SRC, DST, text,
+                                           msgId = msgId))
+
+class FrameParserTest(unittest.TestCase):
+    def test_whole_frames(self):
+        parser = FrameParser()
+        frames = parser.feed(b"{NAME=Donut}{PROTO=2}")
+        self.assertEqual(frames, [(b"NAME", b"Donut"), (b"PROTO", b"2")])
+        self.assertEqual(parser.frames, 2)
+        self.assertEqual(parser.dropped, 0)
+
+    # keys and values come out as bytes on every Python version
+    def test_keys_are_bytes(self):
+        key, value = FrameParser().feed(b"{TEXT=hi}")[0]
+        self.assertTrue(isinstance(key, bytes))
+        self.assertTrue(isinstance(value, bytes))
+
+    def test_frame_split_across_feeds(self):
+        parser = FrameParser()
+        data = b"{FROM=Donut}{TEXT=hello there}"
+        frames = []
+        for i in range(len(data)):
+            frames += parser.feed(data[i:i + 1])
+        self.assertEqual(frames, [(b"FROM", b"Donut"),
+                                  (b"TEXT", b"hello there")])
+
+    def test_stray_brace_resyncs(self):
+        parser = FrameParser()
+        frames = parser.feed(b"{NAME=Don{TEXT=hi}")
+        self.assertEqual(frames, [(b"TEXT", b"hi")])
+        self.assertEqual(parser.dropped, len(b"{NAME=Don"))
+
+    def test_garbage_between_frames(self):
+        parser = FrameParser()
+        frames = parser.feed(b"xx}{A=1}yy{B=2}")
+        self.assertEqual(frames, [(b"A", b"1"), (b"B", b"2")])
+        self.assertEqual(parser.dropped, 5)
+
+    def test_max_frame_overflow(self):
+        parser = FrameParser(maxFrame = 16)
+        self.assertEqual(parser.feed(b"{TEXT=" + b"x" * 32), [])
+        self.assertEqual(parser.dropped, 38)
+        self.assertEqual(parser.feed(b"}{A=1}"), [(b"A", b"1")])
+
+    def test_binary_and_brace_interleaved(self):
+        parser = FrameParser()
+        data = (b"{NAME=Donut}" + packet(b"one") + b"{TEXT=hi}" +
+                packet(b"two", 5))
+        frames = []
+        for i in range(0, len(data), 5):
+            frames += parser.feed(data[i:i + 5])
+        kinds = [key for key, value in frames]
+        self.assertEqual(kinds, [b"NAME", PACKET, b"TEXT", PACKET])
+        self.assertEqual(frames[1][1].payload, b"one")
+        self.assertEqual(frames[3][1].payload, b"two")
+        self.assertEqual(parser.packets, 2)
+
+    def test_binary_frame_inside_unterminated_brace(self):
+        parser = FrameParser()
+        frames = parser.feed(b"{TEXT=cut" + packet(b"one"))
+        self.assertEqual([key for key, value in frames], [PACKET])
+
+    def test_corrupt_binary_frame_skips_only_its_sync(self):
+        parser = FrameParser()
+        bad = bytearray(packet(b"y" * 30))
+        bad[-1] ^= 0xFF
+        frames = parser.feed(bytes(bad) + packet(b"good") + b"{A=1}")
+        self.assertEqual([key for key, value in frames], [PACKET, b"A"])
+        self.assertEqual(parser.corrupt, 1)
+
+    def test_bogus_length_does_not_hold_up_traffic(self):
+        parser = FrameParser()
+        noise = bytearray(packet(b""))[:protocol.HEADER_SIZE]
+        noise[11:13] = b"\x03\xe8" # claims 1000 bytes, fails the check
+        frames = parser.feed(bytes(noise) + b"{A=1}" + packet(b"ok"))
+        self.assertEqual([key for key, value in frames], [b"A", PACKET])
+
+    def test_reset_drops_partial_frame(self):
+        parser = FrameParser()
+        parser.feed(b"{TEXT=half")
+        parser.reset()
+        self.assertEqual(parser.feed(b"}{A=1}"), [(b"A", b"1")])
+
+    def test_find_sync(self):
+        buf = bytearray(b"ab" + frame_parser.SYNC + b"cd")
+        self.assertEqual(frame_parser.find_sync(buf, 0, len(buf)), 2)
+        self.assertEqual(frame_parser.find_sync(buf, 3, len(buf)), -1)
+
+if __name__ == "__main__":
+    unittest.main()
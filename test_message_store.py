@@ -0,0 +1,109 @@
+"""
+Network Testing Application
+
+This application allows for the sending and retrieval of data across a network
+which uses serial ports on multiple machines. It adopts its own protocol and
+allows for text to be sent from one machine to another.
+
+Author: Nick Klose (nick.klose@ualberta.ca)
+http://ualberta.ca/~klose
+
+Tests of the on-disk message history, each in a directory of its own.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+import message_store
+from message_store import MessageStore, SENT, RECEIVED, RELAYED
+
+class MessageStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = MessageStore(self.directory)
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.directory)
+
+    def reopen(self, readOnly = False):
+        self.store.close()
+        self.store = MessageStore(self.directory, readOnly)
+
+    def fill(self):
+        self.store.append(SENT, "Donut", "Penguin", "hello", 100.0)
+        self.store.append(RECEIVED, "Penguin", "Donut", u"h\u00e9llo", 200.0)
+        self.store.append(RELAYED, "Stumpy", "Penguin", "passing", 300.0)
+        self.store.append(RECEIVED, "Stumpy", "Donut", "hi", 400.0)
+
+    def test_records_read_back(self):
+        self.fill()
+        self.assertEqual(self.store.count(), 4)
+        self.assertEqual(self.store.record(1),
+                         (200.0, RECEIVED, u"Penguin", u"Donut",
+                          u"h\u00e9llo"))
+
+    def test_query_by_peer_direction_and_text(self):
+        self.fill()
+        texts = lambda records: [record[4] for record in records]
+        self.assertEqual(texts(self.store.query(peer = "Penguin")),
+                         [u"hello", u"h\u00e9llo", u"passing"])
+        self.assertEqual(texts(self.store.query(direction = RECEIVED)),
+                         [u"h\u00e9llo", u"hi"])
+        self.assertEqual(texts(self.store.query(text = u"pass")),
+                         [u"passing"])
+        self.assertEqual(list(self.store.query(peer = "Nobody")), [])
+
+    def test_query_by_time(self):
+        self.fill()
+        records = self.store.query(peer = "Stumpy", start = 150.0,
+                                   end = 350.0)
+        self.assertEqual([record[0] for record in records], [300.0])
+
+    def test_times_never_go_backwards(self):
+        self.store.append(SENT, "Donut", "Penguin", "late", 500.0)
+        self.store.append(SENT, "Donut", "Penguin", "early", 100.0)
+        self.assertEqual(self.store.time(1), 500.0)
+        self.assertEqual(self.store.record(1)[0], 100.0)
+
+    def test_kept_across_reopening(self):
+        self.fill()
+        self.reopen()
+        self.assertEqual(self.store.count(), 4)
+        self.assertEqual(len(list(self.store.query(peer = "Stumpy"))), 2)
+
+    def test_half_written_record_dropped(self):
+        self.fill()
+        self.store.close()
+        path = os.path.join(self.directory, message_store.LOG_FILE)
+        with open(path, "r+b") as f:
+            f.truncate(os.path.getsize(path) - 1)
+        self.store = MessageStore(self.directory)
+        self.assertEqual(self.store.count(), 3)
+        self.assertEqual(len(self.store.view("received")), 1)
+        self.store.append(SENT, "Donut", "Penguin", "again", 500.0)
+        self.assertEqual(self.store.record(3)[4], u"again")
+
+    def test_too_long(self):
+        self.assertRaises(ValueError, self.store.append, SENT, "Donut",
+                          "Penguin", "x" * (message_store.MAX_FIELD + 1))
+        self.assertEqual(self.store.count(), 0)
+
+    def test_one_writer_at_a_time(self):
+        self.assertRaises(IOError, MessageStore, self.directory)
+
+    def test_read_only_while_in_use(self):
+        self.fill()
+        reader = MessageStore(self.directory, True)
+        try:
+            self.store.append(SENT, "Donut", "Penguin", "later", 500.0)
+            self.assertEqual(reader.count(), 4)
+        finally:
+            reader.close()
+
+    def test_read_only_needs_history(self):
+        self.assertRaises(IOError, MessageStore,
+                          os.path.join(self.directory, "missing"), True)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+Network Testing Application
+
+This application allows for the sending and retrieval of data across a network
+which uses serial ports on multiple machines. It adopts its own protocol and
+allows for text to be sent from one machine to another.
+
+Author: Nick Klose (nick.klose@ualberta.ca)
+http://ualberta.ca/~klose
+
+Tests of the distance-vector routing table.
+"""
+import unittest
+import routing
+from routing import RoutingTable, INFINITY, HOLD_TIME
+
+ME = 1
+B = 2
+C = 3
+D = 4
+
+class Clock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class RoutingTableTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        self.table = RoutingTable(ME, timeout = 10, clock = self.clock)
+
+    def test_neighbour_is_one_hop(self):
+        self.table.heard(B)
+        self.table.heard(ME)
+        self.assertEqual(self.table.next_hop(B), B)
+        self.assertEqual(self.table.cost(B), 1)
+        self.assertEqual(len(self.table), 1)
+
+    def test_learns_routes_through_neighbours(self):
+        self.table.update(B, [(C, 1, C), (D, 2, C)])
+        self.assertEqual(self.table.next_hop(C), B)
+        self.assertEqual(self.table.cost(D), 3)
+
+    def test_keeps_the_cheapest_route(self):
+        self.table.update(B, [(D, 3, C)])
+        self.table.update(C, [(D, 1, D)])
+        self.assertEqual(self.table.next_hop(D), C)
+        self.table.update(B, [(D, 2, C)])
+        self.assertEqual(self.table.next_hop(D), C)
+        self.assertEqual(self.table.cost(D), 2)
+
+    def test_split_horizon(self):
+        self.table.update(B, [(D, 1, ME), (ME, 1, ME)])
+        self.assertEqual(self.table.next_hop(D), None)
+        self.assertEqual(self.table.cost(ME), INFINITY)
+
+    def test_next_hop_withdraws_route(self):
+        self.table.update(B, [(D, 1, D)])
+        self.table.update(B, [(D, INFINITY, D)])
+        self.assertEqual(self.table.next_hop(D), None)
+        # still advertised as unreachable for the hold time
+        self.assertTrue((D, INFINITY, B) in self.table.advertisement())
+
+    def test_unreachable_entry_is_not_learnt(self):
+        self.table.update(B, [(D, INFINITY - 1, C)])
+        self.assertFalse(D in self.table.routes)
+
+    def test_lost_neighbour_takes_its_routes_along(self):
+        self.table.update(B, [(D, 1, D)])
+        self.clock.now = 5
+        self.table.heard(C)
+        self.clock.now = 11
+        self.assertEqual(self.table.next_hop(B), None)
+        self.assertEqual(self.table.cost(B), INFINITY)
+        self.assertEqual(self.table.cost(D), INFINITY)
+        self.assertEqual(self.table.next_hop(C), C)
+        self.clock.now = 11 + HOLD_TIME
+        self.table.expire()
+        self.assertEqual(sorted(self.table.routes), [C])
+
+    def test_longer_timeout_for_slow_neighbours(self):
+        self.table.heard(B, timeout = 30)
+        self.clock.now = 20
+        self.assertEqual(self.table.next_hop(B), B)
+
+class PackTest(unittest.TestCase):
+    def test_round_trip(self):
+        entries = [(n, n % INFINITY, n + 1) for n in range(20)]
+        payloads = routing.pack_routes(entries, 32)
+        self.assertEqual(len(payloads), 4)
+        for payload in payloads:
+            self.assertTrue(len(payload) <= 32)
+        unpacked = []
+        for payload in payloads:
+            unpacked += routing.unpack_routes(payload)
+        self.assertEqual(unpacked, entries)
+
+    def test_trailing_bytes_ignored(self):
+        payload = routing.pack_routes([(5, 1, 5)], 64)[0] + b"\x00"
+        self.assertEqual(routing.unpack_routes(payload), [(5, 1, 5)])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+"""
+Network Testing Application
+
+This application allows for the sending and retrieval of data across a network
+which uses serial ports on multiple machines. It adopts its own protocol and
+allows for text to be sent from one machine to another.
+
+Author: Nick Klose (nick.klose@ualberta.ca)
+http://ualberta.ca/~klose
+
+In-memory stand-ins for serial.Serial, so that the node core can be driven
+without any hardware attached.
+"""
+import time
+
+class VirtualSerial(object):
+    """
+    Behaves like an open serial port. Bytes queued with inject() are handed
+    out by read() in chunks of at most chunkSize, and everything written is
+    collected in self.written.
+    """
+    def __init__(self, data = b"", chunkSize = 4096):
+        self.incoming = bytearray(data) # bytes waiting to be read
+        self.chunkSize = chunkSize # most bytes one read() returns
+        self.written = bytearray() # everything written to the port
+        self.reads = 0 # number of read() calls
+        self.lastRead = 0.0 # time of the most recent read()
+        self.open = True
+
+    # Queues bytes as if they had arrived on the wire.
+    def inject(self, data):
+        self.incoming.extend(data)
+
+    def inWaiting(self):
+        return min(len(self.incoming), self.chunkSize)
+
+    def read(self, size = 1):
+        size = min(size, self.chunkSize)
+        data = bytes(self.incoming[:size])
+        del self.incoming[:size]
+        self.reads += 1
+        self.lastRead = time.time()
+        return data
+
+    def write(self, data):
+        self.written.extend(data)
+        return len(data)
+
+    def isOpen(self):
+        return self.open
+
+    def close(self):
+        self.open = False
@@ -0,0 +1,419 @@
+"""
+Network Testing Application
+
+This application allows for the sending and retrieval of data across a network
+which uses serial ports on multiple machines. It adopts its own protocol and
+allows for text to be sent from one machine to another.
+
+Author: Nick Klose (nick.klose@ualberta.ca)
+http://ualberta.ca/~klose
+"""
+import serial
+import time
+import threading
+import imaging
+import ports
+import message_store
+from PyQt4 import QtCore, QtGui
+from node import Node, NodeEvents, BAUD_RATE, PARITY, STOP_BITS, BYTE_SIZE
+from message_list import MessageList, HistoryList, MESSAGE_LIMIT
+from stats_panel import StatsPanel
+from gui import Ui_MainWindow
+
+REFRESH_INTERVAL = 100 # milliseconds between updates from the network
+
+# Shown after messages sent for confirmed delivery
+WAITING = "(waiting)"
+DELIVERED = "(delivered)"
+NOT_DELIVERED = "(not delivered)"
+
+class NetworkTest(QtGui.QMainWindow, NodeEvents):
+    def __init__(self, parent = None):
+        QtGui.QWidget.__init__(self, parent)
+        self.ui = Ui_MainWindow()
+        self.ui.setupUi(self)
+
+        self.setFixedSize(self.size()) # disable resizing
+
+        self.core = Node(self) # network logic, reporting back to this window
+        self.portWatcher = None # reports serial ports as they come and go
+        self.statsPanel = None # link statistics, opened with F2
+        self.node = None # name of node to send to
+        self.imageWindows = {} # windows showing received images
+
+        # the data lists page through the message history, or keep the
+        # latest MESSAGE_LIMIT lines each if it cannot be opened
+        self.history = self.open_history()
+        if self.history != None:
+            self.sentData = HistoryList(self.history.view("sent"), self)
+            self.receivedData = HistoryList(self.history.view("received"),
+                                            self)
+            self.relayedData = HistoryList(self.history.view("relayed"), self)
+        else:
+            self.sentData = MessageList(MESSAGE_LIMIT, self)
+            self.receivedData = MessageList(MESSAGE_LIMIT, self)
+            self.relayedData = MessageList(MESSAGE_LIMIT, self)
+        self.ui.listSentData.setModel(self.sentData)
+        self.sentLines = self.sentData.rowCount() # lines ever sent
+        self.deliveries = {} # key of a message -> number of its line
+        self.ui.listReceivedData.setModel(self.receivedData)
+        self.ui.listRelayedData.setModel(self.relayedData)
+
+        # node events arrive on any thread and are applied together on this
+        # one, at most once every REFRESH_INTERVAL
+        self.updateLock = threading.Lock()
+        self.updatePending = False # an update is signalled or scheduled
+        self.lastUpdate = 0.0 # when updates were last applied
+        self.pendingLines = {} # message list -> lines to add
+        self.pendingCalls = [] # (function, arguments) to call in order
+        self.pendingImages = {} # (sender, image id) -> latest update
+        updatesPending = QtCore.SIGNAL("updatesPending()")
+        QtCore.QObject.connect(self, updatesPending, self.schedule_updates,
+                               QtCore.Qt.QueuedConnection)
+
+        self.initialize() # initialize the interface
+
+        # QT signals used
+        clicked = QtCore.SIGNAL("clicked()")
+        toggled = QtCore.SIGNAL("toggled(bool)")
+        itemClicked = QtCore.SIGNAL("itemClicked(QListWidgetItem *)")
+        indexChanged = QtCore.SIGNAL("currentIndexChanged(const QString&)")
+        textChanged = QtCore.SIGNAL("textChanged(const QString&)")
+        returnPressed = QtCore.SIGNAL("returnPressed()")
+
+        # list widget connections
+        QtCore.QObject.connect(self.ui.listPorts, itemClicked, self.select_port)
+        QtCore.QObject.connect(self.ui.listNodes, itemClicked, self.select_node)
+
+        # radio button connections
+        QtCore.QObject.connect(self.ui.radioEven, toggled, self.select_parity)
+        QtCore.QObject.connect(self.ui.radioOdd, toggled, self.select_parity)
+        QtCore.QObject.connect(self.ui.radioMark, toggled, self.select_parity)
+        QtCore.QObject.connect(self.ui.radioSpace, toggled, self.select_parity)
+        QtCore.QObject.connect(self.ui.radioNone, toggled, self.select_parity)
+
+        QtCore.QObject.connect(self.ui.radio1, toggled, self.select_stop_bits)
+        QtCore.QObject.connect(self.ui.radio15, toggled, self.select_stop_bits)
+        QtCore.QObject.connect(self.ui.radio2, toggled, self.select_stop_bits)
+
+        QtCore.QObject.connect(self.ui.radio5, toggled, self.select_byte_size)
+        QtCore.QObject.connect(self.ui.radio6, toggled, self.select_byte_size)
+        QtCore.QObject.connect(self.ui.radio7, toggled, self.select_byte_size)
+        QtCore.QObject.connect(self.ui.radio8, toggled, self.select_byte_size)
+
+        # check box connections
+        QtCore.QObject.connect(self.ui.checkConfirm, toggled,
+                               self.select_confirm)
+
+        # combo box connections
+        QtCore.QObject.connect(self.ui.comboBaudRate, indexChanged, self.select_baud)
+
+        # line edit connections
+        QtCore.QObject.connect(self.ui.textName, textChanged, self.change_name)
+        QtCore.QObject.connect(self.ui.textSend, returnPressed, self.send_text)
+
+        # button connections
+        QtCore.QObject.connect(self.ui.btnSend, clicked, self.send_text)
+        QtCore.QObject.connect(self.ui.btnSendImage, clicked, self.send_image)
+
+        # keyboard shortcuts
+        stats = QtGui.QShortcut(QtGui.QKeySequence("F2"), self)
+        QtCore.QObject.connect(stats, QtCore.SIGNAL("activated()"),
+                               self.show_stats)
+
+    def initialize(self):
+        self.msg("Initializing...")
+
+        # ports are filled in as they are found, without holding up startup
+        self.ui.listPorts.clear()
+        if self.portWatcher != None:
+            self.portWatcher.stop()
+        self.portWatcher = ports.PortWatcher(
+            lambda name: self.post_call(self.add_port, name),
+            lambda name: self.post_call(self.remove_port, name))
+        self.portWatcher.start()
+
+        # Set default baud rate
+        self.select_baud(BAUD_RATE)
+
+        # Set default parity
+        if PARITY == serial.PARITY_NONE:
+            self.ui.radioNone.setChecked(True)
+        elif PARITY == serial.PARITY_ODD:
+            self.ui.radioOdd.setChecked(True)
+        elif PARITY == serial.PARITY_MARK:
+            self.ui.radioMark.setChecked(True)
+        elif PARITY == serial.PARITY_SPACE:
+            self.ui.radioSpace.setChecked(True)
+        else:
+            self.ui.radioEven.setChecked(True)
+            self.core.parity = serial.PARITY_EVEN
+
+        # Set default stop bits
+        if float(STOP_BITS) == 1.0:
+            self.ui.radio1.setChecked(True)
+        elif float(STOP_BITS) == 1.5:
+            self.ui.radio15.setChecked(True)
+        else:
+            self.core.stopBits = 2
+            self.ui.radio2.setChecked(True)
+
+        # Set default byte size
+        if BYTE_SIZE == 5:
+            self.ui.radio5.setChecked(True)
+        elif BYTE_SIZE == 6:
+            self.ui.radio6.setChecked(True)
+        elif BYTE_SIZE == 7:
+            self.ui.radio7.setChecked(True)
+        else:
+            self.ui.radio8.setChecked(True)
+            self.core.byteSize = 8
+
+        # Set default name
+        self.change_name(self.core.random_name())
+
+        # Clear list widgets, leaving the message lists at the latest lines
+        self.ui.listNodes.clear()
+        for view in (self.ui.listSentData, self.ui.listReceivedData,
+                     self.ui.listRelayedData):
+            view.scrollToBottom()
+
+
+        self.msg("Initialized.")
+
+    def select_port(self, item):
+        self.msg("Selecting new port: " + str(item.text()))
+        self.core.port = ports.device(str(item.text()))
+        self.core.open()
+
+    def select_node(self, item):
+        self.msg("Selecting new node: " + str(item.text()))
+        self.node = str(item.text())
+
+    def select_parity(self, button):
+        self.msg("Selecting new parity.")
+        if self.ui.radioEven.isChecked():
+            self.core.parity = serial.PARITY_EVEN
+        elif self.ui.radioOdd.isChecked():
+            self.core.parity = serial.PARITY_ODD
+        elif self.ui.radioMark.isChecked():
+            self.core.parity = serial.PARITY_MARK
+        elif self.ui.radioSpace.isChecked():
+            self.core.parity = serial.PARITY_SPACE
+        else:
+            self.core.parity = serial.PARITY_NONE
+
+        self.core.refresh()
+
+    def select_stop_bits(self, button):
+        self.msg("Selecting new stop bits.")
+        if self.ui.radio1.isChecked():
+            self.core.stopBits = serial.STOPBITS_ONE
+        elif self.ui.radio15.isChecked():
+            self.core.stopBits = serial.STOPBITS_ONE_POINT_FIVE
+        else:
+            self.core.stopBits = serial.STOPBITS_TWO
+
+        self.core.refresh()
+
+    def select_byte_size(self, button):
+        self.msg("Selecting new byte size.")
+        if self.ui.radio5.isChecked():
+            self.core.byteSize = serial.FIVEBITS
+        elif self.ui.radio6.isChecked():
+            self.core.byteSize = serial.SIXBITS
+        elif self.ui.radio7.isChecked():
+            self.core.byteSize = serial.SEVENBITS
+        else:
+            self.core.byteSize = serial.EIGHTBITS
+
+        self.core.refresh()
+
+    def select_baud(self, baud):
+        self.msg("Selecting new baud rate: " + str(baud))
+        index = self.ui.comboBaudRate.findText(str(baud))
+        auto = str(baud) == "Auto"
+        # negotiation starts out from the default rate
+        self.core.baud = BAUD_RATE if auto else int(str(baud))
+        self.ui.comboBaudRate.setCurrentIndex(index)
+
+        self.core.refresh()
+        self.core.auto_baud(auto)
+
+    def change_name(self, name):
+        self.core.change_name(str(name))
+
+    def select_confirm(self, checked):
+        self.core.reliable = checked
+
+    def send_text(self):
+        if str(self.ui.textSend.text()) != "" and self.node != None:
+            self.msg("Sending text: " + str(self.ui.textSend.text()))
+            self.core.send(self.core.name, self.node,
+                           str(self.ui.textSend.text()))
+            self.ui.textSend.clear()
+        elif self.node == None:
+            self.msg("You must select a node to send this message.")
+        else:
+            self.msg("No text entered.")
+
+    def send_image(self):
+        if self.node == None:
+            self.msg("You must select a node to send this image.")
+            return
+        path = str(QtGui.QFileDialog.getOpenFileName())
+        if path != "":
+            self.core.send_image(self.node, path)
+
+    def show_stats(self):
+        if self.statsPanel == None:
+            self.statsPanel = StatsPanel(self.core, self)
+        self.statsPanel.show()
+        self.statsPanel.raise_()
+
+    # Shows the current state of an incoming image in its own window.
+    def show_image(self, sender, imageId, image, complete):
+        key = (sender, imageId)
+        label = self.imageWindows.get(key)
+        if label == None:
+            label = QtGui.QLabel()
+            label.setWindowTitle("Image from " + sender)
+            self.imageWindows[key] = label
+
+        width, height = image.size
+        data = imaging.to_bytes(image, "raw", "RGB")
+        qimage = QtGui.QImage(data, width, height, width * 3,
+                              QtGui.QImage.Format_RGB888)
+        label.setPixmap(QtGui.QPixmap.fromImage(qimage))
+        label.show()
+
+        if complete:
+            del self.imageWindows[key]
+            # the history list only shows lines which are in the store
+            self.record(message_store.RECEIVED, sender, self.core.name,
+                        "[Image]")
+            self.receivedData.append("<From: " + sender + "> [Image]")
+
+    # Prints a message to the user via the status bar.
+    def msg(self, text):
+        self.ui.statusbar.showMessage(str(text))
+
+    def add_port(self, name):
+        self.ui.listPorts.addItem(name)
+
+    def remove_port(self, name):
+        for item in self.ui.listPorts.findItems(name, QtCore.Qt.MatchExactly):
+            self.ui.listPorts.takeItem(self.ui.listPorts.row(item))
+
+    def add_node(self, name):
+        self.ui.listNodes.addItem(name)
+
+    def remove_node(self, name):
+        for item in self.ui.listNodes.findItems(name, QtCore.Qt.MatchExactly):
+            self.ui.listNodes.takeItem(self.ui.listNodes.row(item))
+
+    def open_history(self):
+        try:
+            return message_store.MessageStore()
+        except (IOError, OSError) as e:
+            self.msg("Message history not kept, " + str(e))
+            return None
+
+    # Adds a message to the history, from any thread.
+    def record(self, direction, sender, recipient, text):
+        if self.history == None:
+            return
+        try:
+            self.history.append(direction, sender, recipient, text)
+        except (IOError, OSError, ValueError) as e:
+            self.post_call(self.msg, "Could not save message, " + str(e))
+
+    # Queues a change to the window from any thread. Only the first change
+    # since the last update signals this thread; the rest just wait for it.
+    def post_line(self, messages, line):
+        with self.updateLock:
+            self.pendingLines.setdefault(messages, []).append(line)
+            self.request_update()
+
+    def post_call(self, func, *args):
+        with self.updateLock:
+            self.pendingCalls.append((func, args))
+            self.request_update()
+
+    def request_update(self):
+        if not self.updatePending:
+            self.updatePending = True
+            self.emit(QtCore.SIGNAL("updatesPending()"))
+
+    # Applies queued changes once REFRESH_INTERVAL has passed since the last.
+    def schedule_updates(self):
+        elapsed = (time.time() - self.lastUpdate) * 1000
+        wait = max(0, int(REFRESH_INTERVAL - elapsed))
+        QtCore.QTimer.singleShot(wait, self.apply_updates)
+
+    def apply_updates(self):
+        with self.updateLock:
+            lines, self.pendingLines = self.pendingLines, {}
+            calls, self.pendingCalls = self.pendingCalls, []
+            images, self.pendingImages = self.pendingImages, {}
+            self.updatePending = False
+        self.lastUpdate = time.time()
+
+        for func, args in calls:
+            func(*args)
+        for messages, batch in lines.items():
+            messages.extend(batch)
+        for update in images.values():
+            self.show_image(*update)
+
+    # Node events, shown in the window
+    def status(self, text):
+        self.post_call(self.msg, text)
+
+    def name_changed(self, name):
+        self.post_call(self.ui.textName.setText, name)
+
+    def node_added(self, name):
+        self.post_call(self.add_node, name)
+
+    def node_removed(self, name):
+        self.post_call(self.remove_node, name)
+
+    def sent(self, recipient, text, key = None):
+        self.record(message_store.SENT, self.core.name, recipient, text)
+        with self.updateLock:
+            number = self.sentLines
+            self.sentLines += 1
+            if key != None:
+                self.deliveries[key] = number
+        self.post_line(self.sentData, "<To: " + recipient + "> " + text)
+        if key != None:
+            self.post_call(self.sentData.set_status, number, WAITING)
+
+    def delivered(self, recipient, key, confirmed):
+        with self.updateLock:
+            number = self.deliveries.pop(key, None)
+        if number != None:
+            self.post_call(self.sentData.set_status, number,
+                           DELIVERED if confirmed else NOT_DELIVERED)
+
+    def received(self, sender, text):
+        self.record(message_store.RECEIVED, sender, self.core.name, text)
+        self.post_line(self.receivedData, "<From: " + sender + "> " + text)
+
+    def relayed(self, sender, recipient, text):
+        self.record(message_store.RELAYED, sender, recipient, text)
+        message = "<From: " + sender + "> <To: "
+        message += recipient + "> " + text
+        self.post_line(self.relayedData, message)
+
+    # Called by the listener whenever part of an incoming image is decoded.
+    # Only the latest state of each image is shown at the next update.
+    def image_updated(self, sender, imageId, image, complete):
+        with self.updateLock:
+            key = (sender, imageId)
+            previous = self.pendingImages.get(key)
+            # a finished image must still be recorded as such
+            complete = complete or (previous != None and previous[3])
+            self.pendingImages[key] = (sender, imageId, image, complete)
+            self.request_update()